@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from twilio.base.exceptions import TwilioRestException
+
+from app.core.twilio_logic import extract_message_info, extract_webhook_message_info, sanitize_data, \
+    record_delivery_outcome, configure_client, is_transient_twilio_error, get_twilio_http_timeout
+from app.decision_logic import get_routes
+from app.flood_control import get_flood_control, is_digest_job, send_digest_async
+from app.exceptions import MissingCredentialsException, ClientAuthenticationException, RequiresClientException, \
+    ResourceNotFoundException, RouteProcessingError
+from app.lazy_imports import lazy_import
+from app.metrics import STAGE_LATENCY, MESSAGES_PROCESSED, DELIVERIES_IN_FLIGHT
+from app.models import LogEntry
+from app.resilience import get_retry_policy
+from app.sinks import get_sink_registry, raise_for_undelivered, requeue_deferred_routes, is_route_job, \
+    deliver_route_job_async
+
+if TYPE_CHECKING:
+    from twilio.rest.api.v2010.account.message import MessageInstance
+
+# aiohttp and the Twilio REST client are only needed once the async pipeline delivers a message
+Client = lazy_import("twilio.rest", "Client")
+AsyncTwilioHttpClient = lazy_import("twilio.http.async_http_client", "AsyncTwilioHttpClient")
+ClientSession = lazy_import("aiohttp", "ClientSession")
+TCPConnector = lazy_import("aiohttp", "TCPConnector")
+
+DEFAULT_ASYNC_HTTP_POOL_SIZE = 100
+
+# Async twilio clients keyed on account SID. aiohttp sessions are bound to the event loop
+# that created them, so this pool must only be used from the application event loop.
+_async_client_pool: dict[str, tuple[str, Client]] = {}
+
+
+def get_async_client() -> Client:
+    """
+    Gets a pooled twilio client backed by an aiohttp session. Must be called from the event loop
+
+    Pool size is read from the TWILIO_ASYNC_HTTP_POOL_SIZE environment variable.
+
+    Returns:
+        twilio.rest.Client: Twilio client instance with an async HTTP client
+
+    Raises:
+        MissingCredentialsException: If no credentials are provided
+        ClientAuthenticationException: If unable to authenticate with Twilio
+    """
+    account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+    auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+    if not account_sid or not auth_token:
+        raise MissingCredentialsException("Required credentials are missing")
+
+    cached = _async_client_pool.get(account_sid)
+    if cached and cached[0] == auth_token:
+        return cached[1]
+
+    pool_size = int(os.environ.get("TWILIO_ASYNC_HTTP_POOL_SIZE", DEFAULT_ASYNC_HTTP_POOL_SIZE))
+    http_client = AsyncTwilioHttpClient(pool_connections=False, timeout=get_twilio_http_timeout())
+    http_client.session = ClientSession(connector=TCPConnector(limit=pool_size))
+    try:
+        client = configure_client(Client(account_sid, auth_token, http_client=http_client))
+    except TwilioRestException as e:
+        raise ClientAuthenticationException("Twilio Authentication Failed") from e
+
+    if cached:
+        asyncio.ensure_future(cached[1].http_client.close())
+    _async_client_pool[account_sid] = (auth_token, client)
+    return client
+
+
+async def close_async_clients() -> None:
+    """
+    Closes the sessions of all pooled async twilio clients
+    """
+    for _, client in _async_client_pool.values():
+        await client.http_client.close()
+    _async_client_pool.clear()
+
+
+async def get_full_twilio_data_async(client: Client, msg_sid: str) -> MessageInstance:
+    """
+    Pulls full message data from twilio without blocking the event loop
+
+    Transient failures are retried with backoff, guarded by the twilio circuit breaker.
+
+    Args:
+        client: Twilio client instance with an async HTTP client
+        msg_sid: MessageSid of message being fetched
+
+    Returns:
+        MessageInstance: Instance of the twilio message with all data
+
+    Raises:
+        ValueError: If msg_sid is empty
+        ResourceNotFoundException: If no message is found
+        CircuitOpenError: If the twilio circuit breaker is open
+    """
+    if not client:
+        raise RequiresClientException("Client is required")
+    if not msg_sid:
+        raise ValueError("msg_sid is required")
+
+    try:
+        # AsyncTwilioHttpClient keeps its timeout without applying it to requests, so it is enforced here.
+        # The TimeoutError it raises is transient and counts against the twilio breaker
+        return await get_retry_policy("twilio", is_transient_twilio_error).call_async(
+            lambda: asyncio.wait_for(client.messages(msg_sid).fetch_async(), get_twilio_http_timeout())
+        )
+    except TwilioRestException as e:
+        if e.status == 404:
+            raise ResourceNotFoundException(f"Resource not found: {msg_sid}")
+        else:
+            raise e
+
+
+async def get_message_info_async(data: dict) -> dict:
+    """
+    Async counterpart of get_message_info. Honors the TWILIO_MESSAGE_SOURCE environment variable
+
+    Args:
+        data: Raw twilio request data. (Must not be modified for validator to work)
+
+    Returns:
+        dict: Dictionary of extracted data for future processing
+    """
+    if os.environ.get("TWILIO_MESSAGE_SOURCE", "webhook").lower() != "rest":
+        extracted_info = extract_webhook_message_info(data)
+        if extracted_info:
+            return extracted_info
+
+    client = get_async_client()
+    msg_sid = data.get("MessageSid")
+    if not msg_sid:
+        raise ValueError("MessageSid is required in the data")
+    full_twilio_data = await get_full_twilio_data_async(client, msg_sid)
+    return extract_message_info(full_twilio_data)
+
+
+async def twilio_background_task_async(request_headers: dict, data: dict) -> dict | None:
+    """
+    Async counterpart of twilio_background_task. Runs on the event loop instead of a worker thread
+
+    Args:
+        request_headers: Request headers of the webhook
+        data: Raw twilio request data. (Must not be modified for validator to work)
+
+    Returns:
+        None
+    """
+    with DELIVERIES_IN_FLIGHT.track_in_progress(), STAGE_LATENCY.labels(stage="total").time():
+        if is_digest_job(data):
+            await send_digest_async(data)
+            return None
+        if is_route_job(data):
+            await deliver_route_job_async(request_headers, data)
+            return None
+        return await _run_background_task_async(request_headers, data)
+
+
+async def _run_background_task_async(request_headers: dict, data: dict) -> dict | None:
+    try:
+        with STAGE_LATENCY.labels(stage="fetch").time():
+            extracted_info = await get_message_info_async(data)
+        with STAGE_LATENCY.labels(stage="routing").time():
+            extracted_info = get_routes(extracted_info)
+        with STAGE_LATENCY.labels(stage="flood_control").time():
+            extracted_info = await get_flood_control().apply_async(extracted_info, data.get("MessageSid"))
+        trace_id = request_headers.get("X-Twilio-Trace-ID", "None")
+        with STAGE_LATENCY.labels(stage="fan_out").time():
+            results = await get_sink_registry().deliver_async(extracted_info, extracted_info["routes"], trace_id)
+        raise_for_undelivered(results)
+        await asyncio.to_thread(requeue_deferred_routes, extracted_info, results, trace_id)
+
+        success_log = LogEntry(
+            level="INFO",
+            message="SMS Processed Successfully",
+            service_name="Twilio Webhook",
+            trace_id=trace_id,
+            context=sanitize_data(data),
+        )
+        logging.info(success_log)
+        await asyncio.to_thread(record_delivery_outcome, data)
+        MESSAGES_PROCESSED.labels(outcome="success").inc()
+
+    except (
+            MissingCredentialsException,
+            ClientAuthenticationException,
+            RequiresClientException,
+            ResourceNotFoundException,
+            RouteProcessingError
+    ) as e:
+        try:
+            sanitized_data = sanitize_data(data)
+        except ValueError:
+            sanitized_data = {"MessageSid": "MessageSid Not Found"}
+        failure_log = LogEntry(
+            level="ERROR",
+            message=str(e),
+            service_name="Twilio Webhook",
+            trace_id=request_headers.get("X-Twilio-Trace-ID", "None"),
+            context=sanitized_data,
+        )
+        logging.error(failure_log)
+        await asyncio.to_thread(record_delivery_outcome, data, e)
+        MESSAGES_PROCESSED.labels(outcome="failure").inc()
+        return None
@@ -1,4 +1,6 @@
-import logging
+import asyncio
+import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, status
 from fastapi.exceptions import RequestValidationError
@@ -7,13 +9,58 @@ from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException
 from dotenv import load_dotenv
 
-from app.endpoints import twilio_webhooks
+from app.core.async_twilio_logic import twilio_background_task_async, close_async_clients
+from app.core.twilio_logic import twilio_background_task
+from app.core.warmup import WarmupState, default_warmup_steps, warm_up
+from app.decision_logic import get_contact_index
+from app.email_sender import load_gmail_discovery_document, close_async_http_client
+from app.flood_control import close_flood_control
+from app.endpoints import health, metrics, twilio_webhooks
+from app.log_pipeline import configure_logging
 from app.models import ErrorResponse, ValidationError
-
-logging.basicConfig(level=logging.INFO)
+from app.sinks import get_sink_registry
+from app.work_queue import start_worker_pool, start_async_worker_pool
 
 load_dotenv()
-app = FastAPI()
+configure_logging()
+load_gmail_discovery_document()
+
+
+async def _stop_warmup(warmup_task: asyncio.Task) -> None:
+    warmup_task.cancel()
+    try:
+        await warmup_task
+    except asyncio.CancelledError:
+        pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    delivery_mode = os.environ.get("DELIVERY_MODE", "threads").lower()
+    # Routing reads the contact index on the event loop, so the contact list is indexed before serving
+    await asyncio.to_thread(get_contact_index)
+    # Warm-up runs while the app serves so webhooks are still acked. /ready reports when it is done
+    warmup_steps = default_warmup_steps(delivery_mode)
+    app.state.warmup = WarmupState(warmup_steps)
+    warmup_task = asyncio.create_task(warm_up(app.state.warmup, warmup_steps))
+    if delivery_mode == "async":
+        worker_pool = start_async_worker_pool(twilio_background_task_async)
+        yield
+        await _stop_warmup(warmup_task)
+        await worker_pool.stop()
+        await asyncio.to_thread(close_flood_control)
+        get_sink_registry().shutdown()
+        await close_async_clients()
+        await close_async_http_client()
+    else:
+        worker_pool = start_worker_pool(twilio_background_task)
+        yield
+        await _stop_warmup(warmup_task)
+        worker_pool.stop(timeout=5)
+        close_flood_control()
+        get_sink_registry().shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.exception_handler(HTTPException)
 def handle_http_exception(request: Request, exc: HTTPException):
@@ -60,4 +107,6 @@ def handle_request_validation_exception(request: Request, exc: RequestValidation
         content=error_response.model_dump()
     )
 
-app.include_router(twilio_webhooks.router)
\ No newline at end of file
+app.include_router(twilio_webhooks.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
\ No newline at end of file
@@ -1,26 +1,100 @@
+from __future__ import annotations
+
+import base64
+import hmac
 import os
 import logging
-from datetime import datetime
+import sys
+import threading
+from datetime import datetime, timezone
+from hashlib import sha1
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 
 from twilio.base.exceptions import TwilioRestException
-from twilio.request_validator import RequestValidator
-from twilio.rest.api.v2010.account.message import MessageInstance
+from twilio.request_validator import add_port, remove_port
 from fastapi import Request, Form
 
 from app.exceptions.exceptions import MissingCredentialsException, ClientAuthenticationException, \
     RequiresClientException, ResourceNotFoundException, InvalidTwilioRequestException, RouteProcessingError
-from twilio.rest import Client
 
+from app.dedup import get_dedup_cache, STATUS_DELIVERED, STATUS_NOT_FOUND
+from app.lazy_imports import lazy_import
+from app.metrics import STAGE_LATENCY, MESSAGES_PROCESSED, DELIVERIES_IN_FLIGHT
 from app.models import LogEntry
+from app.resilience import get_retry_policy
 
 from app.decision_logic import get_routes
+from app.flood_control import get_flood_control, is_digest_job, send_digest
+
+from app.sinks import get_sink_registry, raise_for_undelivered, requeue_deferred_routes, is_route_job, \
+    deliver_route_job
+
+if TYPE_CHECKING:
+    from twilio.rest.api.v2010.account.message import MessageInstance
+
+# The Twilio REST client and requests are heavy imports the webhook ack path never needs
+Client = lazy_import("twilio.rest", "Client")
+TwilioHttpClient = lazy_import("twilio.http.http_client", "TwilioHttpClient")
+HTTPAdapter = lazy_import("requests.adapters", "HTTPAdapter")
+aiohttp = lazy_import("aiohttp")
 
-from app.email_sender import EmailSender
+DEFAULT_HTTP_POOL_SIZE = 10
+# Without a timeout a hung Twilio API would hold workers forever without the breaker ever seeing a failure
+DEFAULT_TWILIO_HTTP_TIMEOUT = 10.0
+
+# Process-wide Twilio client registry keyed on account SID.
+# Each entry holds the auth token it was built with so rotated credentials trigger a rebuild.
+_client_pool: dict[str, tuple[str, Client]] = {}
+_client_pool_stats = {"hits": 0, "misses": 0}
+_client_pool_lock = threading.Lock()
+
+
+def get_twilio_http_timeout() -> float:
+    """
+    Returns:
+        float: Seconds a Twilio API request may take, read from the TWILIO_HTTP_TIMEOUT environment variable
+    """
+    return float(os.environ.get("TWILIO_HTTP_TIMEOUT", DEFAULT_TWILIO_HTTP_TIMEOUT))
+
+
+def _build_http_client() -> TwilioHttpClient:
+    """
+    Builds a keep-alive Twilio HTTP client backed by a pooled requests session
+
+    Pool size is read from the TWILIO_HTTP_POOL_SIZE environment variable.
+
+    Returns:
+        TwilioHttpClient: HTTP client with a mounted connection pool
+    """
+    pool_size = int(os.environ.get("TWILIO_HTTP_POOL_SIZE", DEFAULT_HTTP_POOL_SIZE))
+    http_client = TwilioHttpClient(pool_connections=True, timeout=get_twilio_http_timeout())
+    http_client.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    return http_client
+
+
+def configure_client(client: Client) -> Client:
+    """
+    Applies environment overrides to a twilio client
+
+    TWILIO_API_BASE_URL points the client at another API host, such as a local stand-in server.
+
+    Returns:
+        twilio.rest.Client: The configured client
+    """
+    api_base_url = os.environ.get("TWILIO_API_BASE_URL")
+    if api_base_url:
+        client.api.base_url = api_base_url.rstrip("/")
+    return client
 
 
 def get_client() -> Client:
     """
-    Gets a twilio client instance
+    Gets a pooled twilio client instance
+
+    Clients are cached per account SID and reused across calls so the underlying
+    HTTP session and TLS connections stay alive. A new client is built when the
+    auth token changes.
 
     Returns:
         twilio.rest.Client: Twilio client instance
@@ -34,29 +108,140 @@ def get_client() -> Client:
     if not account_sid or not auth_token:
         raise MissingCredentialsException("Required credentials are missing")
 
-    try:
-        client = Client(account_sid, auth_token)
+    with _client_pool_lock:
+        cached = _client_pool.get(account_sid)
+        if cached and cached[0] == auth_token:
+            _client_pool_stats["hits"] += 1
+            return cached[1]
+
+        _client_pool_stats["misses"] += 1
+        try:
+            client = configure_client(Client(account_sid, auth_token, http_client=_build_http_client()))
+        except TwilioRestException as e:
+            raise ClientAuthenticationException("Twilio Authentication Failed") from e
+
+        if cached:
+            _close_client(cached[1])
+        _client_pool[account_sid] = (auth_token, client)
         return client
-    except TwilioRestException as e:
-        raise ClientAuthenticationException("Twilio Authentication Failed") from e
 
 
-def validate_twilio_request(request: Request, data: dict) -> bool:
+def _close_client(client: Client) -> None:
+    session = getattr(client.http_client, "session", None)
+    if session is not None:
+        session.close()
+
+
+def get_client_pool_stats() -> dict:
+    """
+    Reports twilio client pool usage
+
+    Returns:
+        dict: hit and miss counters along with the number of pooled clients
+    """
+    with _client_pool_lock:
+        return {**_client_pool_stats, "size": len(_client_pool)}
+
+
+def reset_client_pool() -> None:
+    """
+    Closes and drops all pooled twilio clients and resets the pool counters
+    """
+    with _client_pool_lock:
+        for _, client in _client_pool.values():
+            _close_client(client)
+        _client_pool.clear()
+        _client_pool_stats["hits"] = 0
+        _client_pool_stats["misses"] = 0
+
+
+class TwilioSignatureValidator:
+    """
+    Validates X-Twilio-Signature headers against parsed url-encoded form bodies
+
+    Produces the same signatures as twilio.request_validator.RequestValidator but keeps a keyed
+    HMAC state so the auth token is only processed once.
+    """
+    def __init__(self, auth_token: str):
+        self._mac = hmac.new(auth_token.encode("utf-8"), digestmod=sha1)
+
+    def compute_signature(self, url: str, params: dict[str, list[str]]) -> str:
+        """
+        Computes the expected signature for a request
+
+        Args:
+            url: Full URL twilio requested
+            params: Form parameters as returned by urllib.parse.parse_qs
+
+        Returns:
+            str: Base64 encoded HMAC-SHA1 signature
+        """
+        mac = self._mac.copy()
+        mac.update(url.encode("utf-8"))
+        for name in sorted(params):
+            encoded_name = name.encode("utf-8")
+            for value in sorted(set(params[name])):
+                mac.update(encoded_name)
+                mac.update(value.encode("utf-8"))
+        return base64.b64encode(mac.digest()).decode("utf-8")
+
+    def validate(self, url: str, params: dict[str, list[str]], signature: str) -> bool:
+        """
+        Validates a signature, accepting the URL with or without an explicit port
+
+        Returns:
+            bool: True if valid, False otherwise
+        """
+        parsed_url = urlparse(url)
+        expected = signature.encode("utf-8")
+        return (
+            hmac.compare_digest(self.compute_signature(remove_port(parsed_url), params).encode("utf-8"), expected)
+            or hmac.compare_digest(self.compute_signature(add_port(parsed_url), params).encode("utf-8"), expected)
+        )
+
+
+# Validators keyed on auth token. Holds a single entry, replaced when the token rotates.
+_request_validators: dict[str, TwilioSignatureValidator] = {}
+
+
+def get_request_validator() -> TwilioSignatureValidator:
+    """
+    Gets the signature validator for the current auth token, creating it on first use
+
+    Returns:
+        TwilioSignatureValidator: Cached validator
+
+    Raises:
+        MissingCredentialsException: If no auth token is set
+    """
+    auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+    if not auth_token:
+        raise MissingCredentialsException("Required credentials are missing")
+
+    validator = _request_validators.get(auth_token)
+    if validator is None:
+        validator = TwilioSignatureValidator(auth_token)
+        _request_validators.clear()
+        _request_validators[auth_token] = validator
+    return validator
+
+
+def validate_twilio_request(request: Request, params: dict[str, list[str]]) -> bool:
     """
     Validates a Twilio request
 
     Args:
         request: Request to fastAPI endpoint
-        data: Raw twilio request data. (Must not be modified for validator to work)
+        params: Form parameters parsed from the raw request body with urllib.parse.parse_qs
 
     Returns:
         bool: True if valid, False otherwise
     """
-    if 'ErrorUrl' in data:
-        url = data['ErrorUrl']
+    if 'ErrorUrl' in params:
+        url = params['ErrorUrl'][-1]
 
     else:
-        scheme = request.headers["x-forwarded-proto"]
+        scheme = request.headers.get("x-forwarded-proto", request.url.scheme)
         host = request.headers["host"]
         path = request.scope['path']
         prod_path = os.environ.get("PROD_PATH", "")
@@ -67,18 +252,36 @@ def validate_twilio_request(request: Request, data: dict) -> bool:
         if query:
             url += f"?{query}"
 
-    print(url)
-    validator = RequestValidator(os.environ["TWILIO_AUTH_TOKEN"])
-    is_valid = validator.validate(
+    return get_request_validator().validate(
         url,
-        data,
+        params,
         request.headers.get("X-Twilio-Signature", "")
     )
-    return is_valid
+
+def is_transient_twilio_error(error: Exception) -> bool:
+    """
+    Tells transient twilio failures, worth retrying, from permanent ones such as a 404
+
+    Args:
+        error: Error raised by a sync or async twilio client call
+
+    Returns:
+        bool: True for throttling, server errors, timeouts and connection failures
+    """
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    # requests raises OSError subclasses, aiohttp is only loaded once the async pipeline ran
+    if isinstance(error, OSError):
+        return True
+    return "aiohttp" in sys.modules and isinstance(error, aiohttp.ClientError)
+
 
 def get_full_twilio_data(client: Client, msg_sid: str) -> MessageInstance:
     """
     Pulls full message data from twilio
+
+    Transient failures are retried with backoff, guarded by the twilio circuit breaker.
+
     Args:
         client: Twilio client instance
         msg_sid: MessageSid of message being fetched
@@ -89,6 +292,7 @@ def get_full_twilio_data(client: Client, msg_sid: str) -> MessageInstance:
     Raises:
         ValueError: If msg_sid is empty
         ResourceNotFoundException: If no message is found
+        CircuitOpenError: If the twilio circuit breaker is open
     """
     if not client:
         raise RequiresClientException("Client is required")
@@ -96,7 +300,7 @@ def get_full_twilio_data(client: Client, msg_sid: str) -> MessageInstance:
         raise ValueError("msg_sid is required")
 
     try:
-        message = client.messages(msg_sid).fetch()
+        message = get_retry_policy("twilio", is_transient_twilio_error).call(client.messages(msg_sid).fetch)
         return message
     except TwilioRestException as e:
         if e.status == 404:
@@ -132,6 +336,61 @@ def extract_message_info(twilio_data: MessageInstance) -> dict:
     }
 
 
+def extract_webhook_message_info(data: dict) -> dict | None:
+    """
+    Extracts required message data directly from a validated twilio webhook payload
+
+    Webhook payloads carry no creation timestamp, so the time of processing is used instead.
+
+    Args:
+        data: Raw twilio request data. Must already have passed signature validation
+
+    Returns:
+        dict: Dictionary of extracted data for future processing
+        None: If the payload is missing From or Body
+    """
+    from_ = data.get("From")
+    body = data.get("Body")
+    if not from_ or not body:
+        return None
+
+    return {
+        "date_created": datetime.now(timezone.utc),
+        "from": from_,
+        "body": body,
+    }
+
+
+def get_message_info(data: dict) -> dict:
+    """
+    Gets message data for a webhook, using the payload itself when possible
+
+    The TWILIO_MESSAGE_SOURCE environment variable selects the mode. "webhook" (default) builds the
+    message from the payload and only fetches it from twilio when fields are missing. "rest" always
+    fetches the full message from twilio.
+
+    Args:
+        data: Raw twilio request data. (Must not be modified for validator to work)
+
+    Returns:
+        dict: Dictionary of extracted data for future processing
+
+    Raises:
+        ValueError: If MessageSid is missing and the message must be fetched
+    """
+    if os.environ.get("TWILIO_MESSAGE_SOURCE", "webhook").lower() != "rest":
+        extracted_info = extract_webhook_message_info(data)
+        if extracted_info:
+            return extracted_info
+
+    client = get_client()
+    msg_sid = data.get("MessageSid")
+    if not msg_sid:
+        raise ValueError("MessageSid is required in the data")
+    full_twilio_data = get_full_twilio_data(client, msg_sid)
+    return extract_message_info(full_twilio_data)
+
+
 def sanitize_data(data: dict) -> dict:
     """
     Sanitizes data for logging purposes
@@ -157,10 +416,35 @@ def sanitize_data(data: dict) -> dict:
     }
 
 
+def record_delivery_outcome(data: dict, error: Exception | None = None) -> None:
+    """
+    Records the outcome of processing a webhook in the MessageSid dedup cache
+
+    Delivered messages and missing messages stay cached so retries are ignored. Other failures
+    release the MessageSid so a twilio retry is processed again.
+
+    Args:
+        data: Raw twilio request data
+        error: Exception that stopped processing, if any
+    """
+    msg_sid = data.get("MessageSid")
+    if not msg_sid:
+        return
+
+    dedup_cache = get_dedup_cache()
+    if error is None:
+        dedup_cache.record(msg_sid, STATUS_DELIVERED)
+    elif isinstance(error, ResourceNotFoundException):
+        dedup_cache.record(msg_sid, STATUS_NOT_FOUND)
+    else:
+        dedup_cache.release(msg_sid)
+
+
 def twilio_background_task(request_headers: dict, data: dict) -> dict | None:
     """
     Function to be called as a background task
-    Runs all functions needed to process twilio messages
+    Runs all functions needed to process twilio messages. Digest jobs queued by flood control are emailed
+    instead, and route jobs are redelivered to the sinks that deferred them
 
     Args:
         data: Raw twilio request data. (Must not be modified for validator to work)
@@ -169,31 +453,40 @@ def twilio_background_task(request_headers: dict, data: dict) -> dict | None:
         dict: dictionary of extracted data for future processing
         None: returned on error.
     """
+    with DELIVERIES_IN_FLIGHT.track_in_progress(), STAGE_LATENCY.labels(stage="total").time():
+        if is_digest_job(data):
+            send_digest(data)
+            return None
+        if is_route_job(data):
+            deliver_route_job(request_headers, data)
+            return None
+        return _run_background_task(request_headers, data)
+
+
+def _run_background_task(request_headers: dict, data: dict) -> dict | None:
     try:
-        client = get_client()
-        msg_sid = data.get("MessageSid")
-        if not msg_sid:
-            raise ValueError("MessageSid is required in the data")
-        full_twilio_data = get_full_twilio_data(client, msg_sid)
-        extracted_info = extract_message_info(full_twilio_data)
-        extracted_info = get_routes(extracted_info)
-        if "email" in extracted_info["routes"]:
-            sender = EmailSender()
-            encoded_msg = sender.build_email(
-                destination=os.environ["MY_EMAIL"],
-                subject=f"New Text Message from {extracted_info['from']}",
-                body=extracted_info["body"],
-            )
-            sender.send_email(encoded_msg)
+        with STAGE_LATENCY.labels(stage="fetch").time():
+            extracted_info = get_message_info(data)
+        with STAGE_LATENCY.labels(stage="routing").time():
+            extracted_info = get_routes(extracted_info)
+        with STAGE_LATENCY.labels(stage="flood_control").time():
+            extracted_info = get_flood_control().apply(extracted_info, data.get("MessageSid"))
+        trace_id = request_headers.get("X-Twilio-Trace-ID", "None")
+        with STAGE_LATENCY.labels(stage="fan_out").time():
+            results = get_sink_registry().deliver(extracted_info, extracted_info["routes"], trace_id)
+        raise_for_undelivered(results)
+        requeue_deferred_routes(extracted_info, results, trace_id)
 
         success_log = LogEntry(
             level="INFO",
             message="SMS Processed Successfully",
             service_name="Twilio Webhook",
-            trace_id=request_headers.get("X-Twilio-Trace-ID", "None"),
+            trace_id=trace_id,
             context=sanitize_data(data),
         )
-        logging.info(success_log.to_json())
+        logging.info(success_log)
+        record_delivery_outcome(data)
+        MESSAGES_PROCESSED.labels(outcome="success").inc()
 
     except (
             MissingCredentialsException,
@@ -213,5 +506,7 @@ def twilio_background_task(request_headers: dict, data: dict) -> dict | None:
             trace_id=request_headers.get("X-Twilio-Trace-ID", "None"),
             context=sanitized_data,
         )
-        logging.error(failure_log.to_json())
+        logging.error(failure_log)
+        record_delivery_outcome(data, e)
+        MESSAGES_PROCESSED.labels(outcome="failure").inc()
         return None
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from functools import partial
+from typing import Awaitable, Callable
+
+from app.core.async_twilio_logic import get_async_client
+from app.core.twilio_logic import get_client
+from app.email_sender import get_async_http_client, warm_up_email_sender
+from app.models import LogEntry
+
+DEFAULT_WARMUP_RETRY_INTERVAL = 30.0
+
+STEP_PENDING = "pending"
+STEP_READY = "ready"
+STEP_FAILED = "failed"
+
+WarmupStep = Callable[[], Awaitable[object]]
+
+
+class WarmupState:
+    """
+    Tracks startup warm-up so readiness can be reported before every step has finished
+
+    Attributes:
+        steps (dict[str, str]): Status of every warm-up step
+        errors (dict[str, str]): Last error of every failed step
+    """
+    def __init__(self, step_names):
+        self.steps = {name: STEP_PENDING for name in step_names}
+        self.errors: dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(status == STEP_READY for status in self.steps.values())
+
+
+def _on_loop(function: Callable[[], object]) -> WarmupStep:
+    async def step():
+        return function()
+    return step
+
+
+def default_warmup_steps(delivery_mode: str) -> dict[str, WarmupStep]:
+    """
+    Builds the warm-up steps for a delivery mode
+
+    Args:
+        delivery_mode: "async" or "threads", as read from DELIVERY_MODE
+
+    Returns:
+        dict[str, WarmupStep]: Step name to a coroutine function that warms it
+    """
+    if delivery_mode == "async":
+        # aiohttp and httpx clients are bound to the event loop, so they are built on it
+        return {
+            "twilio_client": _on_loop(get_async_client),
+            "gmail": partial(asyncio.to_thread, warm_up_email_sender),
+            "gmail_http_client": _on_loop(get_async_http_client),
+        }
+    return {
+        "twilio_client": partial(asyncio.to_thread, get_client),
+        "gmail": partial(asyncio.to_thread, warm_up_email_sender),
+    }
+
+
+async def _run_step(state: WarmupState, name: str, step: WarmupStep) -> None:
+    try:
+        await step()
+    except Exception as e:
+        state.steps[name] = STEP_FAILED
+        state.errors[name] = str(e) or type(e).__name__
+        failure_log = LogEntry(
+            level="ERROR",
+            message=f"Warm-up step {name} failed. {state.errors[name]}",
+            service_name="Warm-up",
+            trace_id=None,
+            context=None,
+        )
+        logging.error(failure_log)
+        return
+    state.steps[name] = STEP_READY
+    state.errors.pop(name, None)
+
+
+async def warm_up(state: WarmupState, steps: dict[str, WarmupStep], retry_interval: float | None = None) -> None:
+    """
+    Runs every warm-up step concurrently, retrying failed steps until all of them succeed
+
+    The retry interval is read from WARMUP_RETRY_INTERVAL when not given.
+
+    Args:
+        state: Warm-up state updated as steps finish
+        steps: Step name to a coroutine function that warms it
+        retry_interval: Seconds to wait before retrying failed steps
+    """
+    if retry_interval is None:
+        retry_interval = float(os.environ.get("WARMUP_RETRY_INTERVAL", DEFAULT_WARMUP_RETRY_INTERVAL))
+    pending = dict(steps)
+    while True:
+        await asyncio.gather(*(_run_step(state, name, step) for name, step in pending.items()))
+        pending = {name: step for name, step in pending.items() if state.steps[name] != STEP_READY}
+        if not pending:
+            break
+        await asyncio.sleep(retry_interval)
+
+    ready_log = LogEntry(
+        level="INFO",
+        message="Warm-up finished",
+        service_name="Warm-up",
+        trace_id=None,
+        context=dict(state.steps),
+    )
+    logging.info(ready_log)
@@ -1 +1,5 @@
-from .decision_logic import get_routes
+from .decision_logic import get_routes, get_priority
+from .routing_rules import CompiledRuleSet, RoutingRule, RuleSetLoader, get_rule_set, load_rule_set, \
+    PRIORITY_NORMAL, PRIORITY_HIGH, PRIORITIES
+from .contacts import ContactIndex, ContactIndexLoader, SenderRule, get_contact_index, load_contact_index, \
+    normalize_number
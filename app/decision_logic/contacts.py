@@ -0,0 +1,321 @@
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from app.decision_logic.routing_rules import PRIORITIES
+from app.models import LogEntry
+
+DEFAULT_CONTACTS_RELOAD_INTERVAL = 30.0
+DEFAULT_COUNTRY_CODE = "1"
+ACTION_BLOCK = "block"
+
+_NON_DIGITS = re.compile(r"[^0-9]")
+
+
+def normalize_number(number: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> str:
+    """
+    Normalizes a phone number to E.164, or to bare digits for short codes
+
+    Formatting characters are dropped and an international 00 prefix becomes +. National numbers
+    get default_country_code when they have as many digits as a NANP number, or when they start with
+    a 0 trunk prefix, which is dropped.
+
+    Args:
+        number: Number as written in a webhook or the contact list, e.g. "(415) 555-0123"
+        default_country_code: Country code of national numbers
+
+    Returns:
+        str: "+14155550123" style number, or the digits of a short code such as "87654"
+    """
+    number = number.strip()
+    digits = _NON_DIGITS.sub("", number)
+    if number.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) == 10:
+        return f"+{default_country_code}{digits}"
+    if len(digits) == 11 and digits.startswith(default_country_code):
+        return f"+{digits}"
+    if len(digits) >= 8 and digits.startswith("0"):
+        return f"+{default_country_code}{digits[1:]}"
+    return digits
+
+
+@dataclass(frozen=True)
+class SenderRule:
+    """
+    Per-sender routing override
+
+    Attributes:
+        number (str): Normalized number, or the prefix it applies to
+        prefix (bool): True if every number starting with number matches
+        name (str | None): Display name of the contact
+        routes (tuple[str, ...] | None): Routes replacing the content routes, None keeps them
+        blocked (bool): True if messages from the sender are dropped
+        priority (str | None): Scheduling priority replacing the content priority
+    """
+    number: str
+    prefix: bool = False
+    name: str | None = None
+    routes: tuple[str, ...] | None = None
+    blocked: bool = False
+    priority: str | None = None
+
+
+class ContactIndex:
+    """
+    Sender rules indexed on normalized numbers
+
+    Exact numbers are looked up in a dict. Prefix rules, written with a trailing * such as "+1415*"
+    for an area code or "2*" for a short code range, are kept in a dict per prefix length, so a
+    lookup costs one probe per distinct prefix length, longest first. An exact number wins over any
+    prefix, and a longer prefix wins over a shorter one.
+
+    Attributes:
+        default_country_code (str): Country code of national numbers
+    """
+    def __init__(self, rules: list[SenderRule], default_country_code: str = DEFAULT_COUNTRY_CODE):
+        self.default_country_code = default_country_code
+        self._exact = {rule.number: rule for rule in rules if not rule.prefix}
+        self._prefixes = {rule.number: rule for rule in rules if rule.prefix}
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._prefixes)
+
+    def rules(self) -> dict[tuple[str, bool], SenderRule]:
+        """
+        Returns:
+            dict[tuple[str, bool], SenderRule]: Every rule keyed on (number, prefix)
+        """
+        return {
+            **{(number, False): rule for number, rule in self._exact.items()},
+            **{(number, True): rule for number, rule in self._prefixes.items()},
+        }
+
+    def lookup(self, sender: str | None) -> SenderRule | None:
+        """
+        Gets the rule of a sender
+
+        Args:
+            sender: Sender number in any format
+
+        Returns:
+            SenderRule | None: Exact rule, else the longest matching prefix rule, else None
+        """
+        if not sender:
+            return None
+        number = normalize_number(sender, self.default_country_code)
+        rule = self._exact.get(number)
+        if rule is not None:
+            return rule
+        for length in self._prefix_lengths:
+            if length <= len(number):
+                rule = self._prefixes.get(number[:length])
+                if rule is not None:
+                    return rule
+        return None
+
+
+def _parse_rule(entry: dict, default_country_code: str) -> SenderRule:
+    number = str(entry["number"]).strip()
+    prefix = number.endswith("*")
+    if prefix:
+        number = number[:-1]
+        digits = _NON_DIGITS.sub("", number)
+        number = f"+{digits}" if number.strip().startswith("+") else digits
+    else:
+        number = normalize_number(number, default_country_code)
+    if not _NON_DIGITS.sub("", number):
+        raise ValueError(f"invalid number {entry['number']!r}")
+
+    routes = entry.get("routes")
+    if isinstance(routes, str):
+        routes = [route.strip() for route in routes.split(";") if route.strip()] if routes.strip() else None
+    priority = entry.get("priority") or None
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority} of {entry['number']}")
+    blocked = entry.get("blocked")
+    if blocked is None:
+        blocked = (entry.get("action") or "").strip().lower() == ACTION_BLOCK
+    return SenderRule(
+        number=number,
+        prefix=prefix,
+        name=(entry.get("name") or "").strip() or None,
+        routes=tuple(routes) if routes is not None else None,
+        blocked=bool(blocked),
+        priority=priority,
+    )
+
+
+def load_contact_index(path: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> ContactIndex:
+    """
+    Loads sender rules from a CSV or JSON contact list
+
+    CSV files have a header with a number column and optional name, routes (separated by ;), action
+    ("block") and priority columns. JSON files hold {"contacts": [...]} with the same keys, where
+    routes is a list and blocked may replace action. Numbers ending in * are prefixes.
+
+    Args:
+        path: Path of the contact list, .csv or .json
+        default_country_code: Country code of national numbers
+
+    Returns:
+        ContactIndex: Indexed sender rules
+
+    Raises:
+        ValueError: If the file is not valid or contains an invalid entry
+    """
+    with open(path, "r", encoding="UTF-8", newline="") as contacts_file:
+        if path.lower().endswith(".json"):
+            entries = json.load(contacts_file)
+            if isinstance(entries, dict):
+                entries = entries.get("contacts")
+            if not isinstance(entries, list):
+                raise ValueError(f"Invalid contacts in {path}: expected a list of contacts")
+            start = 1
+        else:
+            entries = csv.DictReader(contacts_file)
+            # Line 1 is the header
+            start = 2
+
+        rules = []
+        for line, entry in enumerate(entries, start=start):
+            try:
+                rules.append(_parse_rule(entry, default_country_code))
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                raise ValueError(f"Invalid contact {line} in {path}: {str(e)}") from e
+    return ContactIndex(rules, default_country_code)
+
+
+def _log_load_failure(message: str, error: Exception) -> None:
+    failure_log = LogEntry(
+        level="ERROR",
+        message=f"{message}. {str(error)}",
+        service_name="Message Router",
+        trace_id=None,
+        context=None
+    )
+    logging.error(failure_log)
+
+
+class ContactIndexLoader:
+    """
+    Holds the active contact index and reloads it in the background when the contact list changes
+
+    The file modification time is checked at most once per reload interval. A changed file is parsed
+    in full on a background thread while routing keeps using the active index, and the new index
+    replaces it in one assignment. The reload logs how many contacts were added, removed and changed.
+    A missing or invalid file is logged and the previous index stays active. If the first load
+    fails, routing runs without contact rules until a reload succeeds.
+
+    Attributes:
+        path (str): Path of the contact list
+        reload_interval (float): Minimum seconds between modification checks
+    """
+    def __init__(self, path: str, reload_interval: float = DEFAULT_CONTACTS_RELOAD_INTERVAL,
+                 default_country_code: str = DEFAULT_COUNTRY_CODE):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.default_country_code = default_country_code
+        self._lock = threading.Lock()
+        self._next_check = time.monotonic() + reload_interval
+        try:
+            self._mtime = os.stat(path).st_mtime_ns
+            self._index = load_contact_index(path, default_country_code)
+        except (OSError, ValueError) as e:
+            _log_load_failure("Failed to load contacts, routing without contact rules", e)
+            # Any file found by the next check is loaded
+            self._mtime = None
+            self._index = ContactIndex([], default_country_code)
+
+    def get(self) -> ContactIndex:
+        """
+        Returns:
+            ContactIndex: The active index. Never waits for a reload
+        """
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            self._next_check = time.monotonic() + self.reload_interval
+            threading.Thread(target=self._reload_in_background, name="contacts-reload", daemon=True).start()
+        return self._index
+
+    def _reload_in_background(self) -> None:
+        try:
+            self.reload_if_changed()
+        finally:
+            self._lock.release()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the contact list if its modification time changed
+
+        Returns:
+            bool: True if a new index was activated
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            loaded = load_contact_index(self.path, self.default_country_code)
+        except (OSError, ValueError) as e:
+            _log_load_failure("Failed to reload contacts", e)
+            return False
+
+        previous = self._index.rules()
+        current = loaded.rules()
+        added = sum(1 for key in current if key not in previous)
+        removed = sum(1 for key in previous if key not in current)
+        changed = sum(1 for key, rule in current.items() if key in previous and previous[key] != rule)
+        self._index = loaded
+        self._mtime = mtime
+
+        reload_log = LogEntry(
+            level="INFO",
+            message=f"Reloaded {len(loaded)} contacts",
+            service_name="Message Router",
+            trace_id=None,
+            context={"added": added, "removed": removed, "changed": changed},
+        )
+        logging.info(reload_log)
+        return True
+
+
+_contacts_loader: ContactIndexLoader | None = None
+_contacts_loader_lock = threading.Lock()
+# Set once CONTACTS_PATH was found unset, so routing does not read the environment for every message
+_contacts_disabled = False
+
+
+def get_contact_index() -> ContactIndex | None:
+    """
+    Gets the active contact index
+
+    Contacts are read from CONTACTS_PATH and checked for changes every CONTACTS_RELOAD_INTERVAL
+    seconds. National numbers get the CONTACTS_DEFAULT_COUNTRY_CODE country code. The first call
+    parses the whole contact list, so it is made at startup, off the event loop.
+
+    Returns:
+        ContactIndex | None: The active index, or None if CONTACTS_PATH is not set
+    """
+    global _contacts_loader, _contacts_disabled
+    if _contacts_loader is None:
+        if _contacts_disabled:
+            return None
+        path = os.environ.get("CONTACTS_PATH")
+        if not path:
+            _contacts_disabled = True
+            return None
+        with _contacts_loader_lock:
+            if _contacts_loader is None:
+                _contacts_loader = ContactIndexLoader(
+                    path,
+                    float(os.environ.get("CONTACTS_RELOAD_INTERVAL", DEFAULT_CONTACTS_RELOAD_INTERVAL)),
+                    os.environ.get("CONTACTS_DEFAULT_COUNTRY_CODE", DEFAULT_COUNTRY_CODE),
+                )
+    return _contacts_loader.get()
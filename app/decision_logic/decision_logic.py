@@ -1,25 +1,20 @@
 import logging
-import re
 
+from app.decision_logic.contacts import get_contact_index
+from app.decision_logic.routing_rules import get_rule_set, PRIORITY_NORMAL
+from app.metrics import MESSAGES_BLOCKED
 from app.models import LogEntry
 from app.exceptions import RouteProcessingError
 
-mfa_code_words = [
-    "code",
-    "verification",
-    "authentication",
-    "login",
-    "passcode",
-    "authentication",
-    "access",
-    "sign-in"
-]
-
 
 def get_routes(msg: dict) -> dict:
     """
     Filters and sets route field for incoming messages
 
+    Routes come from the compiled routing rules, see routing_rules.json. A sender rule from the
+    contact list replaces them, blocked senders get no routes, and a known contact's display name is
+    added as "contact_name"
+
     Args:
         msg: extracted message data in dict format
 
@@ -30,19 +25,17 @@ def get_routes(msg: dict) -> dict:
         RouteProcessingError
     """
     try:
-        body = msg["body"]
-        routes = []
-
-        if "[CRITICAL]" in body:
-            routes = ["email", "text", "discord"]
-        elif "[WARNING]" in body:
-            routes = ["email", "discord"]
-        elif any(word in body for word in mfa_code_words) and re.search(r"\b\d{4,8}\b", body):
-            routes = ["email", "text"]
-        else:
-            routes = ["email"]
-
-        msg["routes"] = routes
+        msg["routes"] = get_rule_set().classify(msg["body"])
+        contacts = get_contact_index()
+        sender_rule = contacts.lookup(msg.get("from")) if contacts is not None else None
+        if sender_rule is not None:
+            if sender_rule.name:
+                msg["contact_name"] = sender_rule.name
+            if sender_rule.blocked:
+                MESSAGES_BLOCKED.inc()
+                msg["routes"] = []
+            elif sender_rule.routes is not None:
+                msg["routes"] = list(sender_rule.routes)
         return msg
     except Exception as e:
         failure_log = LogEntry(
@@ -52,7 +45,37 @@ def get_routes(msg: dict) -> dict:
             trace_id=None,
             context=None
         )
-        logging.error(failure_log.to_json())
+        logging.error(failure_log)
         raise RouteProcessingError(e)
 
 
+def get_priority(body: str | None, sender: str | None = None) -> str:
+    """
+    Gets the scheduling priority of a message from the routing rules, before it is fetched or routed
+
+    Args:
+        body: Message body from the webhook payload, if it has one
+        sender: Sender number from the webhook payload. A sender rule's priority wins over the body's
+
+    Returns:
+        str: "high" for messages such as critical alerts, MFA codes and on-call numbers, otherwise "normal"
+    """
+    try:
+        contacts = get_contact_index()
+        sender_rule = contacts.lookup(sender) if contacts is not None else None
+        if sender_rule is not None and sender_rule.priority is not None:
+            return sender_rule.priority
+        if not body:
+            return PRIORITY_NORMAL
+        return get_rule_set().priority(body)
+    except Exception as e:
+        # Routing errors surface when the message is delivered, scheduling falls back to normal
+        failure_log = LogEntry(
+            level="ERROR",
+            message=f"Unable to prioritize message. {str(e)}",
+            service_name="Message Router",
+            trace_id=None,
+            context=None
+        )
+        logging.error(failure_log)
+        return PRIORITY_NORMAL
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+from app.models import LogEntry
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "routing_rules.json")
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+PRIORITY_NORMAL = "normal"
+PRIORITY_HIGH = "high"
+PRIORITIES = (PRIORITY_NORMAL, PRIORITY_HIGH)
+# Up to this many keywords, checking each with a substring search beats one regex scan of the body
+MAX_SUBSTRING_KEYWORDS = 32
+
+
+@dataclass
+class RoutingRule:
+    name: str
+    routes: list[str]
+    keywords: list[str] = field(default_factory=list)
+    pattern: str | None = None
+    priority: str = PRIORITY_NORMAL
+
+
+def _trie_pattern(keywords: list[str]) -> str:
+    """
+    Builds a regular expression matching any of the keywords, nested as a prefix tree
+
+    At each position of a body the expression follows a single path down the tree, so its cost does
+    not grow with the number of keywords, and it matches the longest keyword starting there.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for character in keyword:
+            node = node.setdefault(character, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [re.escape(character) + build(child) for character, child in sorted(node.items()) if character]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if ends_here:
+            return f"(?:{group})?"
+        return group
+
+    return build(trie)
+
+
+class CompiledRuleSet:
+    """
+    Routing rules compiled for classifying message bodies by keyword
+
+    Rules are listed in priority order and the first satisfied rule decides the routes. A rule is
+    satisfied when one of its keywords is in the body and, if it has a pattern, the pattern matches
+    as well. Patterns are only evaluated for rules whose keywords were found.
+
+    Up to MAX_SUBSTRING_KEYWORDS keywords, rules are checked in priority order with substring
+    searches, which run far faster than a regex scan and stop at the first satisfied rule. Larger
+    rule sets compile all keywords into one prefix tree expression, so the body is scanned once
+    whatever the number of keywords. The longest keyword found at a position is mapped to every
+    rule with that keyword or with a keyword that is a prefix of it, since those matched there too,
+    and the scan resumes at the next position, so overlapping keywords are never missed. The scan
+    stops once every keyword rule that could beat the best satisfied rule was checked.
+
+    Attributes:
+        rules (list[RoutingRule]): Rules in priority order
+        default_routes (list[str]): Routes used when no rule is satisfied
+    """
+    def __init__(self, rules: list[RoutingRule], default_routes: list[str]):
+        self.rules = rules
+        self.default_routes = default_routes
+        self._patterns = {
+            index: re.compile(rule.pattern) for index, rule in enumerate(rules) if rule.pattern
+        }
+        # Rules without keywords only depend on their pattern, if any
+        self._unconditional = [index for index, rule in enumerate(rules) if not rule.keywords]
+
+        keyword_rules: dict[str, set[int]] = {}
+        for index, rule in enumerate(rules):
+            for keyword in rule.keywords:
+                if keyword:
+                    keyword_rules.setdefault(keyword, set()).add(index)
+        # Rules to check when a keyword is the longest match at a position, in priority order
+        self._keyword_rules = {
+            keyword: tuple(sorted(set().union(*(
+                keyword_rules[keyword[:length]] for length in range(1, len(keyword) + 1)
+                if keyword[:length] in keyword_rules
+            ))))
+            for keyword in keyword_rules
+        }
+        self._keyword_rule_indexes = sorted(set().union(*keyword_rules.values()))
+        self._keyword_rule_count = len(self._keyword_rule_indexes)
+        self._keyword_regex = None
+        if len(keyword_rules) > MAX_SUBSTRING_KEYWORDS:
+            self._keyword_regex = re.compile(_trie_pattern(list(keyword_rules)))
+        # (index, keywords) in priority order, where keywords is None for rules without keywords
+        self._substring_rules = [
+            (index, tuple(keyword for keyword in rule.keywords if keyword) if rule.keywords else None)
+            for index, rule in enumerate(rules)
+        ]
+
+    def _satisfied(self, index: int, body: str) -> bool:
+        pattern = self._patterns.get(index)
+        return pattern is None or pattern.search(body) is not None
+
+    def _match_substrings(self, body: str) -> RoutingRule | None:
+        for index, keywords in self._substring_rules:
+            if keywords is not None:
+                for keyword in keywords:
+                    if keyword in body:
+                        break
+                else:
+                    continue
+            if self._satisfied(index, body):
+                return self.rules[index]
+        return None
+
+    def match(self, body: str) -> RoutingRule | None:
+        """
+        Gets the rule that decides the routes for a message body
+
+        Args:
+            body: Message body
+
+        Returns:
+            RoutingRule | None: First satisfied rule, or None if the default routes apply
+        """
+        if not isinstance(body, str):
+            raise TypeError("Message body must be a string")
+        if self._keyword_regex is None:
+            return self._match_substrings(body)
+
+        best = len(self.rules)
+        search = self._keyword_regex.search
+        checked = set()
+        # Keyword rules that could still beat best
+        remaining = self._keyword_rule_count
+        keyword_match = search(body)
+        while keyword_match is not None:
+            for index in self._keyword_rules[keyword_match.group()]:
+                if index >= best:
+                    break
+                if index in checked:
+                    continue
+                checked.add(index)
+                remaining -= 1
+                if self._satisfied(index, body):
+                    best = index
+                    remaining = bisect_left(self._keyword_rule_indexes, best) - sum(
+                        1 for checked_index in checked if checked_index < best
+                    )
+                    break
+            if not remaining:
+                break
+            keyword_match = search(body, keyword_match.start() + 1)
+
+        for index in self._unconditional:
+            if index >= best:
+                break
+            if self._satisfied(index, body):
+                best = index
+                break
+        return self.rules[best] if best < len(self.rules) else None
+
+    def priority(self, body: str) -> str:
+        """
+        Gets the scheduling priority for a message body
+
+        Args:
+            body: Message body
+
+        Returns:
+            str: Priority of the first satisfied rule, or "normal"
+        """
+        rule = self.match(body)
+        return rule.priority if rule is not None else PRIORITY_NORMAL
+
+    def classify(self, body: str) -> list[str]:
+        """
+        Gets the routes for a message body
+
+        Args:
+            body: Message body
+
+        Returns:
+            list[str]: Routes of the first satisfied rule, or the default routes
+        """
+        rule = self.match(body)
+        return list(rule.routes if rule is not None else self.default_routes)
+
+
+def load_rule_set(path: str) -> CompiledRuleSet:
+    """
+    Loads and compiles routing rules from a JSON file
+
+    Args:
+        path: Path of the rules file
+
+    Returns:
+        CompiledRuleSet: Compiled rules
+
+    Raises:
+        ValueError: If the file is not valid JSON or contains an invalid rule
+    """
+    with open(path, "r", encoding="UTF-8") as rules_file:
+        config = json.load(rules_file)
+
+    try:
+        rules = [
+            RoutingRule(
+                name=rule["name"],
+                routes=list(rule["routes"]),
+                keywords=list(rule.get("keywords", [])),
+                pattern=rule.get("pattern"),
+                priority=rule.get("priority", PRIORITY_NORMAL),
+            )
+            for rule in config["rules"]
+        ]
+        for rule in rules:
+            if rule.priority not in PRIORITIES:
+                raise ValueError(f"Invalid routing rules in {path}: unknown priority {rule.priority} of rule {rule.name}")
+        return CompiledRuleSet(rules, list(config.get("default_routes", ["email"])))
+    except (KeyError, TypeError, re.error) as e:
+        raise ValueError(f"Invalid routing rules in {path}: {str(e)}") from e
+
+
+class RuleSetLoader:
+    """
+    Holds the active rule set and hot reloads it when the rules file changes
+
+    The file modification time is checked at most once per reload interval. A new rule set is
+    compiled before it replaces the active one, so classification never sees a partial update.
+    Invalid files are logged and the previous rules stay active.
+
+    Attributes:
+        path (str): Path of the rules file
+        reload_interval (float): Minimum seconds between modification checks
+    """
+    def __init__(self, path: str, reload_interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._rule_set = load_rule_set(path)
+        self._next_check = time.monotonic() + reload_interval
+
+    def get(self) -> CompiledRuleSet:
+        """
+        Returns:
+            CompiledRuleSet: The active rule set
+        """
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = time.monotonic() + self.reload_interval
+                self._reload_if_changed()
+            finally:
+                self._lock.release()
+        return self._rule_set
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            rule_set = load_rule_set(self.path)
+        except (OSError, ValueError) as e:
+            failure_log = LogEntry(
+                level="ERROR",
+                message=f"Failed to reload routing rules. {str(e)}",
+                service_name="Message Router",
+                trace_id=None,
+                context=None
+            )
+            logging.error(failure_log)
+            return
+
+        self._rule_set = rule_set
+        self._mtime = mtime
+
+
+_loader: RuleSetLoader | None = None
+_loader_lock = threading.Lock()
+
+
+def get_rule_set() -> CompiledRuleSet:
+    """
+    Gets the active routing rule set
+
+    Rules are read from ROUTING_RULES_PATH, or the bundled routing_rules.json, and checked for
+    changes every ROUTING_RULES_RELOAD_INTERVAL seconds.
+
+    Returns:
+        CompiledRuleSet: The active rule set
+    """
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = RuleSetLoader(
+                    os.environ.get("ROUTING_RULES_PATH", DEFAULT_RULES_PATH),
+                    float(os.environ.get("ROUTING_RULES_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL)),
+                )
+    return _loader.get()
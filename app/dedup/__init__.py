@@ -0,0 +1 @@
+from .dedup import MessageDedupCache, get_dedup_cache, STATUS_PENDING, STATUS_DELIVERED, STATUS_NOT_FOUND
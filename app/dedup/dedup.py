@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DEDUP_TTL = 3600.0
+DEFAULT_DEDUP_NEGATIVE_TTL = 600.0
+DEFAULT_DEDUP_MAX_ENTRIES = 100_000
+
+STATUS_PENDING = "pending"
+STATUS_DELIVERED = "delivered"
+STATUS_NOT_FOUND = "not_found"
+
+
+class MessageDedupCache:
+    """
+    Idempotency cache keyed on MessageSid
+
+    Uses a bounded in-memory LRU with per-entry expiry, backed by an optional SQLite tier that
+    survives restarts and is shared between processes on the same instance.
+
+    Attributes:
+        ttl (float): Seconds a claimed or delivered MessageSid is remembered
+        negative_ttl (float): Seconds a negative result such as a missing message is remembered
+        max_entries (int): Maximum number of MessageSids held in memory
+    """
+    def __init__(
+            self,
+            ttl: float = DEFAULT_DEDUP_TTL,
+            negative_ttl: float = DEFAULT_DEDUP_NEGATIVE_TTL,
+            max_entries: int = DEFAULT_DEDUP_MAX_ENTRIES,
+            path: str | None = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS message_sids "
+                "(sid TEXT PRIMARY KEY, status TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _remember(self, sid: str, status: str, expires_at: float) -> None:
+        self._entries[sid] = (expires_at, status)
+        self._entries.move_to_end(sid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def claim(self, sid: str) -> bool:
+        """
+        Claims a MessageSid for processing
+
+        Args:
+            sid: MessageSid of the incoming webhook
+
+        Returns:
+            bool: True if the MessageSid has not been seen within its TTL, False for a repeat delivery
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(sid)
+                return False
+
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM message_sids WHERE sid = ? AND expires_at <= ?", (sid, now))
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO message_sids (sid, status, expires_at) VALUES (?, ?, ?)",
+                    (sid, STATUS_PENDING, expires_at),
+                )
+                if cursor.rowcount == 0:
+                    row = self._connection.execute(
+                        "SELECT status, expires_at FROM message_sids WHERE sid = ?", (sid,)
+                    ).fetchone()
+                    if row:
+                        self._remember(sid, row[0], row[1])
+                    return False
+
+            self._remember(sid, STATUS_PENDING, expires_at)
+            return True
+
+    def record(self, sid: str, status: str) -> None:
+        """
+        Records the outcome of processing a MessageSid
+
+        Args:
+            sid: MessageSid that was processed
+            status: STATUS_DELIVERED, or STATUS_NOT_FOUND to cache a negative result
+        """
+        ttl = self.negative_ttl if status == STATUS_NOT_FOUND else self.ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(sid, status, expires_at)
+            if self._connection is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO message_sids (sid, status, expires_at) VALUES (?, ?, ?)",
+                    (sid, status, expires_at),
+                )
+
+    def release(self, sid: str) -> None:
+        """
+        Forgets a MessageSid so a retried webhook is processed again. Used after transient failures
+        """
+        with self._lock:
+            self._entries.pop(sid, None)
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM message_sids WHERE sid = ?", (sid,))
+
+    def get_status(self, sid: str) -> str | None:
+        """
+        Returns:
+            str: Status of a MessageSid held in memory
+            None: If the MessageSid is unknown or expired
+        """
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry and entry[0] > time.time():
+                return entry[1]
+            return None
+
+
+_dedup_cache: MessageDedupCache | None = None
+_dedup_cache_lock = threading.Lock()
+
+
+def get_dedup_cache() -> MessageDedupCache:
+    """
+    Gets the process-wide dedup cache configured from environment variables
+
+    DEDUP_TTL, DEDUP_NEGATIVE_TTL and DEDUP_MAX_ENTRIES size the in-memory tier.
+    DEDUP_DB_PATH enables the on-disk tier.
+
+    Returns:
+        MessageDedupCache: Shared dedup cache
+    """
+    global _dedup_cache
+    with _dedup_cache_lock:
+        if _dedup_cache is None:
+            _dedup_cache = MessageDedupCache(
+                ttl=float(os.environ.get("DEDUP_TTL", DEFAULT_DEDUP_TTL)),
+                negative_ttl=float(os.environ.get("DEDUP_NEGATIVE_TTL", DEFAULT_DEDUP_NEGATIVE_TTL)),
+                max_entries=int(os.environ.get("DEDUP_MAX_ENTRIES", DEFAULT_DEDUP_MAX_ENTRIES)),
+                path=os.environ.get("DEDUP_DB_PATH") or None,
+            )
+        return _dedup_cache
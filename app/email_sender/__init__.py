@@ -1 +1,6 @@
-from .email_sender import EmailSender
+from .email_sender import EmailSender, get_configured_credentials, get_delegated_credentials, \
+    refresh_cached_credentials, reset_credentials_cache, warm_up_email_sender
+from .discovery import get_gmail_discovery_document, load_gmail_discovery_document
+from .async_email_sender import AsyncEmailSender, get_async_http_client, close_async_http_client
+from .batch_sender import BatchEmailSender, send_gmail_batch
+from .transport import AuthorizedHttpPool
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+from app.email_sender.discovery import get_gmail_discovery_document
+from app.email_sender.email_sender import EmailSender, get_configured_credentials, is_transient_gmail_error, \
+    is_unsent_gmail_error
+from app.email_sender.transport import DEFAULT_HTTP_POOL_SIZE
+from app.lazy_imports import lazy_import
+from app.resilience import get_retry_policy
+
+httpx = lazy_import("httpx")
+GoogleAuthRequest = lazy_import("google.auth.transport.requests", "Request")
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Gets the shared httpx client used for Gmail requests. Must be called from the event loop
+
+    Pool size is read from the GMAIL_HTTP_POOL_SIZE environment variable.
+
+    Returns:
+        httpx.AsyncClient: Shared keep-alive HTTP client
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        pool_size = int(os.environ.get("GMAIL_HTTP_POOL_SIZE", DEFAULT_HTTP_POOL_SIZE))
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(30.0),
+        )
+    return _http_client
+
+
+async def close_async_http_client() -> None:
+    """
+    Closes the shared httpx client
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_send_url() -> str:
+    """
+    Builds the Gmail messages.send URL from the discovery document
+
+    The GMAIL_API_ENDPOINT environment variable overrides the root URL.
+
+    Returns:
+        str: URL of the users.messages.send method for the authenticated user
+    """
+    document = get_gmail_discovery_document()
+    root_url = os.environ.get("GMAIL_API_ENDPOINT", document["rootUrl"])
+    path = document["resources"]["users"]["resources"]["messages"]["methods"]["send"]["path"]
+    return f"{root_url.rstrip('/')}/{document['servicePath']}{path.format(userId='me')}"
+
+
+class AsyncEmailSender:
+    """
+    Sends emails via the Gmail REST API without blocking the event loop
+
+    Shares delegated credentials with EmailSender and sends through one pooled httpx client.
+
+    Attributes:
+        credentials (google.oauth2.service_account.Credentials): Delegated credentials
+        http_client (httpx.AsyncClient): Shared HTTP client
+    """
+    build_email = staticmethod(EmailSender.build_email)
+
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
+        """
+        Raises:
+            MissingCredentialsException: If required environment variables are not set.
+            CustomGoogleAuthError: If authentication with Google APIs fails.
+        """
+        self.credentials = get_configured_credentials()
+        self.http_client = http_client or get_async_http_client()
+
+    async def _get_token(self) -> str:
+        if not self.credentials.valid:
+            # Only reached before the background refresher has minted a token
+            await asyncio.to_thread(self.credentials.refresh, GoogleAuthRequest())
+        return self.credentials.token
+
+    async def send_email(self, encoded_msg: str) -> dict:
+        """
+        Sends an encoded message behind the gmail circuit breaker, retrying failures that sent nothing
+
+        Raises:
+            CircuitOpenError: If the gmail circuit breaker is open
+        """
+        if not isinstance(encoded_msg, str):
+            raise TypeError("encoded_msg must be a string")
+        return await get_retry_policy("gmail", is_transient_gmail_error).call_async(
+            lambda: self._send(encoded_msg), retry_if=is_unsent_gmail_error
+        )
+
+    async def _send(self, encoded_msg: str) -> dict:
+        token = await self._get_token()
+        response = await self.http_client.post(
+            get_send_url(),
+            json={"raw": encoded_msg},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        return response.json()
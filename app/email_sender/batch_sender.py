@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable
+
+from app.email_sender.email_sender import EmailSender
+from app.exceptions import SinkTimeoutError
+from app.metrics import GMAIL_BATCH_SIZE
+from app.models import LogEntry
+
+# Gmail starts throttling batches of more than 50 sends
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_WINDOW = 0.05
+DEFAULT_BATCH_CONCURRENCY = 4
+
+
+def send_gmail_batch(encoded_msgs: list[str]) -> list:
+    """
+    Sends encoded messages through the Gmail batch endpoint with the shared EmailSender service
+
+    Returns:
+        list: Gmail response, or the exception that failed it, for every message in order
+    """
+    return EmailSender().send_batch(encoded_msgs)
+
+
+class BatchEmailSender:
+    """
+    Collects encoded emails and sends them to Gmail in batches, one HTTP request per batch
+
+    Batches are sent from concurrency background threads. The window adapts to traffic: a message
+    arriving while the sender is idle, more than window seconds after the previous one, is sent at
+    once, so a lone message pays no extra latency. A message arriving within window seconds of the
+    previous one starts a batch that is sent window seconds later, or as soon as max_batch_size
+    messages are waiting. While every thread has a batch in flight, messages wait for the next free one.
+
+    Attributes:
+        max_batch_size (int): Most messages sent in one batch request
+        window (float): Seconds a batch collects messages during a burst
+        concurrency (int): Most batch requests in flight at once
+    """
+    def __init__(
+            self,
+            send_batch: Callable[[list[str]], list] = send_gmail_batch,
+            max_batch_size: int = DEFAULT_BATCH_SIZE,
+            window: float = DEFAULT_BATCH_WINDOW,
+            concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_batch_size = max(max_batch_size, 1)
+        self.window = window
+        self.concurrency = max(concurrency, 1)
+        self._send_batch = send_batch
+        self._clock = clock
+        self._pending: deque[tuple[str, Future]] = deque()
+        self._flush_at = 0.0
+        self._last_arrival = float("-inf")
+        self._changed = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+
+    def submit(self, encoded_msg: str) -> Future:
+        """
+        Queues an encoded message for the next batch
+
+        Args:
+            encoded_msg: Message built by EmailSender.build_email
+
+        Returns:
+            Future: Resolves to the Gmail response, or fails with the error of the message
+
+        Raises:
+            RuntimeError: If the sender is closed
+        """
+        if not isinstance(encoded_msg, str):
+            raise TypeError("encoded_msg must be a string")
+        future = Future()
+        with self._changed:
+            if self._stopping:
+                raise RuntimeError("Batch email sender is closed")
+            now = self._clock()
+            if not self._pending:
+                idle = now - self._last_arrival > self.window
+                self._flush_at = now if idle else now + self.window
+            self._last_arrival = now
+            self._pending.append((encoded_msg, future))
+            if not self._threads:
+                for i in range(self.concurrency):
+                    thread = threading.Thread(target=self._run, name=f"gmail-batch-sender-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._changed.notify()
+        return future
+
+    def send_email(self, encoded_msg: str, timeout: float | None = None):
+        """
+        Sends an encoded message in the next batch and waits for its result
+
+        Args:
+            encoded_msg: Message built by EmailSender.build_email
+            timeout: Seconds to wait for the result. None waits until the batch is sent
+
+        Raises:
+            SinkTimeoutError: If no result arrived within timeout. The message is dropped if its batch
+                was not sent yet
+            Exception: Error Gmail returned for the message, or the error of its batch request
+        """
+        future = self.submit(encoded_msg)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise SinkTimeoutError("email") from None
+
+    async def send_email_async(self, encoded_msg: str):
+        """
+        Async counterpart of send_email. Cancelling it drops the message if its batch was not sent yet
+        """
+        return await asyncio.wrap_future(self.submit(encoded_msg))
+
+    def _next_batch(self) -> list[tuple[str, Future]] | None:
+        with self._changed:
+            while True:
+                if self._pending and (self._stopping or len(self._pending) >= self.max_batch_size):
+                    break
+                now = self._clock()
+                if self._pending and now >= self._flush_at:
+                    break
+                if self._stopping:
+                    return None
+                self._changed.wait(self._flush_at - now if self._pending else None)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                encoded_msg, future = self._pending.popleft()
+                # Cancelled futures belong to callers that timed out, their messages are dropped
+                if future.set_running_or_notify_cancel():
+                    batch.append((encoded_msg, future))
+            # Leftovers of a full batch go out with the next free thread
+            self._flush_at = self._clock()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: list[tuple[str, Future]]) -> None:
+        GMAIL_BATCH_SIZE.observe(len(batch))
+        try:
+            results = self._send_batch([encoded_msg for encoded_msg, _ in batch])
+        except Exception as e:
+            failure_log = LogEntry(
+                level="ERROR",
+                message=f"Failed to send batch of {len(batch)} emails. {str(e) or type(e).__name__}",
+                service_name="EmailSender",
+                trace_id=None,
+                context={"messages": len(batch)},
+            )
+            logging.error(failure_log)
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self) -> None:
+        """
+        Sends the pending messages and stops the batch threads. Later submits raise RuntimeError
+        """
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from googleapiclient.discovery_cache import get_static_doc
+
+from app.exceptions import StaleDiscoveryDocumentException
+
+DEFAULT_DISCOVERY_MAX_AGE_DAYS = 180
+
+_discovery_document: dict | None = None
+_discovery_document_lock = threading.Lock()
+
+
+def get_gmail_discovery_document() -> dict:
+    """
+    Gets the parsed Gmail v1 discovery document
+
+    The document bundled with google-api-python-client is read and parsed once per process,
+    then reused from memory so building a Gmail service never fetches or re-parses it.
+
+    Returns:
+        dict: Parsed Gmail v1 discovery document
+
+    Raises:
+        FileNotFoundError: If no bundled Gmail discovery document is available
+    """
+    global _discovery_document
+    if _discovery_document is not None:
+        return _discovery_document
+
+    with _discovery_document_lock:
+        if _discovery_document is None:
+            content = get_static_doc("gmail", "v1")
+            if content is None:
+                raise FileNotFoundError("Bundled Gmail discovery document not found")
+            _discovery_document = json.loads(content)
+        return _discovery_document
+
+
+def get_discovery_document_age(document: dict) -> timedelta:
+    """
+    Gets the age of a discovery document based on its revision date
+
+    Args:
+        document: Parsed discovery document
+
+    Returns:
+        timedelta: Time elapsed since the document revision
+    """
+    revision = datetime.strptime(document["revision"], "%Y%m%d")
+    return datetime.now() - revision
+
+
+def load_gmail_discovery_document() -> dict:
+    """
+    Loads the Gmail discovery document at startup
+
+    When GMAIL_DISCOVERY_FAIL_ON_STALE is "true", startup fails if the bundled document revision
+    is older than GMAIL_DISCOVERY_MAX_AGE_DAYS days.
+
+    Returns:
+        dict: Parsed Gmail v1 discovery document
+
+    Raises:
+        StaleDiscoveryDocumentException: If the document is stale and fail fast is enabled
+    """
+    document = get_gmail_discovery_document()
+    if os.environ.get("GMAIL_DISCOVERY_FAIL_ON_STALE", "false").lower() != "true":
+        return document
+
+    max_age = timedelta(days=int(os.environ.get("GMAIL_DISCOVERY_MAX_AGE_DAYS", DEFAULT_DISCOVERY_MAX_AGE_DAYS)))
+    if get_discovery_document_age(document) > max_age:
+        raise StaleDiscoveryDocumentException(
+            f"Gmail discovery document revision {document['revision']} is older than {max_age.days} days"
+        )
+    return document
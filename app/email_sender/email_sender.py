@@ -1,18 +1,318 @@
+from __future__ import annotations
+
 import json
 import os
 import logging
 import base64
 import re
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from google.auth.exceptions import GoogleAuthError
-from google.cloud import secretmanager
 
 from app.exceptions import MissingCredentialsException, GoogleAuthError as CustomGoogleAuthError
+from app.email_sender.discovery import get_gmail_discovery_document
+from app.email_sender.transport import AuthorizedHttpPool, DEFAULT_HTTP_POOL_SIZE
+from app.lazy_imports import lazy_import
 from app.models import LogEntry
+from app.resilience import get_retry_policy
+
+# Google client libraries are only needed once a message is delivered by email
+GoogleAuthRequest = lazy_import("google.auth.transport.requests", "Request")
+service_account = lazy_import("google.oauth2.service_account")
+build_from_document = lazy_import("googleapiclient.discovery", "build_from_document")
+BatchHttpRequest = lazy_import("googleapiclient.http", "BatchHttpRequest")
+secretmanager = lazy_import("google.cloud.secretmanager")
+httplib2 = lazy_import("httplib2")
+httpx = lazy_import("httpx")
+
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+DEFAULT_CREDENTIALS_TTL = 3600
+DEFAULT_TOKEN_REFRESH_INTERVAL = 60
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Delegated credentials keyed on (project_id, secret_name, secret_version, delegated_user_email).
+# Values are (expires_at, credentials) where expires_at is a time.monotonic() deadline.
+_credentials_cache: dict[tuple, tuple[float, service_account.Credentials]] = {}
+_credentials_cache_lock = threading.Lock()
+# Gmail service and connection pool shared by every thread, as (credentials, service, http_pool)
+_transport: tuple | None = None
+_transport_lock = threading.Lock()
+_token_refresher: threading.Thread | None = None
+
+
+def _load_delegated_credentials(
+        project_id: str,
+        secret_name: str,
+        secret_version: str,
+        delegated_user_email: str
+) -> service_account.Credentials:
+    """
+    Loads service account details from Secret Manager and builds delegated credentials
+
+    Returns:
+        service_account.Credentials: Credentials delegated to the group inbox user
+    """
+    secret_client = secretmanager.SecretManagerServiceClient()
+    secret_path = f"projects/{project_id}/secrets/{secret_name}/versions/{secret_version}"
+    response = secret_client.access_secret_version(request={"name": secret_path})
+    payload = response.payload.data.decode("UTF-8")
+    credentials_info = json.loads(payload)
+
+    credentials = service_account.Credentials.from_service_account_info(
+        credentials_info,
+        scopes=GMAIL_SCOPES
+    )
+    return credentials.with_subject(delegated_user_email)
+
+
+def get_delegated_credentials(
+        project_id: str,
+        secret_name: str,
+        delegated_user_email: str,
+        secret_version: str = "latest"
+) -> service_account.Credentials:
+    """
+    Gets cached delegated credentials, loading them from Secret Manager when missing or expired
+
+    Cache lifetime is read from the GMAIL_CREDENTIALS_TTL environment variable (seconds).
+
+    Args:
+        project_id: Google Cloud project holding the secret
+        secret_name: Name of the service account secret
+        delegated_user_email: User the service account sends as
+        secret_version: Secret version to pin to. Defaults to "latest"
+
+    Returns:
+        service_account.Credentials: Delegated credentials shared across senders
+    """
+    key = (project_id, secret_name, secret_version, delegated_user_email)
+    with _credentials_cache_lock:
+        cached = _credentials_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        credentials = _load_delegated_credentials(project_id, secret_name, secret_version, delegated_user_email)
+        ttl = float(os.environ.get("GMAIL_CREDENTIALS_TTL", DEFAULT_CREDENTIALS_TTL))
+        _credentials_cache[key] = (time.monotonic() + ttl, credentials)
+
+    _start_token_refresher()
+    return credentials
+
+
+def get_configured_credentials() -> service_account.Credentials:
+    """
+    Gets cached delegated credentials using the configuration in environment variables
+
+    The secret version can be pinned with the SECRET_VERSION environment variable.
+
+    Returns:
+        service_account.Credentials: Delegated credentials shared across senders
+
+    Raises:
+        MissingCredentialsException: If required environment variables are not set.
+        CustomGoogleAuthError: If authentication with Google APIs fails.
+    """
+    delegated_user_email = os.environ.get("DELEGATED_USER_EMAIL", None)
+    project_id = os.environ.get("PROJECT_ID", None)
+    secret_name = os.environ.get("SECRET_NAME", None)
+    secret_version = os.environ.get("SECRET_VERSION", "latest")
+
+    if not all([delegated_user_email, project_id, secret_name]):
+        failure_log = LogEntry(
+            level="ERROR",
+            message="Missing required environment variables.",
+            service_name="EmailSender",
+            trace_id=None, # Trace ID and context will be filled out by the background task orchestrator
+            context=None
+        )
+        logging.error(failure_log)
+        raise MissingCredentialsException("Required credentials are missing.")
+
+    try:
+        return get_delegated_credentials(
+            project_id,
+            secret_name,
+            delegated_user_email,
+            secret_version
+        )
+    except (ValueError, FileNotFoundError, TypeError, GoogleAuthError) as e:
+        failure_log = LogEntry(
+            level="ERROR",
+            message=f"Error during authentication with Google APIs. {str(e)}",
+            service_name="EmailSender",
+            trace_id=None,  # Trace ID and context will be filled out by the background task orchestrator error log
+            context=None
+        )
+        logging.error(failure_log)
+        raise CustomGoogleAuthError("Failed to authenticate with Google APIs.") from e
+
+
+def _get_transport(credentials: service_account.Credentials) -> tuple:
+    """
+    Gets the shared Gmail service and connection pool for the given credentials, building them on
+    first use and again whenever the cached credentials are replaced
+
+    The GMAIL_API_ENDPOINT environment variable overrides the API root URL, and GMAIL_HTTP_POOL_SIZE
+    caps the pooled connections.
+
+    Returns:
+        tuple: Gmail service used to build requests, and the AuthorizedHttpPool they are executed on
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None and _transport[0] is credentials:
+            return _transport[1], _transport[2]
+
+        options = {}
+        api_endpoint = os.environ.get("GMAIL_API_ENDPOINT")
+        if api_endpoint:
+            options["client_options"] = {"api_endpoint": api_endpoint}
+        service = build_from_document(get_gmail_discovery_document(), credentials=credentials, **options)
+        http_pool = AuthorizedHttpPool(credentials, int(os.environ.get("GMAIL_HTTP_POOL_SIZE", DEFAULT_HTTP_POOL_SIZE)))
+        previous, _transport = _transport, (credentials, service, http_pool)
+    if previous is not None:
+        previous[2].close()
+    return service, http_pool
+
+
+def get_batch_url() -> str:
+    """
+    Builds the Gmail batch endpoint URL from the discovery document
+
+    The GMAIL_API_ENDPOINT environment variable overrides the root URL.
+
+    Returns:
+        str: URL batched requests are posted to
+    """
+    document = get_gmail_discovery_document()
+    root_url = os.environ.get("GMAIL_API_ENDPOINT", document["rootUrl"])
+    return f"{root_url.rstrip('/')}/{document.get('batchPath', 'batch')}"
+
+
+def _needs_refresh(credentials: service_account.Credentials) -> bool:
+    expiry = credentials.expiry
+    if expiry is None:
+        return not credentials.token
+    if not isinstance(expiry, datetime):
+        return False
+    return expiry - TOKEN_REFRESH_MARGIN <= datetime.utcnow()
+
+
+def refresh_cached_credentials() -> None:
+    """
+    Refreshes OAuth access tokens of cached credentials that are missing or close to expiry
+    """
+    with _credentials_cache_lock:
+        cached_credentials = [credentials for _, credentials in _credentials_cache.values()]
+
+    for credentials in cached_credentials:
+        try:
+            if _needs_refresh(credentials):
+                credentials.refresh(GoogleAuthRequest())
+        except GoogleAuthError as e:
+            failure_log = LogEntry(
+                level="ERROR",
+                message=f"Background token refresh failed. {str(e)}",
+                service_name="EmailSender",
+                trace_id=None,
+                context=None
+            )
+            logging.error(failure_log)
+
+
+def _token_refresh_loop() -> None:
+    interval = float(os.environ.get("GMAIL_TOKEN_REFRESH_INTERVAL", DEFAULT_TOKEN_REFRESH_INTERVAL))
+    while True:
+        refresh_cached_credentials()
+        time.sleep(interval)
+
+
+def _start_token_refresher() -> None:
+    global _token_refresher
+    with _credentials_cache_lock:
+        if _token_refresher is not None and _token_refresher.is_alive():
+            return
+        _token_refresher = threading.Thread(target=_token_refresh_loop, name="gmail-token-refresher", daemon=True)
+        _token_refresher.start()
+
+
+def reset_credentials_cache() -> None:
+    """
+    Drops all cached credentials and the shared Gmail service, closing its pooled connections
+    """
+    global _transport
+    with _credentials_cache_lock:
+        _credentials_cache.clear()
+    with _transport_lock:
+        previous, _transport = _transport, None
+    if previous is not None:
+        previous[2].close()
+
+
+def is_transient_gmail_error(error: Exception) -> bool:
+    """
+    Tells transient Gmail failures, worth retrying, from permanent ones such as a rejected message
+
+    Args:
+        error: Error raised by EmailSender or AsyncEmailSender
+
+    Returns:
+        bool: True for throttling, server errors, timeouts and connection failures
+    """
+    # googleapiclient's HttpError carries the response as resp, httpx.HTTPStatusError as response
+    response = getattr(error, "resp", None) or getattr(error, "response", None)
+    status = getattr(response, "status", None) or getattr(response, "status_code", None)
+    if status is not None:
+        return int(status) == 429 or int(status) >= 500
+    if isinstance(error, OSError):
+        return True
+    if "httplib2" in sys.modules and isinstance(error, httplib2.HttpLib2Error):
+        return True
+    return "httpx" in sys.modules and isinstance(error, httpx.TransportError)
+
+
+def is_unsent_gmail_error(error: Exception) -> bool:
+    """
+    Tells Gmail failures that provably sent nothing. messages.send is not idempotent, so only these
+    are retried. Timeouts and other server errors may follow a send that went through
+
+    Args:
+        error: Error raised by EmailSender or AsyncEmailSender
+
+    Returns:
+        bool: True for throttling, an unavailable backend and failures to connect
+    """
+    response = getattr(error, "resp", None) or getattr(error, "response", None)
+    status = getattr(response, "status", None) or getattr(response, "status_code", None)
+    if status is not None:
+        return int(status) in (429, 503)
+    if isinstance(error, (ConnectionRefusedError, socket.gaierror)):
+        return True
+    if "httplib2" in sys.modules and isinstance(error, httplib2.ServerNotFoundError):
+        return True
+    return "httpx" in sys.modules and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def warm_up_email_sender() -> None:
+    """
+    Mints delegated credentials, fetches an access token and builds the Gmail service ahead of the
+    first message
+
+    Raises:
+        MissingCredentialsException: If required environment variables are not set.
+        CustomGoogleAuthError: If authentication with Google APIs fails.
+        GoogleAuthError: If the access token cannot be fetched.
+    """
+    credentials = get_configured_credentials()
+    if _needs_refresh(credentials):
+        credentials.refresh(GoogleAuthRequest())
+    _get_transport(credentials)
 
 
 class EmailSender:
@@ -20,10 +320,14 @@ class EmailSender:
     Handles authentication and sending of emails via Google APIs
 
     This class uses a Google Cloud Service Account with Domain-Wide Delegation to send emails as a group inbox.
-    Uses Google Secret Manager to access service account details for authentication
+    Uses Google Secret Manager to access service account details for authentication.
+    Credentials are cached process-wide and their access tokens are refreshed in the background.
+    The Gmail service and its connection pool are shared process-wide as well, so senders are cheap
+    to create and one sender may be used from many threads at once.
 
     Attributes:
         service (googleapiclient.discovery.Resource): Google Cloud Service Account service object.
+        http_pool (AuthorizedHttpPool): Connections the service's requests are executed on
 
     """
     def __init__(self):
@@ -34,46 +338,8 @@ class EmailSender:
             MissingCredentialsException: If required environment variables are not set.
             CustomGoogleAuthError: If authentication with Google APIs fails.
         """
-        delegated_user_email = os.environ.get("DELEGATED_USER_EMAIL", None)
-        project_id = os.environ.get("PROJECT_ID", None)
-        secret_name = os.environ.get("SECRET_NAME", None)
-        scopes = ["https://www.googleapis.com/auth/gmail.send"]
-
-        if not all([delegated_user_email, project_id, secret_name]):
-            failure_log = LogEntry(
-                level="ERROR",
-                message="Missing required environment variables.",
-                service_name="EmailSender",
-                trace_id=None, # Trace ID and context will be filled out by the background task orchestrator
-                context=None
-            )
-            logging.error(failure_log.to_json())
-            raise MissingCredentialsException("Required credentials are missing.")
+        self.service, self.http_pool = _get_transport(get_configured_credentials())
 
-        try:
-            secret_client = secretmanager.SecretManagerServiceClient()
-            secret_path = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
-            response = secret_client.access_secret_version(request={"name": secret_path})
-            payload = response.payload.data.decode("UTF-8")
-            credentials_info = json.loads(payload)
-
-            credentials = service_account.Credentials.from_service_account_info(
-                credentials_info,
-                scopes=scopes
-            )
-            delegated_credentials = credentials.with_subject(delegated_user_email)
-
-            self.service = build('gmail', 'v1', credentials=delegated_credentials)
-        except (ValueError, FileNotFoundError, TypeError, GoogleAuthError) as e:
-            failure_log = LogEntry(
-                level="ERROR",
-                message=f"Error during authentication with Google APIs. {str(e)}",
-                service_name="EmailSender",
-                trace_id=None,  # Trace ID and context will be filled out by the background task orchestrator error log
-                context=None
-            )
-            logging.error(failure_log.to_json())
-            raise CustomGoogleAuthError("Failed to authenticate with Google APIs.") from e
     @staticmethod
     def build_email(destination: str, body: str, subject: str) -> str:
         if not destination:
@@ -93,6 +359,65 @@ class EmailSender:
         return base64.urlsafe_b64encode(message.as_bytes()).decode("UTF-8")
 
     def send_email(self, encoded_msg: str):
+        """
+        Sends an encoded message behind the gmail circuit breaker, retrying failures that sent nothing
+
+        Raises:
+            CircuitOpenError: If the gmail circuit breaker is open
+        """
         if not isinstance(encoded_msg, str):
             raise TypeError("encoded_msg must be a string")
-        return self.service.users().messages().send(userId="me", body={"raw": encoded_msg}).execute()
+        request = self.service.users().messages().send(userId="me", body={"raw": encoded_msg})
+        return get_retry_policy("gmail", is_transient_gmail_error).call(
+            lambda: self._execute(request), retry_if=is_unsent_gmail_error
+        )
+
+    def _execute(self, request):
+        with self.http_pool.connection() as http:
+            return request.execute(http=http)
+
+    def send_batch(self, encoded_msgs: list[str]) -> list:
+        """
+        Sends encoded messages in one request to the Gmail batch endpoint
+
+        Messages failing with an error that provably sent nothing, such as a 429, are sent again in a
+        smaller batch, behind the gmail circuit breaker, until they succeed or the retry policy runs
+        out of attempts.
+
+        Args:
+            encoded_msgs: Messages built by build_email
+
+        Returns:
+            list: Gmail response, or the exception that failed it, for every message in order
+        """
+        for encoded_msg in encoded_msgs:
+            if not isinstance(encoded_msg, str):
+                raise TypeError("encoded_msg must be a string")
+
+        results: list = [None] * len(encoded_msgs)
+        remaining = list(range(len(encoded_msgs)))
+
+        def callback(request_id: str, response, exception: Exception | None) -> None:
+            results[int(request_id)] = exception if exception is not None else response
+
+        def execute() -> None:
+            nonlocal remaining
+            batch = BatchHttpRequest(callback=callback, batch_uri=get_batch_url())
+            for index in remaining:
+                request = self.service.users().messages().send(userId="me", body={"raw": encoded_msgs[index]})
+                batch.add(request, request_id=str(index))
+            with self.http_pool.connection() as http:
+                batch.execute(http=http)
+            remaining = [index for index in remaining
+                         if isinstance(results[index], Exception) and is_unsent_gmail_error(results[index])]
+            if remaining:
+                raise results[remaining[0]]
+
+        try:
+            get_retry_policy("gmail", is_transient_gmail_error).call(execute, retry_if=is_unsent_gmail_error)
+        except Exception as e:
+            # Messages that never got a response share the error of the batch request
+            for index in remaining:
+                if results[index] is None:
+                    results[index] = e
+        return results
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.lazy_imports import lazy_import
+
+httplib2 = lazy_import("httplib2")
+AuthorizedHttp = lazy_import("google_auth_httplib2", "AuthorizedHttp")
+
+DEFAULT_HTTP_POOL_SIZE = 100
+DEFAULT_HTTP_TIMEOUT = 30.0
+
+
+class AuthorizedHttpPool:
+    """
+    Bounded pool of authorized httplib2 connections to the Gmail API
+
+    httplib2.Http is not thread-safe, so a Gmail service object cannot run requests from many threads
+    through its own connection. The service is only used to build requests, and every request is
+    executed on a connection checked out from this pool, so one service serves any number of threads.
+    Connections are created on demand up to size and kept alive between requests. Callers wait for
+    a free connection once size requests are in flight.
+
+    Attributes:
+        credentials (google.oauth2.service_account.Credentials): Credentials authorizing every connection
+        size (int): Most connections open at once
+        timeout (float): Socket timeout of every connection in seconds
+    """
+    def __init__(self, credentials, size: int = DEFAULT_HTTP_POOL_SIZE, timeout: float = DEFAULT_HTTP_TIMEOUT):
+        self.credentials = credentials
+        self.size = max(size, 1)
+        self.timeout = timeout
+        self._idle: list = []
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator[AuthorizedHttp]:
+        """
+        Checks out a connection for the duration of the block
+
+        A connection whose request raised is closed rather than reused, since httplib2 may have left
+        it half way through a response.
+
+        Yields:
+            google_auth_httplib2.AuthorizedHttp: Connection for the calling thread's exclusive use
+        """
+        self._slots.acquire()
+        try:
+            with self._lock:
+                http = self._idle.pop() if self._idle else None
+            if http is None:
+                http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+            try:
+                yield http
+            except BaseException:
+                http.close()
+                raise
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(http)
+                    return
+            http.close()
+        finally:
+            self._slots.release()
+
+    def idle(self) -> int:
+        """
+        Returns:
+            int: Open connections waiting to be checked out
+        """
+        with self._lock:
+            return len(self._idle)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections. Connections in use are closed when they are returned
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
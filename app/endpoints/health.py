@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Request
+from starlette import status
+from starlette.responses import JSONResponse
+
+from app.resilience import get_circuit_breaker_states
+
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def get_readiness(request: Request):
+    # Not ready until the lifespan warm-up has built clients and minted credentials
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ready": False, "steps": {}, "errors": {}},
+        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": warmup.ready, "steps": warmup.steps, "errors": warmup.errors},
+    )
+
+
+@router.get("/breakers")
+async def get_breakers():
+    # Open breakers shed calls to their dependency, they do not make the instance unready
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=get_circuit_breaker_states(),
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.metrics import CONTENT_TYPE, generate_latest
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE)
@@ -1,39 +1,91 @@
+import asyncio
 import logging
-from fastapi import APIRouter, Request, BackgroundTasks
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Request
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 from starlette import status
 from starlette.responses import JSONResponse
 
 from app.models import TwilioRequest, LogEntry
-from app.core.twilio_logic import twilio_background_task, validate_twilio_request, sanitize_data
+from app.core.twilio_logic import validate_twilio_request, sanitize_data
+from app.decision_logic import get_priority
+from app.dedup import get_dedup_cache
+from app.work_queue import get_work_queue, get_admission_controller
 
 
 router = APIRouter()
 
 
 @router.post("/webhooks/twilio")
-async def handle_twilio_sms(request: Request, background_tasks: BackgroundTasks = BackgroundTasks):
-    data = await request.form()
-    data = dict(data)
+async def handle_twilio_sms(request: Request):
+    # Signature is checked against the raw body before the form is turned into a TwilioRequest
+    body = await request.body()
+    params = parse_qs(body.decode("utf-8"), keep_blank_values=True)
+    data = {name: values[-1] for name, values in params.items()}
     headers = dict(request.headers)
+    if not validate_twilio_request(request, params):
+        try:
+            context = sanitize_data(data)
+        except ValueError:
+            context = {"MessageSid": "MessageSid Not Found"}
+        error_log = LogEntry(
+            level="ERROR",
+            message="Invalid twilio request",
+            service_name="Twilio Webhook",
+            trace_id=headers.get("X-Twilio-Trace-ID", "None"),
+            context=context,
+        )
+        logging.error(error_log)
+        return JSONResponse(
+            status_code=status.HTTP_403_FORBIDDEN,
+            content={"message": "Invalid twilio request"},
+        )
+
+    # Admission, the dedup claim and the enqueue write SQLite, so they run off the event loop
+    return await asyncio.to_thread(queue_twilio_message, headers, data)
+
+
+def queue_twilio_message(headers: dict, data: dict) -> JSONResponse:
+    """
+    Admits a validated webhook and queues it for delivery, unless it is a retry of a queued message
+
+    Args:
+        headers: Request headers of the webhook
+        data: Twilio request data, already validated against its signature
+
+    Returns:
+        JSONResponse: 200 once queued or for a duplicate, 503 when the queue sheds load
+
+    Raises:
+        RequestValidationError: If the request data is not a valid TwilioRequest
+    """
+    # Shed before claiming the MessageSid, so twilio's retry of a shed webhook is not taken as a duplicate
+    priority = get_priority(data.get("Body"), data.get("From"))
+    admission_controller = get_admission_controller()
+    if not admission_controller.admit(priority):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": "Service overloaded"},
+            headers={"Retry-After": str(admission_controller.retry_after())},
+        )
+
     try:
         twilio_data = TwilioRequest(**data)
-        if not validate_twilio_request(request, data):
-            error_log = LogEntry(
-                level="ERROR",
-                message="Invalid twilio request",
-                service_name="Twilio Webhook",
-                trace_id=headers.get("X-Twilio-Trace-ID", "None"),
-                context=sanitize_data(data),
-            )
-            logging.error(error_log)
+        dedup_cache = get_dedup_cache()
+        if not dedup_cache.claim(twilio_data.MessageSid):
+            # Twilio retry of a message that is already queued or processed
             return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"message": "Invalid twilio request"},
+                status_code=200,
+                content={},
             )
 
-        background_tasks.add_task(twilio_background_task, headers, dict(data))
+        try:
+            get_work_queue().enqueue(headers, dict(data), priority=priority)
+        except Exception:
+            dedup_cache.release(twilio_data.MessageSid)
+            raise
         return JSONResponse(
             status_code=200,
             content={},
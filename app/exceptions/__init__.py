@@ -1,2 +1,4 @@
 from .exceptions import RequiresClientException, MissingCredentialsException, ClientAuthenticationException, \
-    ResourceNotFoundException, InvalidTwilioRequestException, RouteProcessingError, GoogleAuthError
\ No newline at end of file
+    ResourceNotFoundException, InvalidTwilioRequestException, RouteProcessingError, GoogleAuthError, \
+    StaleDiscoveryDocumentException, SinkTimeoutError, DiscordDeliveryError, SmsDeliveryError, \
+    DeliveryDeferredError, CircuitOpenError, SmsThrottledError
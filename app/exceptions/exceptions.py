@@ -46,3 +46,48 @@ class GoogleAuthError(Exception):
 
     def __str__(self):
         return "Unable to authenticate with Google"
+
+class StaleDiscoveryDocumentException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+    def __str__(self):
+        return "Bundled Gmail discovery document is stale"
+
+class SinkTimeoutError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+    def __str__(self):
+        return "Sink delivery timed out"
+
+class DiscordDeliveryError(Exception):
+    def __init__(self, message, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+    def __str__(self):
+        return "Discord webhook delivery failed"
+
+class SmsDeliveryError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+    def __str__(self):
+        return "SMS delivery failed"
+
+class DeliveryDeferredError(Exception):
+    def __init__(self, message, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return "Delivery deferred"
+
+class CircuitOpenError(DeliveryDeferredError):
+    def __str__(self):
+        return "Circuit breaker is open"
+
+class SmsThrottledError(DeliveryDeferredError):
+    def __str__(self):
+        return "SMS throughput limit reached"
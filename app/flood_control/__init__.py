@@ -0,0 +1,2 @@
+from .flood_control import SenderFloodControl, Digest, get_flood_control, close_flood_control, is_digest_job, \
+    send_digest, send_digest_async
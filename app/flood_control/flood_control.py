@@ -0,0 +1,260 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable
+
+from app.decision_logic import get_rule_set
+from app.metrics import FLOOD_MESSAGES_COALESCED, FLOOD_DIGESTS_SENT
+from app.rate_limit import TokenBucket
+from app.sinks import get_sink_registry, raise_for_undelivered
+from app.work_queue import WorkQueue, get_work_queue
+
+DEFAULT_SENDER_RATE = 1 / 60
+DEFAULT_SENDER_BURST = 5.0
+DEFAULT_DIGEST_WINDOW = 60.0
+DEFAULT_MAX_SENDERS = 10_000
+DEFAULT_SENDER_TTL = 3600.0
+DEFAULT_EXEMPT_RULES = ("mfa",)
+COALESCED_ROUTE = "email"
+DIGEST_SENDER_FIELD = "DigestFrom"
+DIGEST_MESSAGES_FIELD = "DigestMessages"
+
+
+class Digest:
+    """
+    Messages from one sender emailed together
+
+    Attributes:
+        sender (str): Number the messages came from
+        messages (list[dict]): Coalesced messages in arrival order, with "date_created" as an ISO
+            string, "body" and optionally "contact_name"
+    """
+    def __init__(self, sender: str, messages: list[dict] | None = None):
+        self.sender = sender
+        self.messages = messages if messages is not None else []
+
+    @classmethod
+    def from_job(cls, data: dict) -> "Digest":
+        """
+        Args:
+            data: Data of a digest job
+
+        Returns:
+            Digest: The digest the job holds
+        """
+        return cls(data[DIGEST_SENDER_FIELD], data[DIGEST_MESSAGES_FIELD])
+
+    def _sender_label(self) -> str:
+        contact_name = next((message["contact_name"] for message in self.messages if message.get("contact_name")), None)
+        return f"{contact_name} ({self.sender})" if contact_name else self.sender
+
+    def to_message(self) -> dict:
+        """
+        Returns:
+            dict: Message data for the digest email, listing every coalesced body
+        """
+        lines = [f"[{message.get('date_created') or 'unknown time'}] {message['body']}" for message in self.messages]
+        return {
+            "date_created": datetime.now(timezone.utc),
+            "from": self.sender,
+            "subject": f"{len(self.messages)} Text Messages from {self._sender_label()}",
+            "body": "\n\n".join(lines),
+            "routes": [COALESCED_ROUTE],
+        }
+
+
+def is_digest_job(data: dict) -> bool:
+    """
+    Args:
+        data: Data of a work queue job
+
+    Returns:
+        bool: True if the job holds a digest rather than a webhook
+    """
+    return DIGEST_MESSAGES_FIELD in data
+
+
+def _digest_entry(message: dict, message_sid: str | None) -> dict:
+    date_created = message.get("date_created")
+    entry = {
+        "sid": message_sid,
+        "date_created": date_created.isoformat() if isinstance(date_created, datetime) else None,
+        "body": message["body"],
+    }
+    if message.get("contact_name"):
+        entry["contact_name"] = message["contact_name"]
+    return entry
+
+
+class SenderFloodControl:
+    """
+    Per-sender email flood control
+
+    Every sender has a token bucket refilled at rate emails per second. Once a sender's bucket is
+    empty, its emails are coalesced into one digest that is sent window seconds after the first of
+    them. Later emails from that sender join the pending digest, so they stay in order. Other routes
+    of a coalesced message are delivered as usual, and messages matching an exempt routing rule,
+    such as MFA codes, are never coalesced.
+
+    Digests are jobs in the work queue that become visible once their window has elapsed. A
+    coalesced message is written to its digest job before the webhook's own job is acknowledged, so
+    digests survive restarts, and a digest whose send fails is redelivered like any other job.
+
+    Buckets live in a bounded map. Senders idle for longer than sender_ttl are evicted, and the least
+    recently seen sender is evicted once max_senders is reached.
+
+    Attributes:
+        queue (WorkQueue): Queue holding the pending digests
+        rate (float): Emails per second each sender may trigger
+        burst (float): Emails a sender may trigger at once before being limited
+        window (float): Seconds a digest collects messages before it is sent
+        exempt_rules (set[str]): Names of routing rules whose messages are never coalesced
+    """
+    def __init__(
+            self,
+            queue: WorkQueue,
+            rate: float = DEFAULT_SENDER_RATE,
+            burst: float = DEFAULT_SENDER_BURST,
+            window: float = DEFAULT_DIGEST_WINDOW,
+            max_senders: int = DEFAULT_MAX_SENDERS,
+            sender_ttl: float = DEFAULT_SENDER_TTL,
+            exempt_rules: tuple[str, ...] = DEFAULT_EXEMPT_RULES,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.queue = queue
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.max_senders = max_senders
+        self.sender_ttl = sender_ttl
+        self.exempt_rules = set(exempt_rules)
+        self._clock = clock
+        # Sender to (last seen, bucket, time its pending digest is sent), least recently seen first
+        self._senders: OrderedDict[str, tuple[float, TokenBucket, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _should_coalesce(self, message: dict) -> bool:
+        if COALESCED_ROUTE not in message["routes"]:
+            return False
+        rule = get_rule_set().match(message["body"])
+        if rule is not None and rule.name in self.exempt_rules:
+            return False
+
+        sender = message["from"]
+        with self._lock:
+            now = self._clock()
+            while self._senders:
+                oldest, (last_seen, _, _) = next(iter(self._senders.items()))
+                if now - last_seen < self.sender_ttl and len(self._senders) < self.max_senders:
+                    break
+                del self._senders[oldest]
+            entry = self._senders.pop(sender, None)
+            if entry is None:
+                bucket, digest_due = TokenBucket(self.rate, self.burst, clock=self._clock), 0.0
+            else:
+                _, bucket, digest_due = entry
+            if now >= digest_due and bucket.reserve(timeout=0) is not None:
+                self._senders[sender] = (now, bucket, digest_due)
+                return False
+            if now >= digest_due:
+                digest_due = now + self.window
+            self._senders[sender] = (now, bucket, digest_due)
+        return True
+
+    def _coalesce(self, message: dict, message_sid: str | None) -> dict:
+        self.queue.collect(
+            f"digest:{message['from']}",
+            {DIGEST_SENDER_FIELD: message["from"]},
+            DIGEST_MESSAGES_FIELD,
+            _digest_entry(message, message_sid),
+            self.window,
+        )
+        FLOOD_MESSAGES_COALESCED.inc()
+        return {**message, "routes": [route for route in message["routes"] if route != COALESCED_ROUTE]}
+
+    def apply(self, message: dict, message_sid: str | None = None) -> dict:
+        """
+        Coalesces the message's email into its sender's digest when the sender is over its limit
+
+        Args:
+            message: Routed message data with "from", "body" and "routes"
+            message_sid: Twilio MessageSid, so a redelivered message is not added to its digest twice
+
+        Returns:
+            dict: The message, without its email route if the email was coalesced
+        """
+        if not self._should_coalesce(message):
+            return message
+        return self._coalesce(message, message_sid)
+
+    async def apply_async(self, message: dict, message_sid: str | None = None) -> dict:
+        """
+        Async counterpart of apply. Only coalesced messages leave the event loop, to write their digest
+        """
+        if not self._should_coalesce(message):
+            return message
+        return await asyncio.to_thread(self._coalesce, message, message_sid)
+
+
+def send_digest(data: dict) -> None:
+    """
+    Emails the digest held by a digest job through the sink registry
+
+    Args:
+        data: Data of a digest job
+
+    Raises:
+        Exception: Error of the email sink, so the job is redelivered
+    """
+    raise_for_undelivered(get_sink_registry().deliver(Digest.from_job(data).to_message(), [COALESCED_ROUTE]))
+    FLOOD_DIGESTS_SENT.inc()
+
+
+async def send_digest_async(data: dict) -> None:
+    """
+    Async counterpart of send_digest
+    """
+    results = await get_sink_registry().deliver_async(Digest.from_job(data).to_message(), [COALESCED_ROUTE])
+    raise_for_undelivered(results)
+    FLOOD_DIGESTS_SENT.inc()
+
+
+_flood_control: SenderFloodControl | None = None
+_flood_control_lock = threading.Lock()
+
+
+def get_flood_control() -> SenderFloodControl:
+    """
+    Gets the process-wide flood control, configured from FLOOD_CONTROL_RATE (emails per second per
+    sender), FLOOD_CONTROL_BURST, FLOOD_CONTROL_WINDOW, FLOOD_CONTROL_MAX_SENDERS,
+    FLOOD_CONTROL_SENDER_TTL and FLOOD_CONTROL_EXEMPT_RULES (comma separated rule names)
+
+    Returns:
+        SenderFloodControl: Shared flood control queueing digests in the work queue
+    """
+    global _flood_control
+    with _flood_control_lock:
+        if _flood_control is None:
+            exempt_rules = os.environ.get("FLOOD_CONTROL_EXEMPT_RULES", ",".join(DEFAULT_EXEMPT_RULES))
+            _flood_control = SenderFloodControl(
+                get_work_queue(),
+                rate=float(os.environ.get("FLOOD_CONTROL_RATE", DEFAULT_SENDER_RATE)),
+                burst=float(os.environ.get("FLOOD_CONTROL_BURST", DEFAULT_SENDER_BURST)),
+                window=float(os.environ.get("FLOOD_CONTROL_WINDOW", DEFAULT_DIGEST_WINDOW)),
+                max_senders=int(os.environ.get("FLOOD_CONTROL_MAX_SENDERS", DEFAULT_MAX_SENDERS)),
+                sender_ttl=float(os.environ.get("FLOOD_CONTROL_SENDER_TTL", DEFAULT_SENDER_TTL)),
+                exempt_rules=tuple(name.strip() for name in exempt_rules.split(",") if name.strip()),
+            )
+        return _flood_control
+
+
+def close_flood_control() -> None:
+    """
+    Drops the process-wide flood control. Pending digests stay in the work queue
+    """
+    global _flood_control
+    with _flood_control_lock:
+        _flood_control = None
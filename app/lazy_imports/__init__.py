@@ -0,0 +1 @@
+from .lazy_imports import LazyModule, LazyAttribute, lazy_import
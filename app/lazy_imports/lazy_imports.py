@@ -0,0 +1,62 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is used
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
+
+
+class LazyAttribute:
+    """
+    Stand-in for a class or function that is only imported the first time it is called or inspected
+    """
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            self._target = getattr(importlib.import_module(self._module), self._name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy attribute {self._module}.{self._name}>"
+
+
+def lazy_import(module: str, name: str | None = None) -> LazyModule | LazyAttribute:
+    """
+    Defers importing a heavy module until it is first used. The stand-in can be patched in
+    tests like the real name
+
+    Args:
+        module: Dotted module path, e.g. "twilio.rest"
+        name: Attribute of the module to stand in for. The whole module when omitted
+
+    Returns:
+        LazyModule | LazyAttribute: Stand-in that imports the target on first use
+    """
+    if name is None:
+        return LazyModule(module)
+    return LazyAttribute(module, name)
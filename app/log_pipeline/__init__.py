@@ -0,0 +1 @@
+from .log_pipeline import NonBlockingQueueHandler, BatchingLogWriter, configure_logging, shutdown_logging
@@ -0,0 +1,181 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import TextIO
+
+from app.metrics import LOG_RECORDS_DROPPED
+
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_LOG_BATCH_SIZE = 256
+DEFAULT_LOG_FLUSH_INTERVAL = 0.2
+DEFAULT_LOG_PUT_TIMEOUT = 0.01
+DEFAULT_LOG_DROP_LEVEL = "DEBUG"
+
+_STOP = object()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that hands records to a background writer without blocking the caller
+
+    Records are queued as they are. Formatting, including serializing a LogEntry passed directly
+    to the logger, happens on the writer thread. When the queue is full, records at or below
+    drop_level are dropped straight away. Higher levels wait up to put_timeout for space before
+    they are dropped too.
+    """
+    def __init__(self, log_queue: queue.Queue, drop_level: int = logging.DEBUG,
+                 put_timeout: float = DEFAULT_LOG_PUT_TIMEOUT):
+        super().__init__(log_queue)
+        self.drop_level = drop_level
+        self.put_timeout = put_timeout
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno > self.drop_level and self.put_timeout > 0:
+            try:
+                self.queue.put(record, timeout=self.put_timeout)
+                return
+            except queue.Full:
+                pass
+        LOG_RECORDS_DROPPED.labels(level=record.levelname).inc()
+
+
+class BatchingLogWriter:
+    """
+    Background thread that formats queued records and writes them in batches
+
+    A batch is written once batch_size records are waiting or flush_interval seconds have passed
+    since its first record, with one write and one flush per batch.
+    """
+    def __init__(self, log_queue: queue.Queue, formatter: logging.Formatter | None = None,
+                 stream: TextIO | None = None, batch_size: int = DEFAULT_LOG_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_LOG_FLUSH_INTERVAL):
+        self.queue = log_queue
+        self.formatter = formatter or logging.Formatter(logging.BASIC_FORMAT)
+        # None means sys.stderr, looked up on every write so redirected streams are respected
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Writes every queued record, then stops the writer thread
+
+        Args:
+            timeout: Maximum seconds to wait for the writer to finish
+        """
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self.queue.get(timeout=remaining))
+                    else:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is _STOP
+            if stopping:
+                batch.pop()
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: list[logging.LogRecord]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                # A record that cannot be formatted must not take the rest of the batch with it
+                lines.append(f"{record.levelname}:{record.name}:Unformattable log record {record.msg!r}")
+        if not lines:
+            return
+        stream = self.stream if self.stream is not None else sys.stderr
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            # The stream was closed, usually during interpreter shutdown
+            pass
+
+
+_handler: NonBlockingQueueHandler | None = None
+_writer: BatchingLogWriter | None = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging() -> NonBlockingQueueHandler:
+    """
+    Routes the root logger through a non-blocking queue and a batching background writer.
+    Settings are read from LOG_LEVEL, LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL,
+    LOG_PUT_TIMEOUT and LOG_DROP_LEVEL. Calling it again returns the installed handler
+
+    Returns:
+        NonBlockingQueueHandler: Handler installed on the root logger
+    """
+    global _handler, _writer
+    with _configure_lock:
+        if _handler is not None:
+            return _handler
+        log_queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", DEFAULT_LOG_QUEUE_SIZE)))
+        _writer = BatchingLogWriter(
+            log_queue,
+            batch_size=int(os.environ.get("LOG_BATCH_SIZE", DEFAULT_LOG_BATCH_SIZE)),
+            flush_interval=float(os.environ.get("LOG_FLUSH_INTERVAL", DEFAULT_LOG_FLUSH_INTERVAL)),
+        )
+        _handler = NonBlockingQueueHandler(
+            log_queue,
+            drop_level=logging.getLevelName(os.environ.get("LOG_DROP_LEVEL", DEFAULT_LOG_DROP_LEVEL).upper()),
+            put_timeout=float(os.environ.get("LOG_PUT_TIMEOUT", DEFAULT_LOG_PUT_TIMEOUT)),
+        )
+        _writer.start()
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(os.environ.get("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper())
+        atexit.register(shutdown_logging)
+        return _handler
+
+
+def shutdown_logging(timeout: float = 5.0) -> None:
+    """
+    Removes the queue handler from the root logger and writes any records still queued
+
+    Args:
+        timeout: Maximum seconds to wait for the writer to finish
+    """
+    global _handler, _writer
+    with _configure_lock:
+        if _handler is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _writer.stop(timeout)
+        _handler = None
+        _writer = None
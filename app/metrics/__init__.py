@@ -0,0 +1,6 @@
+from .metrics import Counter, Gauge, Histogram, Registry, REGISTRY, CONTENT_TYPE, generate_latest, STAGE_LATENCY, \
+    MESSAGES_PROCESSED, DELIVERIES_IN_FLIGHT, WORK_QUEUE_DEPTH, LOG_RECORDS_DROPPED, \
+    SINK_DELIVERIES, DISCORD_RATE_LIMITED, DISCORD_EMBEDS_PER_POST, DEPENDENCY_RETRIES, CIRCUIT_BREAKER_STATE, \
+    CIRCUIT_BREAKER_REJECTIONS, WEBHOOKS_SHED, ADMISSION_LIMIT, \
+    FLOOD_MESSAGES_COALESCED, FLOOD_DIGESTS_SENT, JOB_QUEUE_WAIT, JOB_LATENCY, \
+    GMAIL_BATCH_SIZE, MESSAGES_BLOCKED
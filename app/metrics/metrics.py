@@ -0,0 +1,390 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _ShardedValues:
+    """
+    Per-thread value arrays that are summed on read
+
+    Each thread writes only to its own shard, so recording never takes a lock. The lock is only
+    taken the first time a thread records, to register its shard, and when shards are read.
+    """
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: list[list[float]] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> list[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0.0] * self._size
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def totals(self) -> list[float]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0.0] * self._size
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._children: dict[tuple[str, ...], object] = {}
+        self._children_lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels: str):
+        """
+        Gets the child metric for a set of label values, creating it on first use
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._children_lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> list[str]:
+        if not self.label_names:
+            return self._child_samples(self._default_child(), {})
+        with self._children_lock:
+            children = list(self._children.items())
+        samples = []
+        for key, child in children:
+            samples.extend(self._child_samples(child, dict(zip(self.label_names, key))))
+        return samples
+
+    def _default_child(self):
+        return self.labels()
+
+    def _child_samples(self, child, labels: dict[str, str]) -> list[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._values.shard()[0] += amount
+
+    def get(self) -> float:
+        return self._values.totals()[0]
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing counter with per-thread aggregation
+    """
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default_child().inc(amount)
+
+    def get(self) -> float:
+        return self._default_child().get()
+
+    def _child_samples(self, child, labels):
+        return [f"{self.name}_total{_format_labels(labels)} {_format_value(child.get())}"]
+
+
+class _GaugeChild:
+    def __init__(self, function: Callable[[], float] | None = None):
+        self._values = _ShardedValues(1)
+        self._function = function
+
+    def inc(self, amount: float = 1) -> None:
+        self._values.shard()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._values.shard()[0] -= amount
+
+    @contextmanager
+    def track_in_progress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def get(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._values.totals()[0]
+
+
+class Gauge(_Metric):
+    """
+    Gauge built from per-thread increments, or read from a callback at scrape time
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 function: Callable[[], float] | None = None, registry=None):
+        self._function = function
+        super().__init__(name, documentation, label_names, registry)
+
+    def _new_child(self):
+        return _GaugeChild(self._function)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Reads the gauge from a callback at scrape time
+        """
+        self._function = function
+        self._default_child()._function = function
+
+    def inc(self, amount: float = 1) -> None:
+        self._default_child().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default_child().dec(amount)
+
+    def track_in_progress(self):
+        return self._default_child().track_in_progress()
+
+    def get(self) -> float:
+        return self._default_child().get()
+
+    def _child_samples(self, child, labels):
+        try:
+            value = child.get()
+        except Exception:
+            # A failing callback must not break the whole scrape
+            return []
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        # One slot per bucket, one for +Inf, then the sum and the count
+        self._values = _ShardedValues(len(buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        shard = self._values.shard()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> tuple[list[float], float, float]:
+        """
+        Returns:
+            tuple: Cumulative bucket counts including +Inf, the sum, and the count
+        """
+        totals = self._values.totals()
+        cumulative = []
+        running = 0.0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class Histogram(_Metric):
+    """
+    Latency histogram with per-thread aggregation
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default_child().observe(value)
+
+    def time(self):
+        return self._default_child().time()
+
+    def _child_samples(self, child, labels):
+        cumulative, total, count = child.snapshot()
+        samples = []
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), cumulative):
+            bucket_labels = {**labels, "le": _format_value(bound) if bound != float("inf") else "+Inf"}
+            samples.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {_format_value(bucket_count)}")
+        samples.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        samples.append(f"{self.name}_count{_format_labels(labels)} {_format_value(count)}")
+        return samples
+
+
+class Registry:
+    """
+    Collection of metrics exposed together
+    """
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def expose(self) -> str:
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def generate_latest(registry: Registry = REGISTRY) -> str:
+    """
+    Returns:
+        str: Metrics of the registry in the Prometheus text exposition format
+    """
+    return registry.expose()
+
+
+STAGE_LATENCY = Histogram(
+    "relay_stage_duration_seconds",
+    "Time spent in each stage of message delivery",
+    ("stage",),
+)
+MESSAGES_PROCESSED = Counter(
+    "relay_messages_processed",
+    "Messages processed by the delivery pipeline",
+    ("outcome",),
+)
+DELIVERIES_IN_FLIGHT = Gauge(
+    "relay_deliveries_in_flight",
+    "Messages currently being delivered",
+)
+SINK_DELIVERIES = Counter(
+    "relay_sink_deliveries",
+    "Deliveries attempted by each route sink",
+    ("sink", "outcome"),
+)
+DISCORD_RATE_LIMITED = Counter(
+    "relay_discord_rate_limited",
+    "Discord webhook posts answered with a 429",
+)
+DISCORD_EMBEDS_PER_POST = Histogram(
+    "relay_discord_embeds_per_post",
+    "Embeds coalesced into each Discord webhook post",
+    buckets=(1, 2, 3, 5, 10),
+)
+WORK_QUEUE_DEPTH = Gauge(
+    "relay_work_queue_depth",
+    "Jobs waiting in or leased from the work queue",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "relay_log_records_dropped",
+    "Log records dropped because the log queue was full",
+    ("level",),
+)
+DEPENDENCY_RETRIES = Counter(
+    "relay_dependency_retries",
+    "Calls to a downstream API retried after a transient failure",
+    ("dependency",),
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "relay_circuit_breaker_state",
+    "1 for the current state of each downstream API circuit breaker, 0 for the others",
+    ("dependency", "state"),
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "relay_circuit_breaker_rejections",
+    "Calls shed without being attempted because a circuit breaker was open",
+    ("dependency",),
+)
+WEBHOOKS_SHED = Counter(
+    "relay_webhooks_shed",
+    "Webhooks answered with a 503 because the work queue was over its admission limit",
+)
+ADMISSION_LIMIT = Gauge(
+    "relay_admission_limit",
+    "Queued and in-flight jobs the work queue currently admits",
+)
+FLOOD_MESSAGES_COALESCED = Counter(
+    "relay_flood_messages_coalesced",
+    "Emails merged into a per-sender digest because their sender was over its limit",
+)
+FLOOD_DIGESTS_SENT = Counter(
+    "relay_flood_digests_sent",
+    "Digest emails sent by flood control",
+)
+JOB_QUEUE_WAIT = Histogram(
+    "relay_job_queue_wait_seconds",
+    "Time jobs wait in the work queue before a worker leases them, by priority",
+    ("priority",),
+)
+JOB_LATENCY = Histogram(
+    "relay_job_latency_seconds",
+    "Time from enqueueing a job to the end of its delivery attempt, by priority",
+    ("priority",),
+)
+GMAIL_BATCH_SIZE = Histogram(
+    "relay_gmail_batch_size",
+    "Emails sent per request to the Gmail batch endpoint",
+    buckets=(1, 2, 5, 10, 25, 50, 100),
+)
+MESSAGES_BLOCKED = Counter(
+    "relay_messages_blocked",
+    "Messages dropped because their sender is blocked in the contact list",
+)
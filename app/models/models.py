@@ -50,3 +50,7 @@ class LogEntry(BaseModel):
     def to_json(self) -> str:
         return self.model_dump_json()
 
+    def __str__(self) -> str:
+        # Lets a LogEntry be passed to the logger as is and serialized on the log writer thread
+        return self.to_json()
+
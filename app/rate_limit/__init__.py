@@ -0,0 +1 @@
+from .rate_limit import TokenBucket
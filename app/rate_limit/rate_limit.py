@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    acquire reserves a token and sleeps until it is due instead of rejecting the caller, so a burst
+    drains at exactly rate tokens per second. Reservations are handed out in call order.
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Most tokens the bucket holds, i.e. the largest burst sent without waiting
+    """
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, timeout: float | None = None) -> float | None:
+        """
+        Reserves a token without waiting for it
+
+        Args:
+            timeout: Longest wait the caller accepts. No limit when None
+
+        Returns:
+            float | None: Seconds until the reserved token is due, or None if that exceeds timeout
+                and nothing was reserved
+        """
+        with self._lock:
+            self._refill(self._clock())
+            wait_time = max(0.0, (1.0 - self._tokens) / self.rate)
+            if timeout is not None and wait_time > timeout:
+                return None
+            self._tokens -= 1.0
+            return wait_time
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """
+        Returns reserved tokens that will not be used
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def wait_time(self) -> float:
+        """
+        Returns:
+            float: Seconds until a token reserved now would be due
+        """
+        with self._lock:
+            self._refill(self._clock())
+            return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """
+        Takes a token, sleeping until one is available
+
+        Args:
+            timeout: Longest time to wait. No limit when None
+
+        Returns:
+            bool: True once a token was taken, False if none would be available within timeout
+        """
+        wait_time = self.reserve(timeout)
+        if wait_time is None:
+            return False
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return True
+
+    def available(self) -> float:
+        """
+        Returns:
+            float: Tokens currently in the bucket. Negative while reservations are waiting
+        """
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
@@ -0,0 +1,2 @@
+from .resilience import CircuitBreaker, RetryPolicy, get_circuit_breaker, get_retry_policy, \
+    get_circuit_breaker_states, reset_resilience, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
@@ -0,0 +1,353 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from app.exceptions import CircuitOpenError
+from app.metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_STATE, DEPENDENCY_RETRIES
+from app.models import LogEntry
+
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY = 0.2
+DEFAULT_RETRY_MAX_DELAY = 5.0
+DEFAULT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_BREAKER_MIN_CALLS = 10
+DEFAULT_BREAKER_WINDOW = 30.0
+DEFAULT_BREAKER_RESET_TIMEOUT = 30.0
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker for one downstream API
+
+    Closed, it counts call outcomes over a sliding window and opens once at least min_calls calls
+    were made and the share of failures reaches error_rate. Open, every call is rejected with
+    CircuitOpenError without touching the API. After reset_timeout it lets a single trial call through
+    (half open), closing again if the trial succeeds and reopening if it fails.
+
+    Attributes:
+        name (str): Dependency name used in metrics and logs
+        state (str): "closed", "open" or "half_open"
+    """
+    def __init__(
+            self,
+            name: str,
+            error_rate: float = DEFAULT_BREAKER_ERROR_RATE,
+            min_calls: int = DEFAULT_BREAKER_MIN_CALLS,
+            window: float = DEFAULT_BREAKER_WINDOW,
+            reset_timeout: float = DEFAULT_BREAKER_RESET_TIMEOUT,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self._clock = clock
+        # (time.monotonic() of the outcome, failed)
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_BREAKER_STATE.labels(dependency=name, state=STATE_CLOSED).inc()
+
+    def _transition(self, state: str) -> None:
+        CIRCUIT_BREAKER_STATE.labels(dependency=self.name, state=self.state).dec()
+        CIRCUIT_BREAKER_STATE.labels(dependency=self.name, state=state).inc()
+        transition_log = LogEntry(
+            level="WARNING" if state == STATE_OPEN else "INFO",
+            message=f"Circuit breaker for {self.name} changed from {self.state} to {state}",
+            service_name="Circuit Breaker",
+            trace_id=None,
+            context={"dependency": self.name, "calls": len(self._outcomes), "failures": self._failures},
+        )
+        self.state = state
+        if state == STATE_OPEN:
+            logging.warning(transition_log)
+        else:
+            logging.info(transition_log)
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def before_call(self) -> None:
+        """
+        Admits a call or rejects it while the breaker is open
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half open with its trial call in flight
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == STATE_OPEN and now - self._opened_at >= self.reset_timeout:
+                self._transition(STATE_HALF_OPEN)
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_HALF_OPEN:
+                if not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+                # The trial decides when calls resume, so callers come back after another reset timeout
+                retry_after = self.reset_timeout
+            else:
+                retry_after = max(self._opened_at + self.reset_timeout - now, 0.0)
+        CIRCUIT_BREAKER_REJECTIONS.labels(dependency=self.name).inc()
+        raise CircuitOpenError(f"Circuit breaker for {self.name} is open", retry_after=retry_after)
+
+    def record(self, failed: bool) -> None:
+        """
+        Records the outcome of an admitted call
+
+        Args:
+            failed: True if the call failed in a way that points at the dependency being unhealthy
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == STATE_HALF_OPEN:
+                self._trial_in_flight = False
+                self._outcomes.clear()
+                self._failures = 0
+                if failed:
+                    self._opened_at = now
+                    self._transition(STATE_OPEN)
+                else:
+                    self._transition(STATE_CLOSED)
+                return
+            if self.state == STATE_OPEN:
+                # Call admitted before the breaker opened
+                return
+
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._prune(now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.error_rate:
+                self._opened_at = now
+                self._transition(STATE_OPEN)
+
+    def release(self) -> None:
+        """
+        Releases an admitted call that ended without an outcome, e.g. because it was cancelled
+
+        A half open breaker lets the next call through as its trial instead.
+        """
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self._trial_in_flight = False
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: State of the breaker and the calls and failures in its window
+        """
+        with self._lock:
+            self._prune(self._clock())
+            return {"state": self.state, "calls": len(self._outcomes), "failures": self._failures}
+
+
+class RetryPolicy:
+    """
+    Retries transient failures of a downstream API with exponential backoff and full jitter
+
+    The n-th retry waits a random time between 0 and min(max_delay, base_delay * 2 ** (n - 1)), so
+    callers that failed together do not retry together. Every attempt goes through the breaker,
+    when one is given, and an open breaker fails the call at once without further retries.
+
+    Attributes:
+        name (str): Dependency name used in metrics
+        max_attempts (int): Attempts including the first call
+        retryable (Callable): Tells transient failures, worth retrying, from permanent ones
+    """
+    def __init__(
+            self,
+            name: str,
+            retryable: Callable[[Exception], bool],
+            max_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+            base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+            max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+            breaker: CircuitBreaker | None = None,
+    ):
+        self.name = name
+        self.retryable = retryable
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+
+    def backoff(self, retry: int) -> float:
+        """
+        Returns:
+            float: Seconds to wait before the given retry, counting from 1
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def _attempt_failed(self, error: Exception, attempt: int,
+                        retry_if: Callable[[Exception], bool] | None = None) -> bool:
+        transient = self.retryable(error)
+        if self.breaker is not None:
+            # Permanent errors such as a 404 mean the API answered, so they count as healthy calls
+            self.breaker.record(failed=transient)
+        if not transient or attempt >= self.max_attempts:
+            return False
+        if retry_if is not None and not retry_if(error):
+            return False
+        DEPENDENCY_RETRIES.labels(dependency=self.name).inc()
+        return True
+
+    def call(self, function: Callable[[], T], retry_if: Callable[[Exception], bool] | None = None) -> T:
+        """
+        Calls function, retrying transient failures
+
+        Args:
+            function: Call to the API
+            retry_if: Narrows the transient failures that are retried, e.g. to those that provably
+                did not reach the API for a call that is not idempotent. Every transient failure
+                still counts against the breaker
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            Exception: The last error of function once it is permanent or attempts run out
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                result = function()
+            except Exception as e:
+                if not self._attempt_failed(e, attempt, retry_if):
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            if self.breaker is not None:
+                self.breaker.record(failed=False)
+            return result
+
+    async def call_async(self, function: Callable[[], Awaitable[T]],
+                         retry_if: Callable[[Exception], bool] | None = None) -> T:
+        """
+        Async counterpart of call. function is called again for every attempt
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            Exception: The last error of function once it is permanent or attempts run out
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                result = await function()
+            except Exception as e:
+                if not self._attempt_failed(e, attempt, retry_if):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                # Cancelled by a sink timeout. The call has no outcome, but must not hold the trial
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            if self.breaker is not None:
+                self.breaker.record(failed=False)
+            return result
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+_retry_policies: dict[str, RetryPolicy] = {}
+_resilience_lock = threading.Lock()
+
+
+def _setting(dependency: str, name: str, default: float) -> float:
+    return float(os.environ.get(f"{dependency.upper()}_{name}", default))
+
+
+def get_circuit_breaker(dependency: str) -> CircuitBreaker:
+    """
+    Gets the process-wide circuit breaker of a dependency, configured from <DEPENDENCY>_BREAKER_ERROR_RATE,
+    <DEPENDENCY>_BREAKER_MIN_CALLS, <DEPENDENCY>_BREAKER_WINDOW and <DEPENDENCY>_BREAKER_RESET_TIMEOUT,
+    e.g. GMAIL_BREAKER_ERROR_RATE
+
+    Args:
+        dependency: Dependency name, e.g. "twilio" or "gmail"
+
+    Returns:
+        CircuitBreaker: Shared breaker
+    """
+    with _resilience_lock:
+        breaker = _circuit_breakers.get(dependency)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                dependency,
+                error_rate=_setting(dependency, "BREAKER_ERROR_RATE", DEFAULT_BREAKER_ERROR_RATE),
+                min_calls=int(_setting(dependency, "BREAKER_MIN_CALLS", DEFAULT_BREAKER_MIN_CALLS)),
+                window=_setting(dependency, "BREAKER_WINDOW", DEFAULT_BREAKER_WINDOW),
+                reset_timeout=_setting(dependency, "BREAKER_RESET_TIMEOUT", DEFAULT_BREAKER_RESET_TIMEOUT),
+            )
+            _circuit_breakers[dependency] = breaker
+        return breaker
+
+
+def get_retry_policy(dependency: str, retryable: Callable[[Exception], bool]) -> RetryPolicy:
+    """
+    Gets the process-wide retry policy of a dependency, guarded by its circuit breaker. Configured from
+    <DEPENDENCY>_RETRY_ATTEMPTS, <DEPENDENCY>_RETRY_BASE_DELAY and <DEPENDENCY>_RETRY_MAX_DELAY
+
+    Args:
+        dependency: Dependency name, e.g. "twilio" or "gmail"
+        retryable: Tells transient failures from permanent ones. Only used when the policy is created
+
+    Returns:
+        RetryPolicy: Shared retry policy
+    """
+    breaker = get_circuit_breaker(dependency)
+    with _resilience_lock:
+        policy = _retry_policies.get(dependency)
+        if policy is None:
+            policy = RetryPolicy(
+                dependency,
+                retryable,
+                max_attempts=int(_setting(dependency, "RETRY_ATTEMPTS", DEFAULT_RETRY_ATTEMPTS)),
+                base_delay=_setting(dependency, "RETRY_BASE_DELAY", DEFAULT_RETRY_BASE_DELAY),
+                max_delay=_setting(dependency, "RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY),
+                breaker=breaker,
+            )
+            _retry_policies[dependency] = policy
+        return policy
+
+
+def get_circuit_breaker_states() -> dict[str, dict]:
+    """
+    Returns:
+        dict[str, dict]: Snapshot of every circuit breaker, keyed on dependency
+    """
+    with _resilience_lock:
+        breakers = dict(_circuit_breakers)
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+def reset_resilience() -> None:
+    """
+    Drops every circuit breaker and retry policy, so they are rebuilt from the environment
+    """
+    with _resilience_lock:
+        for breaker in _circuit_breakers.values():
+            CIRCUIT_BREAKER_STATE.labels(dependency=breaker.name, state=breaker.state).dec()
+        _circuit_breakers.clear()
+        _retry_policies.clear()
@@ -0,0 +1,6 @@
+from .base import Sink, SinkResult
+from .discord_sink import DiscordSink, DiscordWebhookSender, RateLimitBucket, build_embed
+from .email_sink import EmailSink
+from .sms_sink import SmsSink, build_sms_body
+from .registry import SinkRegistry, get_sink_registry, raise_for_undelivered, requeue_deferred_routes, is_route_job, \
+    deliver_route_job, deliver_route_job_async
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+from dataclasses import dataclass
+
+DEFAULT_SINK_TIMEOUT = 30.0
+
+
+@dataclass
+class SinkResult:
+    route: str
+    delivered: bool
+    duration: float = 0.0
+    error: Exception | None = None
+    # A retryable failure provably left the message undelivered, so delivering it again sends no duplicate
+    retryable: bool = False
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Args:
+        error: Error raised by a sink
+
+    Returns:
+        bool: True if the sink could not connect to its backend, so the message was never sent
+    """
+    if isinstance(error, ConnectionError):
+        return True
+    # requests is only loaded once a sink used it
+    requests = sys.modules.get("requests")
+    return requests is not None and isinstance(error, requests.ConnectionError)
+
+
+class Sink:
+    """
+    Delivery backend for one route
+
+    Subclasses implement deliver. deliver_async runs deliver in a thread unless a subclass has a
+    native async implementation.
+
+    Attributes:
+        timeout (float): Seconds a delivery may take before it is reported as timed out
+    """
+    def __init__(self, timeout: float = DEFAULT_SINK_TIMEOUT):
+        self.timeout = timeout
+
+    def deliver(self, message: dict) -> None:
+        """
+        Delivers a routed message
+
+        Args:
+            message: Extracted message data with "from", "body", "date_created" and "routes"
+        """
+        raise NotImplementedError
+
+    async def deliver_async(self, message: dict) -> None:
+        """
+        Async counterpart of deliver, used by the async delivery pipeline
+
+        Args:
+            message: Extracted message data with "from", "body", "date_created" and "routes"
+        """
+        await asyncio.to_thread(self.deliver, message)
+
+    def is_transient(self, error: Exception) -> bool:
+        """
+        Tells failures worth delivering again later from permanent ones. Only failures that provably
+        sent nothing are transient, since a delivery that may have gone through would be duplicated
+
+        Args:
+            error: Error raised by deliver or deliver_async
+
+        Returns:
+            bool: True if the message should be delivered again later
+        """
+        return is_connection_error(error)
+
+    def close(self) -> None:
+        """
+        Releases connections and background threads held by the sink
+        """
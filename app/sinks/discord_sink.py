@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from app.exceptions import DiscordDeliveryError
+from app.lazy_imports import lazy_import
+from app.metrics import DISCORD_RATE_LIMITED, DISCORD_EMBEDS_PER_POST
+from app.models import LogEntry
+from app.sinks.base import DEFAULT_SINK_TIMEOUT, Sink
+
+requests = lazy_import("requests")
+HTTPAdapter = lazy_import("requests.adapters", "HTTPAdapter")
+
+DEFAULT_COALESCE_THRESHOLD = 1
+DEFAULT_REQUEST_TIMEOUT = 10.0
+DEFAULT_RETRY_AFTER = 1.0
+MAX_RATE_LIMIT_RETRIES = 5
+# Limits Discord puts on a single webhook message
+MAX_EMBEDS_PER_POST = 10
+MAX_EMBED_CHARACTERS = 6000
+MAX_TITLE_LENGTH = 256
+MAX_DESCRIPTION_LENGTH = 4096
+
+
+class RateLimitBucket:
+    """
+    Rate limit state of one Discord webhook, as reported by the X-RateLimit-* response headers
+
+    Attributes:
+        limit (int | None): Requests allowed per window
+        remaining (int | None): Requests left in the current window
+        reset_at (float): time.monotonic() deadline at which the window resets
+        bucket (str | None): Bucket ID reported by Discord
+    """
+    def __init__(self):
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        self.bucket: str | None = None
+
+    def update(self, headers, now: float) -> None:
+        """
+        Updates the bucket from the rate limit headers of a response
+
+        Args:
+            headers: Response headers
+            now: time.monotonic() when the response arrived
+        """
+        if "X-RateLimit-Limit" in headers:
+            self.limit = int(headers["X-RateLimit-Limit"])
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset-After" in headers:
+            self.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+        self.bucket = headers.get("X-RateLimit-Bucket", self.bucket)
+
+    def throttle(self, retry_after: float, now: float) -> None:
+        """
+        Empties the bucket until retry_after seconds from now, after a 429
+        """
+        self.remaining = 0
+        self.reset_at = now + retry_after
+
+    def remaining_at(self, now: float) -> int | None:
+        """
+        Returns:
+            int | None: Requests left at the given time. None until Discord has reported a limit
+        """
+        if self.reset_at <= now:
+            return self.limit
+        return self.remaining
+
+    def wait_time(self, now: float) -> float:
+        """
+        Returns:
+            float: Seconds to wait before the next request is allowed
+        """
+        if self.reset_at > now and self.remaining is not None and self.remaining <= 0:
+            return self.reset_at - now
+        return 0.0
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    for header in ("Retry-After", "X-RateLimit-Reset-After"):
+        if header in response.headers:
+            try:
+                return float(response.headers[header])
+            except ValueError:
+                pass
+    return DEFAULT_RETRY_AFTER
+
+
+def _embed_size(embed: dict) -> int:
+    return len(embed.get("title", "")) + len(embed.get("description", ""))
+
+
+class DiscordWebhookSender:
+    """
+    Posts embeds to one Discord webhook from a single dispatcher thread
+
+    Posts reuse one keep-alive session and wait for the rate limit bucket to reset instead of running
+    into 429s. While the bucket has more than coalesce_threshold requests left, each embed is posted
+    on its own. Once it is nearly exhausted, queued embeds are coalesced into multi-embed posts.
+
+    Attributes:
+        webhook_url (str): Discord webhook URL
+        bucket (RateLimitBucket): Rate limit state of the webhook
+    """
+    def __init__(self, webhook_url: str, coalesce_threshold: int = DEFAULT_COALESCE_THRESHOLD,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.webhook_url = webhook_url
+        self.coalesce_threshold = coalesce_threshold
+        self.request_timeout = request_timeout
+        self.bucket = RateLimitBucket()
+        # Entries are [embed, future, rate limited attempts]
+        self._pending: list[list] = []
+        self._pending_changed = threading.Condition()
+        self._session = None
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    def send(self, embed: dict) -> Future:
+        """
+        Queues an embed for posting
+
+        Args:
+            embed: Discord embed object
+
+        Returns:
+            Future: Resolved once the embed is posted, or failed with the delivery error
+        """
+        future = Future()
+        with self._pending_changed:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="discord-sender", daemon=True)
+                self._thread.start()
+            self._pending.append([embed, future, 0])
+            self._pending_changed.notify()
+        return future
+
+    def close(self) -> None:
+        """
+        Stops the dispatcher thread, failing embeds that were not posted, and closes the session
+        """
+        with self._pending_changed:
+            self._stopping = True
+            self._pending_changed.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.request_timeout)
+        for _, future, _ in self._pending:
+            future.set_exception(DiscordDeliveryError("Sender closed"))
+        self._pending.clear()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._session = session
+        return self._session
+
+    def _run(self) -> None:
+        while True:
+            with self._pending_changed:
+                while not self._pending and not self._stopping:
+                    self._pending_changed.wait()
+                if self._stopping:
+                    return
+            wait_time = self.bucket.wait_time(time.monotonic())
+            if wait_time > 0:
+                # Embeds queued while waiting for the reset are coalesced into the next posts
+                time.sleep(wait_time)
+            with self._pending_changed:
+                batch = self._take_batch()
+            try:
+                self._post(batch)
+            except Exception as e:
+                # Any error, such as a malformed rate limit header, fails the batch rather than the
+                # dispatcher, which would leave every later delivery waiting forever
+                self._fail_batch(batch, e)
+
+    def _take_batch(self) -> list[list]:
+        remaining = self.bucket.remaining_at(time.monotonic())
+        if remaining is None or remaining > self.coalesce_threshold:
+            batch_limit = 1
+        else:
+            batch_limit = MAX_EMBEDS_PER_POST
+        batch = [self._pending[0]]
+        size = _embed_size(batch[0][0])
+        for entry in self._pending[1:batch_limit]:
+            size += _embed_size(entry[0])
+            if size > MAX_EMBED_CHARACTERS:
+                break
+            batch.append(entry)
+        del self._pending[:len(batch)]
+        return batch
+
+    def _post(self, batch: list[list]) -> None:
+        try:
+            response = self._get_session().post(
+                self.webhook_url,
+                json={"embeds": [embed for embed, _, _ in batch]},
+                timeout=self.request_timeout,
+            )
+        except requests.RequestException as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        if response.status_code == 429:
+            DISCORD_RATE_LIMITED.inc()
+            retry_after = _retry_after(response)
+            self.bucket.throttle(retry_after, now)
+            self._log_rate_limited(retry_after, len(batch))
+            retry = []
+            for entry in batch:
+                entry[2] += 1
+                if entry[2] > MAX_RATE_LIMIT_RETRIES:
+                    entry[1].set_exception(DiscordDeliveryError("Rate limited", status=429))
+                else:
+                    retry.append(entry)
+            with self._pending_changed:
+                self._pending[:0] = retry
+            return
+
+        self.bucket.update(response.headers, now)
+        if response.status_code >= 400:
+            for _, future, _ in batch:
+                future.set_exception(DiscordDeliveryError(f"Discord returned {response.status_code}",
+                                                           status=response.status_code))
+            return
+        DISCORD_EMBEDS_PER_POST.observe(len(batch))
+        for _, future, _ in batch:
+            future.set_result(None)
+
+    def _fail_batch(self, batch: list[list], error: Exception) -> None:
+        failure_log = LogEntry(
+            level="ERROR",
+            message=f"Failed to post {len(batch)} embeds. {str(error) or type(error).__name__}",
+            service_name="Discord Sink",
+            trace_id=None,
+            context={"embeds": len(batch), "error_type": type(error).__name__},
+        )
+        logging.error(failure_log)
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _log_rate_limited(self, retry_after: float, embeds: int) -> None:
+        rate_limited_log = LogEntry(
+            level="WARNING",
+            message=f"Discord webhook rate limited, retrying in {retry_after:.2f}s",
+            service_name="Discord Sink",
+            trace_id=None,
+            context={"bucket": self.bucket.bucket, "embeds": embeds},
+        )
+        logging.warning(rate_limited_log)
+
+
+def build_embed(message: dict) -> dict:
+    """
+    Builds the Discord embed for a routed message
+
+    Args:
+        message: Extracted message data with "from", "body" and "date_created"
+
+    Returns:
+        dict: Discord embed object
+    """
+    embed = {
+        "title": f"New Text Message from {message['from']}"[:MAX_TITLE_LENGTH],
+        "description": message["body"][:MAX_DESCRIPTION_LENGTH],
+    }
+    if isinstance(message.get("date_created"), datetime):
+        embed["timestamp"] = message["date_created"].isoformat()
+    return embed
+
+
+class DiscordSink(Sink):
+    """
+    Posts the message to a Discord webhook as an embed
+    """
+    def __init__(self, webhook_url: str, timeout: float = DEFAULT_SINK_TIMEOUT,
+                 coalesce_threshold: int = DEFAULT_COALESCE_THRESHOLD):
+        super().__init__(timeout)
+        self.sender = DiscordWebhookSender(webhook_url, coalesce_threshold)
+
+    def deliver(self, message: dict) -> None:
+        self.sender.send(build_embed(message)).result(timeout=self.timeout)
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, DiscordDeliveryError) and error.status is not None:
+            return error.status == 429 or error.status >= 500
+        return super().is_transient(error)
+
+    def close(self) -> None:
+        self.sender.close()
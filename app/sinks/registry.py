@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from app.email_sender import BatchEmailSender
+from app.email_sender.batch_sender import DEFAULT_BATCH_CONCURRENCY, DEFAULT_BATCH_SIZE, DEFAULT_BATCH_WINDOW
+from app.decision_logic import get_priority
+from app.exceptions import DeliveryDeferredError, SinkTimeoutError
+from app.metrics import SINK_DELIVERIES, STAGE_LATENCY
+from app.models import LogEntry
+from app.sinks.base import DEFAULT_SINK_TIMEOUT, Sink, SinkResult
+from app.sinks.discord_sink import DEFAULT_COALESCE_THRESHOLD, DiscordSink
+from app.sinks.email_sink import EmailSink
+from app.sinks.sms_sink import DEFAULT_SMS_BURST, DEFAULT_SMS_CONCURRENCY, DEFAULT_SMS_RATE, SmsSink
+from app.work_queue import get_work_queue
+
+DEFAULT_FANOUT_WORKERS = 16
+DEFERRED_MESSAGE_FIELD = "DeferredMessage"
+DEFERRED_ROUTES_FIELD = "DeferredRoutes"
+# Routes that failed transiently are given time to recover before the route job is leased
+DEFAULT_ROUTE_RETRY_DELAY = 5.0
+
+
+class SinkRegistry:
+    """
+    Maps route names to sinks and delivers a message to all of its routes concurrently
+
+    Every sink has its own timeout and its failures are isolated from the other sinks, so a slow or
+    failing sink never delays or fails delivery to the rest. Routes without a registered sink are
+    logged and skipped.
+    """
+    def __init__(self, max_workers: int = DEFAULT_FANOUT_WORKERS):
+        self.max_workers = max_workers
+        self._sinks: dict[str, Sink] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def register(self, route: str, sink: Sink) -> None:
+        self._sinks[route] = sink
+
+    def get(self, route: str) -> Sink | None:
+        return self._sinks.get(route)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sink")
+            return self._executor
+
+    def _resolve(self, routes: list[str], trace_id: str | None) -> dict[str, Sink]:
+        if isinstance(routes, str):
+            routes = [routes]
+        sinks = {}
+        for route in dict.fromkeys(routes):
+            sink = self._sinks.get(route)
+            if sink is None:
+                skipped_log = LogEntry(
+                    level="WARNING",
+                    message=f"No sink registered for route {route}",
+                    service_name="Sink Registry",
+                    trace_id=trace_id,
+                    context=None,
+                )
+                logging.warning(skipped_log)
+                continue
+            sinks[route] = sink
+        return sinks
+
+    def deliver(self, message: dict, routes: list[str], trace_id: str | None = None) -> dict[str, SinkResult]:
+        """
+        Delivers a message to every routed sink in parallel worker threads
+
+        Waits for each sink up to its own timeout. A sink that times out keeps its worker thread until
+        it returns, but its result is no longer waited for.
+
+        Args:
+            message: Extracted message data with "from", "body", "date_created" and "routes"
+            routes: Route names to deliver to
+            trace_id: Twilio trace ID used in logs
+
+        Returns:
+            dict[str, SinkResult]: Result of every routed sink, keyed on route
+        """
+        sinks = self._resolve(routes, trace_id)
+        executor = self._get_executor()
+        started = time.monotonic()
+        futures = {route: executor.submit(sink.deliver, message) for route, sink in sinks.items()}
+
+        results = {}
+        for route, future in futures.items():
+            remaining = sinks[route].timeout - (time.monotonic() - started)
+            error = None
+            retryable = False
+            try:
+                future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                # The sink thread keeps running and may still deliver, so the route is not retried
+                future.cancel()
+                error = SinkTimeoutError(route)
+            except Exception as e:
+                error = e
+                retryable = sinks[route].is_transient(e)
+            results[route] = self._record(route, error, time.monotonic() - started, trace_id, retryable)
+        return results
+
+    async def deliver_async(self, message: dict, routes: list[str], trace_id: str | None = None) -> dict[str, SinkResult]:
+        """
+        Async counterpart of deliver. Sinks run as concurrent tasks and are cancelled on timeout
+
+        Args:
+            message: Extracted message data with "from", "body", "date_created" and "routes"
+            routes: Route names to deliver to
+            trace_id: Twilio trace ID used in logs
+
+        Returns:
+            dict[str, SinkResult]: Result of every routed sink, keyed on route
+        """
+        sinks = self._resolve(routes, trace_id)
+        started = time.monotonic()
+
+        async def run(route: str, sink: Sink) -> SinkResult:
+            error = None
+            retryable = False
+            try:
+                await asyncio.wait_for(sink.deliver_async(message), sink.timeout)
+            except asyncio.TimeoutError:
+                # Cancelling the task does not unsend a request that already reached the backend,
+                # so a timed out route is not retried either
+                error = SinkTimeoutError(route)
+            except Exception as e:
+                error = e
+                retryable = sink.is_transient(e)
+            return self._record(route, error, time.monotonic() - started, trace_id, retryable)
+
+        results = await asyncio.gather(*(run(route, sink) for route, sink in sinks.items()))
+        return {result.route: result for result in results}
+
+    def _record(self, route: str, error: Exception | None, duration: float, trace_id: str | None,
+                retryable: bool = False) -> SinkResult:
+        STAGE_LATENCY.labels(stage=f"sink_{route}").observe(duration)
+        if error is None:
+            SINK_DELIVERIES.labels(sink=route, outcome="success").inc()
+            return SinkResult(route=route, delivered=True, duration=duration)
+
+        SINK_DELIVERIES.labels(sink=route, outcome="failure").inc()
+        failure_log = LogEntry(
+            level="ERROR",
+            message=f"Delivery to {route} failed. {str(error) or type(error).__name__}",
+            service_name="Sink Registry",
+            trace_id=trace_id,
+            context={"route": route, "error_type": type(error).__name__},
+        )
+        logging.error(failure_log)
+        return SinkResult(route=route, delivered=False, duration=duration, error=error, retryable=retryable)
+
+    def shutdown(self) -> None:
+        for sink in self._sinks.values():
+            sink.close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def raise_for_undelivered(results: dict[str, SinkResult]) -> None:
+    """
+    Raises the first sink error when no sink delivered the message
+
+    A message that reached at least one sink counts as delivered, so it is not redelivered to the
+    sinks that already have it. requeue_deferred_routes retries the sinks it missed instead.
+
+    Args:
+        results: Results returned by SinkRegistry.deliver
+
+    Raises:
+        Exception: Error of the first failed sink, if every sink failed
+    """
+    if not results or any(result.delivered for result in results.values()):
+        return
+    raise next(iter(results.values())).error
+
+
+def is_route_job(data: dict) -> bool:
+    """
+    Args:
+        data: Data of a work queue job
+
+    Returns:
+        bool: True if the job redelivers a message to the routes that deferred it or failed transiently
+    """
+    return DEFERRED_MESSAGE_FIELD in data
+
+
+def requeue_deferred_routes(message: dict, results: dict[str, SinkResult], trace_id: str | None = None) -> None:
+    """
+    Queues a job redelivering a delivered message to the sinks that deferred it or failed transiently
+
+    Sinks defer a message with a DeliveryDeferredError, e.g. while their circuit breaker is open or
+    their throughput limit is reached. Transient failures, such as a server error or a refused
+    connection, are the retryable results. The job is leased once the longest retry_after, or
+    DEFAULT_ROUTE_RETRY_DELAY after a transient failure, has passed. Messages no sink delivered are
+    not requeued here, raise_for_undelivered fails their own job so the work queue redelivers it.
+
+    Args:
+        message: Extracted message data with "from", "body", "date_created" and "routes"
+        results: Results returned by SinkRegistry.deliver
+        trace_id: Twilio trace ID used in logs
+    """
+    deferred = {route: result.error for route, result in results.items()
+                if isinstance(result.error, DeliveryDeferredError) or result.retryable}
+    if not deferred or not any(result.delivered for result in results.values()):
+        return
+    delay = max(error.retry_after if isinstance(error, DeliveryDeferredError) else DEFAULT_ROUTE_RETRY_DELAY
+                for error in deferred.values())
+    date_created = message.get("date_created")
+    encoded = {**message, "date_created": date_created.isoformat() if isinstance(date_created, datetime) else None}
+    get_work_queue().enqueue(
+        {"X-Twilio-Trace-ID": trace_id} if trace_id else {},
+        {DEFERRED_MESSAGE_FIELD: encoded, DEFERRED_ROUTES_FIELD: list(deferred)},
+        priority=get_priority(message.get("body"), message.get("from")),
+        delay=delay,
+    )
+
+
+def _decode_route_job(data: dict) -> tuple[dict, list[str]]:
+    message = dict(data[DEFERRED_MESSAGE_FIELD])
+    if message.get("date_created"):
+        message["date_created"] = datetime.fromisoformat(message["date_created"])
+    return message, data[DEFERRED_ROUTES_FIELD]
+
+
+def deliver_route_job(headers: dict, data: dict) -> None:
+    """
+    Delivers the message of a route job to its deferred routes
+
+    Args:
+        headers: Headers of the job
+        data: Data of a route job
+
+    Raises:
+        Exception: Error of the first failed sink, if every sink failed
+    """
+    message, routes = _decode_route_job(data)
+    trace_id = headers.get("X-Twilio-Trace-ID")
+    results = get_sink_registry().deliver(message, routes, trace_id)
+    raise_for_undelivered(results)
+    requeue_deferred_routes(message, results, trace_id)
+
+
+async def deliver_route_job_async(headers: dict, data: dict) -> None:
+    """
+    Async counterpart of deliver_route_job
+    """
+    message, routes = _decode_route_job(data)
+    trace_id = headers.get("X-Twilio-Trace-ID")
+    results = await get_sink_registry().deliver_async(message, routes, trace_id)
+    raise_for_undelivered(results)
+    await asyncio.to_thread(requeue_deferred_routes, message, results, trace_id)
+
+
+_sink_registry: SinkRegistry | None = None
+_sink_registry_lock = threading.Lock()
+
+
+def _sink_timeout(route: str) -> float:
+    return float(os.environ.get(f"{route.upper()}_SINK_TIMEOUT", DEFAULT_SINK_TIMEOUT))
+
+
+def get_sink_registry() -> SinkRegistry:
+    """
+    Gets the process-wide sink registry. The number of fan-out threads is read from
+    SINK_FANOUT_WORKERS and each sink's timeout from <ROUTE>_SINK_TIMEOUT, e.g. EMAIL_SINK_TIMEOUT.
+    The discord sink is registered when DISCORD_WEBHOOK_URL is set, and the text sink when
+    SMS_FORWARD_NUMBERS and either TWILIO_MESSAGING_SERVICE_SID or TWILIO_FROM_NUMBER are set.
+    Emails are sent in batches of up to GMAIL_BATCH_SIZE, collected for GMAIL_BATCH_WINDOW seconds
+    during bursts with up to GMAIL_BATCH_CONCURRENCY batch requests in flight, when GMAIL_BATCH_SEND is "true"
+
+    Returns:
+        SinkRegistry: Registry with a sink for every supported route
+    """
+    global _sink_registry
+    with _sink_registry_lock:
+        if _sink_registry is None:
+            registry = SinkRegistry(int(os.environ.get("SINK_FANOUT_WORKERS", DEFAULT_FANOUT_WORKERS)))
+            batch_sender = None
+            if os.environ.get("GMAIL_BATCH_SEND", "false").lower() == "true":
+                batch_sender = BatchEmailSender(
+                    max_batch_size=int(os.environ.get("GMAIL_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                    window=float(os.environ.get("GMAIL_BATCH_WINDOW", DEFAULT_BATCH_WINDOW)),
+                    concurrency=int(os.environ.get("GMAIL_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY)),
+                )
+            registry.register("email", EmailSink(timeout=_sink_timeout("email"), batch_sender=batch_sender))
+            discord_webhook_url = os.environ.get("DISCORD_WEBHOOK_URL")
+            if discord_webhook_url:
+                registry.register("discord", DiscordSink(
+                    discord_webhook_url,
+                    timeout=_sink_timeout("discord"),
+                    coalesce_threshold=int(os.environ.get("DISCORD_COALESCE_THRESHOLD", DEFAULT_COALESCE_THRESHOLD)),
+                ))
+            sms_forward_numbers = [number.strip() for number in os.environ.get("SMS_FORWARD_NUMBERS", "").split(",")
+                                   if number.strip()]
+            messaging_service_sid = os.environ.get("TWILIO_MESSAGING_SERVICE_SID")
+            from_number = os.environ.get("TWILIO_FROM_NUMBER")
+            if sms_forward_numbers and (messaging_service_sid or from_number):
+                registry.register("text", SmsSink(
+                    sms_forward_numbers,
+                    messaging_service_sid=messaging_service_sid,
+                    from_number=from_number,
+                    timeout=_sink_timeout("text"),
+                    rate=float(os.environ.get("SMS_RATE_LIMIT", DEFAULT_SMS_RATE)),
+                    burst=float(os.environ.get("SMS_BURST", DEFAULT_SMS_BURST)),
+                    max_concurrency=int(os.environ.get(
+                        "SMS_MAX_CONCURRENCY", os.environ.get("TWILIO_HTTP_POOL_SIZE", DEFAULT_SMS_CONCURRENCY))),
+                ))
+            _sink_registry = registry
+        return _sink_registry
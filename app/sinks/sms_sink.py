@@ -0,0 +1,105 @@
+import threading
+import time
+
+from twilio.base.exceptions import TwilioRestException
+
+from app.exceptions import SmsThrottledError
+from app.lazy_imports import lazy_import
+from app.metrics import STAGE_LATENCY
+from app.rate_limit import TokenBucket
+from app.sinks.base import DEFAULT_SINK_TIMEOUT, Sink
+
+# Imported on first delivery, app.core.twilio_logic itself imports the sinks
+get_client = lazy_import("app.core.twilio_logic", "get_client")
+
+# A long code sends 1 segment per second. Raise the rate for messaging services with more senders
+DEFAULT_SMS_RATE = 1.0
+DEFAULT_SMS_BURST = 1.0
+# Matches the pooled Twilio client's default connection pool, so sends never open extra connections
+DEFAULT_SMS_CONCURRENCY = 10
+MAX_SMS_BODY_LENGTH = 1600
+
+
+def build_sms_body(message: dict) -> str:
+    """
+    Builds the forwarded SMS text for a routed message
+
+    Args:
+        message: Extracted message data with "from" and "body"
+
+    Returns:
+        str: SMS body, truncated to the length Twilio accepts
+    """
+    return f"From {message['from']}: {message['body']}"[:MAX_SMS_BODY_LENGTH]
+
+
+class SmsSink(Sink):
+    """
+    Forwards the message by SMS to a list of numbers through the pooled Twilio client
+
+    Sends are paced by a token bucket matching the messaging throughput Twilio allows, so a burst of
+    alerts is queued and drained at the maximum rate instead of being rejected with 429s. Messages
+    that could not start within the sink timeout are deferred back to the work queue rather than
+    failed. A semaphore caps concurrent sends at the size of the client's keep-alive connection pool.
+
+    Attributes:
+        destinations (list[str]): E.164 numbers every message is forwarded to
+        bucket (TokenBucket): Throughput limit shared by every send
+    """
+    def __init__(
+            self,
+            destinations: list[str],
+            messaging_service_sid: str | None = None,
+            from_number: str | None = None,
+            timeout: float = DEFAULT_SINK_TIMEOUT,
+            rate: float = DEFAULT_SMS_RATE,
+            burst: float = DEFAULT_SMS_BURST,
+            max_concurrency: int = DEFAULT_SMS_CONCURRENCY,
+    ):
+        super().__init__(timeout)
+        if not messaging_service_sid and not from_number:
+            raise ValueError("messaging_service_sid or from_number is required")
+        self.destinations = destinations
+        self.messaging_service_sid = messaging_service_sid
+        self.from_number = from_number
+        self.bucket = TokenBucket(rate, burst)
+        self._send_slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _sender_params(self) -> dict:
+        if self.messaging_service_sid:
+            return {"messaging_service_sid": self.messaging_service_sid}
+        return {"from_": self.from_number}
+
+    def deliver(self, message: dict) -> None:
+        """
+        Forwards the message to every destination
+
+        Raises:
+            SmsThrottledError: If the sends could not start before the sink times out. Nothing was
+                sent, and the work queue delivers the message again once the bucket has room
+        """
+        body = build_sms_body(message)
+        client = get_client()
+        # Every send is reserved up front, so a burst past the limit defers the whole message
+        # instead of reaching only some destinations
+        wait_times = []
+        for _ in self.destinations:
+            wait_time = self.bucket.reserve(timeout=self.timeout)
+            if wait_time is None:
+                self.bucket.refund(len(wait_times))
+                raise SmsThrottledError("Throughput limit reached", retry_after=self.bucket.wait_time())
+            wait_times.append(wait_time)
+
+        reserved_at = time.monotonic()
+        for destination, wait_time in zip(self.destinations, wait_times):
+            with STAGE_LATENCY.labels(stage="sms_throttle").time():
+                delay = wait_time - (time.monotonic() - reserved_at)
+                if delay > 0:
+                    time.sleep(delay)
+            with self._send_slots, STAGE_LATENCY.labels(stage="send_sms").time():
+                client.messages.create(to=destination, body=body, **self._sender_params())
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, TwilioRestException):
+            return error.status == 429 or error.status >= 500
+        return super().is_transient(error)
@@ -0,0 +1,3 @@
+from .admission import AdmissionController
+from .work_queue import Job, WorkQueue, WorkerPool, AsyncWorkerPool, get_work_queue, get_admission_controller, \
+    start_worker_pool, start_async_worker_pool
@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from typing import Callable
+
+from app.decision_logic import PRIORITY_HIGH, PRIORITY_NORMAL
+from app.metrics import WEBHOOKS_SHED
+
+DEFAULT_MAX_QUEUE_DEPTH = 1000
+DEFAULT_MIN_QUEUE_DEPTH = 50
+DEFAULT_TARGET_QUEUE_LATENCY = 30.0
+DEFAULT_ADJUST_INTERVAL = 1.0
+DEFAULT_LATENCY_SMOOTHING = 0.2
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+# Multiplicative decrease while queue latency is over target, additive increase while it is under
+DECREASE_FACTOR = 0.75
+INCREASE_FRACTION = 0.1
+
+
+class AdmissionController:
+    """
+    Load shedder for the webhook ingress, sized from observed queue latency
+
+    Webhooks are admitted while the work queue holds fewer jobs, queued or leased, than the current
+    limit. The limit starts at max_depth. Once per adjust interval it shrinks while the smoothed time
+    jobs wait in the queue is over target_latency, and grows back towards max_depth while it is under,
+    so overload sheds new work early instead of building a backlog that can never be delivered in time.
+    High priority webhooks are only shed at max_depth.
+
+    Attributes:
+        max_depth (int): Hard cap on queued and in-flight jobs
+        min_depth (int): Floor the adaptive limit never shrinks below
+        target_latency (float): Seconds a job may wait in the queue before the limit shrinks
+        limit (int): Current admission limit
+        queue_latency (float | None): Smoothed queue latency in seconds. None until a job was dequeued
+    """
+    def __init__(
+            self,
+            depth: Callable[[], int],
+            max_depth: int = DEFAULT_MAX_QUEUE_DEPTH,
+            min_depth: int = DEFAULT_MIN_QUEUE_DEPTH,
+            target_latency: float = DEFAULT_TARGET_QUEUE_LATENCY,
+            adjust_interval: float = DEFAULT_ADJUST_INTERVAL,
+            smoothing: float = DEFAULT_LATENCY_SMOOTHING,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_depth = max_depth
+        self.min_depth = min(min_depth, max_depth)
+        self.target_latency = target_latency
+        self.adjust_interval = adjust_interval
+        self.smoothing = smoothing
+        self.limit = max_depth
+        self.queue_latency: float | None = None
+        self._depth = depth
+        self._clock = clock
+        self._adjusted_at = clock()
+        self._lock = threading.Lock()
+
+    def observe_queue_latency(self, latency: float) -> None:
+        """
+        Records how long a job waited in the queue before a worker leased it
+
+        Args:
+            latency: Seconds between enqueueing the job and its first lease
+        """
+        with self._lock:
+            if self.queue_latency is None:
+                self.queue_latency = latency
+            else:
+                self.queue_latency += self.smoothing * (latency - self.queue_latency)
+            now = self._clock()
+            if now - self._adjusted_at < self.adjust_interval:
+                return
+            self._adjusted_at = now
+            if self.queue_latency > self.target_latency:
+                self.limit = max(self.min_depth, int(self.limit * DECREASE_FACTOR))
+            else:
+                self.limit = min(self.max_depth, self.limit + max(1, int(self.max_depth * INCREASE_FRACTION)))
+
+    def retry_after(self) -> int:
+        """
+        Returns:
+            int: Seconds a shed sender should wait, the smoothed queue latency within sane bounds
+        """
+        latency = self.queue_latency or MIN_RETRY_AFTER
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(latency)))
+
+    def admit(self, priority: str = PRIORITY_NORMAL) -> bool:
+        """
+        Args:
+            priority: Priority of the webhook. High priority webhooks are admitted up to max_depth
+
+        Returns:
+            bool: True if a new webhook may be queued, False if it must be shed
+        """
+        limit = self.max_depth if priority == PRIORITY_HIGH else self.limit
+        if self._depth() < limit:
+            return True
+        WEBHOOKS_SHED.inc()
+        return False
@@ -0,0 +1,592 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from app.decision_logic import PRIORITY_HIGH, PRIORITY_NORMAL
+from app.exceptions import DeliveryDeferredError
+from app.metrics import ADMISSION_LIMIT, STAGE_LATENCY, WORK_QUEUE_DEPTH, JOB_QUEUE_WAIT, JOB_LATENCY
+from app.models import LogEntry
+from app.work_queue.admission import AdmissionController, DEFAULT_MAX_QUEUE_DEPTH, DEFAULT_MIN_QUEUE_DEPTH, \
+    DEFAULT_TARGET_QUEUE_LATENCY
+
+DEFAULT_QUEUE_PATH = "/tmp/twilio_work_queue.db"
+DEFAULT_WORKER_COUNT = 4
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_VISIBILITY_TIMEOUT = 60.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_ASYNC_CONCURRENCY = 100
+DEFAULT_RESERVED_WORKERS = 1
+DEFAULT_ASYNC_RESERVED_CONCURRENCY = 10
+# Shortest deferral of a deferred job, so an error reporting no wait cannot re-lease it in a loop
+MIN_DEFER_DELAY = 1.0
+
+# Stored priority levels. Higher levels are leased first
+PRIORITY_LEVELS = {PRIORITY_NORMAL: 0, PRIORITY_HIGH: 1}
+PRIORITY_NAMES = {level: name for name, level in PRIORITY_LEVELS.items()}
+
+
+@dataclass
+class Job:
+    id: int
+    headers: dict
+    data: dict
+    attempts: int
+    enqueued_at: float
+    priority: str = PRIORITY_NORMAL
+
+
+class WorkQueue:
+    """
+    Durable priority work queue backed by SQLite in WAL mode
+
+    Jobs are leased in priority order, and in FIFO order within a priority. Jobs are leased to
+    workers for a visibility timeout. Leased jobs that are not acknowledged
+    before the timeout expires become visible again and are redelivered. Grouped jobs, such as
+    flood control digests, collect items for a delay before they become visible.
+
+    Attributes:
+        path (str): Path of the SQLite database file
+    """
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        # Waiters are kept apart by the lowest priority they lease, so a normal job never wakes a
+        # worker that only leases high priority jobs
+        self._lock = threading.Lock()
+        self._available = {priority: threading.Condition(self._lock) for priority in PRIORITY_LEVELS}
+        self._waiting = dict.fromkeys(PRIORITY_LEVELS, 0)
+        connection = self._connection()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                visible_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+        if "priority" not in columns:
+            # Queue files written before priorities existed
+            connection.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+        if "group_key" not in columns:
+            connection.execute("ALTER TABLE jobs ADD COLUMN group_key TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_visible_at ON jobs (visible_at, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_priority ON jobs (priority DESC, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_group_key ON jobs (group_key) WHERE group_key IS NOT NULL")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, headers: dict, data: dict, priority: str = PRIORITY_NORMAL, delay: float = 0.0) -> int:
+        """
+        Appends a webhook to the queue
+
+        Args:
+            headers: Request headers of the webhook
+            data: Raw twilio request data
+            priority: "high" or "normal"
+            delay: Seconds before the job may be leased
+
+        Returns:
+            int: ID of the queued job
+        """
+        # Queue wait is measured from when the job is due
+        due = time.time() + delay
+        payload = json.dumps({"headers": headers, "data": data})
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (payload, enqueued_at, visible_at, priority) VALUES (?, ?, ?, ?)",
+            (payload, due, due, PRIORITY_LEVELS[priority]),
+        )
+        self._notify(priority)
+        return cursor.lastrowid
+
+    def collect(self, group_key: str, data: dict, field: str, item: dict, delay: float) -> bool:
+        """
+        Appends an item to the pending job of a group, creating the job if the group has none
+
+        A group's job collects items in data[field] until it becomes visible delay seconds after it
+        was created. Items appended after that start a new job. Items equal to one the job already
+        holds are ignored, so a redelivered job does not add its item twice.
+
+        Args:
+            group_key: Key of the group, e.g. the sender of a digest
+            data: Job data of a new job, without field
+            field: Key of data holding the collected items
+            item: JSON serializable item to append
+            delay: Seconds a new job collects items before it is leased
+
+        Returns:
+            bool: True if a new job was created
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT id, payload FROM jobs WHERE group_key = ? AND attempts = 0 AND visible_at > ? "
+                "ORDER BY id DESC LIMIT 1",
+                (group_key, now),
+            ).fetchone()
+            if row is not None:
+                payload = json.loads(row[1])
+                items = payload["data"][field]
+                if item not in items:
+                    items.append(item)
+                    connection.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(payload), row[0]))
+            else:
+                payload = json.dumps({"headers": {}, "data": {**data, field: [item]}})
+                # Queue wait is measured from when the job is due, not from when it started collecting
+                connection.execute(
+                    "INSERT INTO jobs (payload, enqueued_at, visible_at, priority, group_key) VALUES (?, ?, ?, ?, ?)",
+                    (payload, now + delay, now + delay, PRIORITY_LEVELS[PRIORITY_NORMAL], group_key),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return row is None
+
+    def dequeue_batch(self, batch_size: int, visibility_timeout: float, min_priority: str = PRIORITY_NORMAL) -> list[Job]:
+        """
+        Leases up to batch_size visible jobs, highest priority first
+
+        Args:
+            batch_size: Maximum number of jobs to lease
+            visibility_timeout: Seconds before an unacknowledged job is redelivered
+            min_priority: Lowest priority to lease. "high" leaves normal jobs queued
+
+        Returns:
+            list[Job]: Leased jobs. Empty if none are visible
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, payload, attempts, enqueued_at, priority FROM jobs WHERE visible_at <= ? AND priority >= ? "
+                "ORDER BY priority DESC, id LIMIT ?",
+                (now, PRIORITY_LEVELS[min_priority], batch_size),
+            ).fetchall()
+            if rows:
+                connection.executemany(
+                    "UPDATE jobs SET visible_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now + visibility_timeout, row[0]) for row in rows],
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        jobs = []
+        for job_id, payload, attempts, enqueued_at, priority in rows:
+            decoded = json.loads(payload)
+            jobs.append(Job(job_id, decoded["headers"], decoded["data"], attempts + 1, enqueued_at,
+                            PRIORITY_NAMES[priority]))
+        return jobs
+
+    def ack(self, job_id: int) -> None:
+        """
+        Removes a completed job from the queue
+        """
+        self._connection().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def defer(self, job_id: int, delay: float) -> None:
+        """
+        Makes a leased job visible again after delay seconds without using up one of its attempts
+
+        Queue wait restarts from when the job is due again, so the deferral is not taken for a backlog
+        """
+        due = time.time() + delay
+        self._connection().execute(
+            "UPDATE jobs SET enqueued_at = ?, visible_at = ?, attempts = MAX(attempts - 1, 0) WHERE id = ?",
+            (due, due, job_id),
+        )
+
+    def recover(self) -> int:
+        """
+        Makes every leased job visible again. Called at startup to recover work from a crashed instance
+
+        Returns:
+            int: Number of recovered jobs
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET visible_at = ? WHERE visible_at > ?",
+            (time.time(), time.time()),
+        )
+        return cursor.rowcount
+
+    def depth(self) -> int:
+        """
+        Returns:
+            int: Number of jobs in the queue, leased or not
+        """
+        return self._connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def _notify(self, priority: str) -> None:
+        with self._lock:
+            # Any waiter can lease a high priority job, but the reserved ones are the ones kept free for it
+            if priority == PRIORITY_HIGH and self._waiting[PRIORITY_HIGH]:
+                self._available[PRIORITY_HIGH].notify()
+            else:
+                self._available[PRIORITY_NORMAL].notify()
+
+    def wait_for_work(self, timeout: float, min_priority: str = PRIORITY_NORMAL) -> None:
+        """
+        Blocks until a job this waiter can lease is enqueued in this process or the timeout expires
+
+        Args:
+            timeout: Maximum seconds to wait
+            min_priority: Lowest priority the waiter leases, as passed to dequeue_batch
+        """
+        with self._lock:
+            self._waiting[min_priority] += 1
+            try:
+                self._available[min_priority].wait(timeout)
+            finally:
+                self._waiting[min_priority] -= 1
+
+    def wake_all(self) -> None:
+        """
+        Wakes every thread blocked in wait_for_work
+        """
+        with self._lock:
+            for available in self._available.values():
+                available.notify_all()
+
+
+class WorkerPool:
+    """
+    Pool of dedicated worker threads draining a WorkQueue
+
+    The first reserved_workers threads only lease high priority jobs, so critical alerts and MFA
+    codes always have a free worker even while the others work through a backlog.
+
+    Attributes:
+        queue (WorkQueue): Queue the workers drain
+        handler (Callable): Called with (headers, data) for every job
+    """
+    def __init__(
+            self,
+            queue: WorkQueue,
+            handler: Callable[[dict, dict], object],
+            worker_count: int = DEFAULT_WORKER_COUNT,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            reserved_workers: int = 0,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.worker_count = worker_count
+        # At least one worker always takes normal jobs
+        self.reserved_workers = max(min(reserved_workers, worker_count - 1), 0)
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.worker_count):
+            min_priority = PRIORITY_HIGH if i < self.reserved_workers else PRIORITY_NORMAL
+            thread = threading.Thread(target=self._run, args=(min_priority,), name=f"work-queue-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self.queue.wake_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def _run(self, min_priority: str) -> None:
+        while not self._stop.is_set():
+            jobs = self.queue.dequeue_batch(self.batch_size, self.visibility_timeout, min_priority)
+            if not jobs:
+                self.queue.wait_for_work(self.poll_interval, min_priority)
+                continue
+            for job in jobs:
+                self._process(job)
+
+    def _process(self, job: Job) -> None:
+        _record_queue_wait(job)
+        try:
+            self.handler(job.headers, job.data)
+        except Exception as e:
+            _handle_job_failure(self.queue, job, e, self.max_attempts)
+            return
+        finally:
+            _record_job_latency(job)
+        self.queue.ack(job.id)
+
+
+class AsyncWorkerPool:
+    """
+    Drains a WorkQueue on the event loop, running each job as a task
+
+    A semaphore bounds the number of in-flight jobs, so concurrent deliveries cost tasks rather than threads.
+    Normal priority jobs may only fill concurrency - reserved_concurrency slots, so the rest are
+    always free for high priority jobs.
+
+    Attributes:
+        queue (WorkQueue): Queue the pool drains
+        handler (Callable): Coroutine function called with (headers, data) for every job
+    """
+    def __init__(
+            self,
+            queue: WorkQueue,
+            handler: Callable[[dict, dict], Awaitable[object]],
+            concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            reserved_concurrency: int = 0,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.reserved_concurrency = max(min(reserved_concurrency, concurrency - 1), 0)
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._stopping = False
+        self._runner: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._normal_in_flight = 0
+
+    def start(self) -> None:
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.queue.wake_all()
+        if self._runner is not None:
+            await self._runner
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while not self._stopping:
+            await semaphore.acquire()
+            free_slots = self.concurrency - len(self._tasks)
+            normal_slots = self.concurrency - self.reserved_concurrency - self._normal_in_flight
+            # Batches are leased highest priority first, so capping them at the free normal slots
+            # keeps normal jobs out of the reserved slots
+            min_priority = PRIORITY_NORMAL if normal_slots > 0 else PRIORITY_HIGH
+            batch_size = min(self.batch_size, free_slots)
+            if normal_slots > 0:
+                batch_size = min(batch_size, normal_slots)
+            jobs = await asyncio.to_thread(
+                self.queue.dequeue_batch,
+                batch_size,
+                self.visibility_timeout,
+                min_priority,
+            )
+            if not jobs:
+                semaphore.release()
+                await asyncio.to_thread(self.queue.wait_for_work, self.poll_interval, min_priority)
+                continue
+
+            for i, job in enumerate(jobs):
+                if i:
+                    await semaphore.acquire()
+                if job.priority == PRIORITY_NORMAL:
+                    self._normal_in_flight += 1
+                task = asyncio.create_task(self._process(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                task.add_done_callback(lambda _: semaphore.release())
+
+    async def _process(self, job: Job) -> None:
+        _record_queue_wait(job)
+        try:
+            await self.handler(job.headers, job.data)
+        except Exception as e:
+            await asyncio.to_thread(_handle_job_failure, self.queue, job, e, self.max_attempts)
+            return
+        finally:
+            _record_job_latency(job)
+            if job.priority == PRIORITY_NORMAL:
+                self._normal_in_flight -= 1
+        # Acks and deferrals write SQLite, so they run off the event loop like dequeue_batch
+        await asyncio.to_thread(self.queue.ack, job.id)
+
+
+def _record_queue_wait(job: Job) -> None:
+    """
+    Records how long a leased job waited in the queue
+
+    Only first deliveries are fed to the admission controller. Redelivered jobs also waited out a
+    visibility timeout, which says nothing about how far behind the workers are.
+    """
+    latency = max(time.time() - job.enqueued_at, 0.0)
+    STAGE_LATENCY.labels(stage="queue_wait").observe(latency)
+    JOB_QUEUE_WAIT.labels(priority=job.priority).observe(latency)
+    if job.attempts == 1:
+        get_admission_controller().observe_queue_latency(latency)
+
+
+def _record_job_latency(job: Job) -> None:
+    JOB_LATENCY.labels(priority=job.priority).observe(max(time.time() - job.enqueued_at, 0.0))
+
+
+def _handle_job_failure(queue: WorkQueue, job: Job, error: Exception, max_attempts: int) -> None:
+    """
+    Leaves a failed job leased for redelivery, or drops it once it has used all its attempts
+
+    Jobs whose delivery was deferred, e.g. shed by an open circuit breaker or throttled, were never
+    attempted, so they are deferred for the error's retry_after, and at least MIN_DEFER_DELAY,
+    instead of using up an attempt.
+    """
+    if isinstance(error, DeliveryDeferredError):
+        queue.defer(job.id, max(error.retry_after, MIN_DEFER_DELAY))
+        return
+    if job.attempts < max_attempts:
+        # Left leased so the job is redelivered once its visibility timeout expires
+        return
+    failure_log = LogEntry(
+        level="ERROR",
+        message=f"Dropping job after {job.attempts} attempts. {str(error)}",
+        service_name="Work Queue",
+        trace_id=job.headers.get("X-Twilio-Trace-ID", "None"),
+        context={"job_id": job.id},
+    )
+    logging.error(failure_log)
+    queue.ack(job.id)
+
+
+_work_queue: WorkQueue | None = None
+_work_queue_lock = threading.Lock()
+
+
+def get_work_queue() -> WorkQueue:
+    """
+    Gets the process-wide work queue. The database path is read from WORK_QUEUE_PATH
+
+    Returns:
+        WorkQueue: Shared work queue
+    """
+    global _work_queue
+    with _work_queue_lock:
+        if _work_queue is None:
+            _work_queue = WorkQueue(os.environ.get("WORK_QUEUE_PATH", DEFAULT_QUEUE_PATH))
+            WORK_QUEUE_DEPTH.set_function(_work_queue.depth)
+        return _work_queue
+
+
+# Admission controller paired with the work queue whose depth it reads
+_admission_controller: tuple[WorkQueue, AdmissionController] | None = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Gets the process-wide admission controller of the work queue, configured from WORK_QUEUE_MAX_DEPTH,
+    WORK_QUEUE_MIN_DEPTH and WORK_QUEUE_TARGET_LATENCY
+
+    Returns:
+        AdmissionController: Shared admission controller
+    """
+    global _admission_controller
+    queue = get_work_queue()
+    with _work_queue_lock:
+        if _admission_controller is None or _admission_controller[0] is not queue:
+            controller = AdmissionController(
+                queue.depth,
+                max_depth=int(os.environ.get("WORK_QUEUE_MAX_DEPTH", DEFAULT_MAX_QUEUE_DEPTH)),
+                min_depth=int(os.environ.get("WORK_QUEUE_MIN_DEPTH", DEFAULT_MIN_QUEUE_DEPTH)),
+                target_latency=float(os.environ.get("WORK_QUEUE_TARGET_LATENCY", DEFAULT_TARGET_QUEUE_LATENCY)),
+            )
+            _admission_controller = (queue, controller)
+            ADMISSION_LIMIT.set_function(lambda: controller.limit)
+        return _admission_controller[1]
+
+
+def _recover_work_queue() -> WorkQueue:
+    queue = get_work_queue()
+    recovered = queue.recover()
+    if recovered:
+        recovery_log = LogEntry(
+            level="INFO",
+            message=f"Recovered {recovered} leased jobs",
+            service_name="Work Queue",
+            trace_id=None,
+            context=None,
+        )
+        logging.info(recovery_log)
+    return queue
+
+
+def start_worker_pool(handler: Callable[[dict, dict], object]) -> WorkerPool:
+    """
+    Recovers leased jobs and starts a worker pool configured from environment variables
+
+    WORK_QUEUE_RESERVED_WORKERS of the WORK_QUEUE_WORKERS threads only take high priority jobs.
+
+    Args:
+        handler: Called with (headers, data) for every job
+
+    Returns:
+        WorkerPool: Started worker pool
+    """
+    queue = _recover_work_queue()
+    pool = WorkerPool(
+        queue,
+        handler,
+        worker_count=int(os.environ.get("WORK_QUEUE_WORKERS", DEFAULT_WORKER_COUNT)),
+        batch_size=int(os.environ.get("WORK_QUEUE_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        visibility_timeout=float(os.environ.get("WORK_QUEUE_VISIBILITY_TIMEOUT", DEFAULT_VISIBILITY_TIMEOUT)),
+        max_attempts=int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        reserved_workers=int(os.environ.get("WORK_QUEUE_RESERVED_WORKERS", DEFAULT_RESERVED_WORKERS)),
+    )
+    pool.start()
+    return pool
+
+
+def start_async_worker_pool(handler: Callable[[dict, dict], Awaitable[object]]) -> AsyncWorkerPool:
+    """
+    Recovers leased jobs and starts an async worker pool on the running event loop
+
+    The in-flight limit is read from the ASYNC_DELIVERY_CONCURRENCY environment variable, and the
+    slots reserved for high priority jobs from ASYNC_DELIVERY_RESERVED_CONCURRENCY.
+
+    Args:
+        handler: Coroutine function called with (headers, data) for every job
+
+    Returns:
+        AsyncWorkerPool: Started worker pool
+    """
+    queue = _recover_work_queue()
+    pool = AsyncWorkerPool(
+        queue,
+        handler,
+        concurrency=int(os.environ.get("ASYNC_DELIVERY_CONCURRENCY", DEFAULT_ASYNC_CONCURRENCY)),
+        batch_size=int(os.environ.get("WORK_QUEUE_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        visibility_timeout=float(os.environ.get("WORK_QUEUE_VISIBILITY_TIMEOUT", DEFAULT_VISIBILITY_TIMEOUT)),
+        max_attempts=int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        reserved_concurrency=int(os.environ.get("ASYNC_DELIVERY_RESERVED_CONCURRENCY",
+                                                DEFAULT_ASYNC_RESERVED_CONCURRENCY)),
+    )
+    pool.start()
+    return pool
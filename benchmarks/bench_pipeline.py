@@ -0,0 +1,218 @@
+"""
+Micro-benchmarks for every stage of the webhook pipeline
+
+Usage:
+    python -m benchmarks.bench_pipeline --output results.json
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable
+from urllib.parse import parse_qs
+
+from starlette.requests import Request
+
+from app.core.twilio_logic import validate_twilio_request, extract_message_info, sanitize_data
+from app.decision_logic import get_routes
+from app.email_sender import EmailSender
+from app.models import TwilioRequest, LogEntry
+from benchmarks.corpus import BENCHMARK_AUTH_TOKEN, build_corpora, encode_payload, sign_payload
+
+DEFAULT_ROUNDS = 15
+DEFAULT_CORPUS_SIZE = 200
+DEFAULT_THRESHOLD = 0.25
+
+
+def _build_request(signature: str) -> Request:
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/webhooks/twilio",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bridge.example.com"),
+            (b"x-forwarded-proto", b"https"),
+            (b"x-twilio-signature", signature.encode("utf-8")),
+        ],
+    }
+    return Request(scope)
+
+
+def build_stages(corpus: list[dict]) -> dict[str, Callable[[], None]]:
+    """
+    Builds one callable per pipeline stage that processes every payload of the corpus once
+
+    Inputs for each stage are prepared up front so only the stage itself is timed.
+
+    Args:
+        corpus: Webhook payloads
+
+    Returns:
+        dict: Stage name mapped to a callable running the stage over the corpus
+    """
+    signed = [(_build_request(sign_payload(payload)), encode_payload(payload)) for payload in corpus]
+    messages = [
+        SimpleNamespace(from_=payload["From"], body=payload["Body"], date_created=datetime.now())
+        for payload in corpus
+    ]
+    extracted = [{"from": payload["From"], "body": payload["Body"]} for payload in corpus]
+    log_entries = [
+        LogEntry(
+            level="INFO",
+            message="SMS Processed Successfully",
+            service_name="Twilio Webhook",
+            trace_id="None",
+            context=sanitize_data(payload),
+        )
+        for payload in corpus
+    ]
+
+    def validate():
+        for request, body in signed:
+            if not validate_twilio_request(request, parse_qs(body.decode("utf-8"), keep_blank_values=True)):
+                raise AssertionError("Benchmark payload failed signature validation")
+
+    def parse():
+        for payload in corpus:
+            TwilioRequest(**payload)
+
+    def extract():
+        for message in messages:
+            extract_message_info(message)
+
+    def route():
+        for message in extracted:
+            get_routes(message)
+
+    def build_email():
+        for payload in corpus:
+            EmailSender.build_email("inbox@example.com", payload["Body"], f"New Text Message from {payload['From']}")
+
+    def sanitize():
+        for payload in corpus:
+            sanitize_data(payload)
+
+    def to_json():
+        for entry in log_entries:
+            entry.to_json()
+
+    return {
+        "validate_twilio_request": validate,
+        "twilio_request_parse": parse,
+        "extract_message_info": extract,
+        "get_routes": route,
+        "build_email": build_email,
+        "sanitize_data": sanitize,
+        "log_entry_to_json": to_json,
+    }
+
+
+def time_stage(stage: Callable[[], None], operations: int, rounds: int) -> dict:
+    """
+    Times a stage over several rounds after one warm-up round
+
+    Returns:
+        dict: median_ns and min_ns per operation
+    """
+    stage()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        stage()
+        samples.append((time.perf_counter_ns() - start) / operations)
+    return {"median_ns": round(statistics.median(samples), 1), "min_ns": round(min(samples), 1)}
+
+
+def run_benchmarks(rounds: int = DEFAULT_ROUNDS, size: int = DEFAULT_CORPUS_SIZE, stage_filter: str | None = None) -> dict:
+    """
+    Runs every stage against every corpus
+
+    Returns:
+        dict: Results keyed "<stage>/<corpus>" along with metadata about the run
+    """
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", BENCHMARK_AUTH_TOKEN)
+    os.environ.setdefault("FROM_ADDRESS", "bridge@example.com")
+
+    results = {}
+    for corpus_name, corpus in build_corpora(size).items():
+        for stage_name, stage in build_stages(corpus).items():
+            if stage_filter and stage_filter not in stage_name:
+                continue
+            results[f"{stage_name}/{corpus_name}"] = time_stage(stage, len(corpus), rounds)
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rounds": rounds,
+            "corpus_size": size,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Finds benchmarks whose fastest round got slower than the baseline by more than the threshold
+
+    The minimum is compared rather than the median because it is far less sensitive to scheduler noise.
+
+    Args:
+        current: Results of this run
+        baseline: Stored baseline results
+        threshold: Allowed slowdown as a fraction, 0.25 allows 25% slower
+
+    Returns:
+        list[str]: One description per regression. Empty if nothing regressed
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        expected = baseline["results"].get(name)
+        if not expected:
+            continue
+        ratio = result["min_ns"] / expected["min_ns"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {result['min_ns']:.0f}ns vs baseline {expected['min_ns']:.0f}ns ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the webhook pipeline")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown fraction")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--size", type=int, default=DEFAULT_CORPUS_SIZE, help="Payloads per corpus")
+    parser.add_argument("--stage", help="Only run stages whose name contains this value")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.rounds, args.size, args.stage)
+    for name, result in current["results"].items():
+        print(f"{name:45} {result['median_ns']:>12.0f} ns/op  (min {result['min_ns']:.0f})")
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as output_file:
+            json.dump(current, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="UTF-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(current, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
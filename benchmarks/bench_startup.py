@@ -0,0 +1,129 @@
+"""
+Cold-start benchmark for the application module
+
+Each round imports the app in a fresh interpreter, the way a Cloud Functions instance starts. The
+run also fails if any of the heavy SDK modules that the webhook ack path defers are imported.
+
+Usage:
+    python -m benchmarks.bench_startup --output benchmarks/startup_baseline.json
+    python -m benchmarks.bench_startup --baseline benchmarks/startup_baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.bench_pipeline import compare_results
+
+DEFAULT_MODULE = "app.core.main"
+DEFAULT_ROUNDS = 7
+DEFAULT_THRESHOLD = 0.25
+
+# Imported on first use by the delivery pipeline, never at startup
+DEFERRED_MODULES = (
+    "twilio.rest",
+    "twilio.http.http_client",
+    "twilio.http.async_http_client",
+    "requests",
+    "aiohttp",
+    "httpx",
+    "googleapiclient.discovery",
+    "google.cloud.secretmanager",
+    "google.oauth2.service_account",
+    "google.auth.transport.requests",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter_ns()
+import {module}
+elapsed = time.perf_counter_ns() - start
+print(json.dumps({{"elapsed_ns": elapsed, "loaded": [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def measure_cold_start(module: str = DEFAULT_MODULE) -> dict:
+    """
+    Imports a module once in a fresh interpreter
+
+    Args:
+        module: Dotted path of the module to import
+
+    Returns:
+        dict: "elapsed_ns" for the import and the deferred modules it "loaded"
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(rounds: int = DEFAULT_ROUNDS, module: str = DEFAULT_MODULE) -> dict:
+    """
+    Measures cold start over several fresh interpreters
+
+    Args:
+        rounds: Number of interpreters to start
+        module: Dotted path of the module to import
+
+    Returns:
+        dict: Results in the same shape as bench_pipeline, plus the deferred modules that were loaded
+    """
+    samples = [measure_cold_start(module) for _ in range(rounds)]
+    timings = [sample["elapsed_ns"] for sample in samples]
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rounds": rounds,
+        },
+        "results": {
+            f"cold_start/{module}": {
+                "median_ns": statistics.median(timings),
+                "min_ns": min(timings),
+            },
+        },
+        "deferred_loaded": loaded,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark application cold start")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown fraction")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Module to import")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.rounds, args.module)
+    for name, result in current["results"].items():
+        print(f"{name:45} {result['median_ns'] / 1e6:>9.1f} ms  (min {result['min_ns'] / 1e6:.1f})")
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as output_file:
+            json.dump(current, output_file, indent=2)
+
+    failed = False
+    for name in current["deferred_loaded"]:
+        print(f"REGRESSION {name} is imported at startup", file=sys.stderr)
+        failed = True
+    if args.baseline:
+        with open(args.baseline, "r", encoding="UTF-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        for regression in compare_results(current, baseline, args.threshold):
+            print(f"REGRESSION {regression}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
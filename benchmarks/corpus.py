@@ -0,0 +1,87 @@
+import random
+from urllib.parse import urlencode
+
+from twilio.request_validator import RequestValidator
+
+BENCHMARK_AUTH_TOKEN = "benchmark_auth_token"
+BENCHMARK_URL = "https://bridge.example.com/webhooks/twilio"
+
+SHORT_BODIES = [
+    "Hello World!",
+    "Your login code is 482913",
+    "[WARNING] - disk usage at 91% on db-1",
+    "[CRITICAL] - api-gateway unreachable",
+    "Running 10 min late, see you soon",
+]
+UNICODE_FRAGMENTS = ["café ", "naïve ", "日本語のメッセージ ", "\U0001F600 ", "Привет ", "código 123456 ", "ünïcödé "]
+LONG_FRAGMENTS = ["lorem ipsum dolor sit amet ", "alert threshold exceeded ", "verification ", "status ok "]
+
+
+def _long_body(generator: random.Random) -> str:
+    # Ten GSM segments worth of text
+    body = ""
+    while len(body) < 1530:
+        body += generator.choice(LONG_FRAGMENTS)
+    return body[:1530]
+
+
+def _unicode_body(generator: random.Random) -> str:
+    # Five UCS-2 segments worth of text
+    body = ""
+    while len(body) < 335:
+        body += generator.choice(UNICODE_FRAGMENTS)
+    return body[:335]
+
+
+def build_webhook_payload(body: str, index: int) -> dict:
+    """
+    Builds a webhook form payload shaped like Twilio's inbound SMS request
+    """
+    sid = f"SM{index:032x}"
+    return {
+        "SmsSid": sid,
+        "SmsStatus": "received",
+        "MessageSid": sid,
+        "AccountSid": "AC" + "0" * 32,
+        "From": f"+1555{index % 10_000_000:07d}",
+        "ApiVersion": "2010-04-01",
+        "SmsMessageSid": sid,
+        "NumSegments": str(len(body) // 153 + 1),
+        "To": "+15550000000",
+        "MessageStatus": "received",
+        "Body": body,
+        "FromCountry": "US",
+        "ToCountry": "US",
+        "NumMedia": "0",
+    }
+
+
+def sign_payload(payload: dict, url: str = BENCHMARK_URL, auth_token: str = BENCHMARK_AUTH_TOKEN) -> str:
+    """
+    Returns:
+        str: X-Twilio-Signature header value for the payload
+    """
+    return RequestValidator(auth_token).compute_signature(url, payload)
+
+
+def build_corpora(size: int = 200, seed: int = 1202) -> dict[str, list[dict]]:
+    """
+    Builds deterministic corpora of webhook payloads
+
+    Args:
+        size: Number of payloads per corpus
+        seed: Random seed
+
+    Returns:
+        dict: Corpus name mapped to a list of payloads. Corpora are "short", "long" and "unicode"
+    """
+    generator = random.Random(seed)
+    return {
+        "short": [build_webhook_payload(generator.choice(SHORT_BODIES), i) for i in range(size)],
+        "long": [build_webhook_payload(_long_body(generator), i) for i in range(size)],
+        "unicode": [build_webhook_payload(_unicode_body(generator), i) for i in range(size)],
+    }
+
+
+def encode_payload(payload: dict) -> bytes:
+    return urlencode(payload).encode("utf-8")
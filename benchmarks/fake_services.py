@@ -0,0 +1,436 @@
+"""
+Local stand-ins for the Twilio Messages API (fetch and send), the Gmail messages.send and batch APIs and
+Discord webhooks
+
+All servers run in background threads and inject configurable latency, server errors and 429s,
+so the relay can be load tested entirely offline.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from email import message_from_bytes
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+@dataclass
+class FakeServiceConfig:
+    """
+    Attributes:
+        latency (float): Seconds added to every response
+        jitter (float): Up to this many extra seconds are added at random
+        error_rate (float): Fraction of requests answered with a 500
+        throttle_rate (float): Fraction of requests answered with a 429
+        seed (int | None): Seed for the fault injection random generator
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    seed: int | None = None
+
+
+@dataclass
+class Delivery:
+    received_at: float
+    to: str
+    subject: str
+    body: str
+
+
+class FakeService:
+    """
+    Base class running a ThreadingHTTPServer on a free local port
+
+    Attributes:
+        config (FakeServiceConfig): Fault injection settings
+        status_counts (Counter): Responses sent, keyed on HTTP status
+    """
+    def __init__(self, config: FakeServiceConfig | None = None):
+        self.config = config or FakeServiceConfig()
+        self.status_counts: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._build_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeService":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *excinfo):
+        self.stop()
+
+    def _inject_fault(self) -> int | None:
+        """
+        Sleeps for the configured latency and picks an injected error status, if any
+        """
+        with self._lock:
+            delay = self.config.latency + self._random.random() * self.config.jitter
+            roll = self._random.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.config.throttle_rate:
+            return 429
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            return 500
+        return None
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict] | tuple[int, dict | None, dict]:
+        """
+        Answers a request that passed fault injection
+
+        Returns:
+            tuple: Status and JSON payload, optionally followed by extra response headers.
+                A None payload sends an empty body and a bytes payload is sent as is
+        """
+        raise NotImplementedError
+
+    def _build_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which stalls keep-alive clients on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def _respond(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status = service._inject_fault()
+                headers = {}
+                if status is None:
+                    status, payload, *extra = service.handle(method, self.path, body)
+                    headers = extra[0] if extra else {}
+                else:
+                    payload = {"error": {"code": status, "message": "Injected fault"}}
+                    if status == 429:
+                        headers = {"Retry-After": "1"}
+                with service._lock:
+                    service.status_counts[status] += 1
+
+                if isinstance(payload, bytes):
+                    encoded = payload
+                else:
+                    encoded = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", headers.pop("Content-Type", "application/json"))
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeTwilioServer(FakeService):
+    """
+    Emulates GET /2010-04-01/Accounts/{AccountSid}/Messages/{MessageSid}.json and
+    POST /2010-04-01/Accounts/{AccountSid}/Messages.json
+
+    Messages must be registered with add_message before they can be fetched. Unknown messages return 404.
+    Sent messages are recorded. When send_limit is set, sends past send_limit per send_window seconds
+    are answered with a 429, like a messaging service over its throughput.
+
+    Attributes:
+        sent (list[dict]): Form parameters of every accepted send
+    """
+    path_pattern = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages/(?P<sid>[^/.]+)\.json")
+    send_path_pattern = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/Messages\.json")
+
+    def __init__(self, config: FakeServiceConfig | None = None, send_limit: int | None = None, send_window: float = 1.0):
+        super().__init__(config)
+        self.messages: dict[str, dict] = {}
+        self.sent: list[dict] = []
+        self.send_limit = send_limit
+        self.send_window = send_window
+        self._sent_changed = threading.Condition()
+        self._window_start = 0.0
+        self._window_count = 0
+
+    def add_message(self, payload: dict) -> None:
+        """
+        Registers a webhook payload so its message can be fetched
+
+        Args:
+            payload: Twilio webhook form payload
+        """
+        self.messages[payload["MessageSid"]] = {
+            "sid": payload["MessageSid"],
+            "account_sid": payload.get("AccountSid"),
+            "from": payload.get("From"),
+            "to": payload.get("To"),
+            "body": payload.get("Body"),
+            "status": "received",
+            "direction": "inbound",
+            "num_segments": payload.get("NumSegments", "1"),
+            "num_media": payload.get("NumMedia", "0"),
+            "date_created": format_datetime(datetime.now(timezone.utc), usegmt=True),
+        }
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        send_match = self.send_path_pattern.match(path)
+        if method == "POST" and send_match:
+            return self._send(send_match.group("account"), body)
+        match = self.path_pattern.match(path)
+        if method != "GET" or not match:
+            return 404, {"code": 20404, "message": "The requested resource was not found", "status": 404}
+        message = self.messages.get(match.group("sid"))
+        if message is None:
+            return 404, {"code": 20404, "message": "The requested resource was not found", "status": 404}
+        return 200, message
+
+    def _send(self, account_sid: str, body: bytes) -> tuple[int, dict]:
+        params = {name: values[-1] for name, values in parse_qs(body.decode("utf-8")).items()}
+        if not params.get("To") or not params.get("Body"):
+            return 400, {"code": 21604, "message": "A 'To' phone number and a 'Body' are required", "status": 400}
+
+        with self._sent_changed:
+            if self.send_limit is not None:
+                now = time.monotonic()
+                if now - self._window_start >= self.send_window:
+                    self._window_start = now
+                    self._window_count = 0
+                if self._window_count >= self.send_limit:
+                    return 429, {"code": 20429, "message": "Too Many Requests", "status": 429}
+                self._window_count += 1
+            self.sent.append(params)
+            sid = f"SM{len(self.sent):032d}"
+            self._sent_changed.notify_all()
+        return 201, {
+            "sid": sid,
+            "account_sid": account_sid,
+            "to": params["To"],
+            "from": params.get("From"),
+            "messaging_service_sid": params.get("MessagingServiceSid"),
+            "body": params["Body"],
+            "status": "queued",
+            "direction": "outbound-api",
+            "date_created": format_datetime(datetime.now(timezone.utc), usegmt=True),
+        }
+
+    def wait_for_sent(self, count: int, timeout: float) -> bool:
+        """
+        Blocks until at least count messages were sent
+
+        Returns:
+            bool: True if the count was reached before the timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._sent_changed:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._sent_changed.wait(remaining)
+        return True
+
+
+class FakeGmailServer(FakeService):
+    """
+    Emulates POST /gmail/v1/users/{userId}/messages/send and the POST /batch endpoint, and records
+    every delivered email
+
+    Faults are injected per HTTP request, so a faulty batch request fails every message in it.
+
+    Attributes:
+        batch_sizes (list[int]): Number of sends in every batch request received
+    """
+    path_pattern = re.compile(r"^/gmail/v1/users/[^/]+/messages/send")
+    batch_path = "/batch"
+
+    def __init__(self, config: FakeServiceConfig | None = None):
+        super().__init__(config)
+        self.deliveries: list[Delivery] = []
+        self.batch_sizes: list[int] = []
+        self._delivered = threading.Condition()
+        self._next_id = 0
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict] | tuple[int, bytes, dict]:
+        if method == "POST" and path.split("?")[0] == self.batch_path:
+            return self._batch(body)
+        if method != "POST" or not self.path_pattern.match(path):
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        return self._send(body)
+
+    def _batch(self, body: bytes) -> tuple[int, dict] | tuple[int, bytes, dict]:
+        """
+        Answers a multipart/mixed batch with one application/http response part per request part
+        """
+        boundary = body.split(b"\n", 1)[0].strip()
+        if not boundary.startswith(b"--"):
+            return 400, {"error": {"code": 400, "message": "Invalid batch request"}}
+        parts = [part for part in message_from_bytes(
+            b"Content-Type: multipart/mixed; boundary=" + boundary[2:] + b"\r\n\r\n" + body
+        ).get_payload()]
+
+        response_boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in parts:
+            request = part.get_payload()
+            if isinstance(request, list):
+                request = request[0].as_string()
+            request_line, _, rest = request.partition("\n")
+            request_body = rest.split("\n\n", 1)[1] if "\n\n" in rest else ""
+            method, path, _ = request_line.split(" ", 2)
+            if method == "POST" and self.path_pattern.match(path):
+                status, payload = self._send(request_body.encode("utf-8"))
+            else:
+                status, payload = 404, {"error": {"code": 404, "message": "Not Found"}}
+            chunks.append(
+                f"--{response_boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                "Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        with self._delivered:
+            self.batch_sizes.append(len(parts))
+        payload = ("".join(chunks) + f"--{response_boundary}--\r\n").encode("utf-8")
+        return 200, payload, {"Content-Type": f"multipart/mixed; boundary={response_boundary}"}
+
+    def _send(self, body: bytes) -> tuple[int, dict]:
+        try:
+            raw = json.loads(body)["raw"]
+            email = message_from_bytes(base64.urlsafe_b64decode(raw))
+        except (ValueError, KeyError):
+            return 400, {"error": {"code": 400, "message": "Invalid raw message"}}
+
+        payload = email.get_payload(decode=True)
+        delivery = Delivery(
+            received_at=time.perf_counter(),
+            to=email["to"],
+            subject=email["subject"],
+            body=payload.decode(email.get_content_charset() or "utf-8") if payload else "",
+        )
+        with self._delivered:
+            self._next_id += 1
+            message_id = f"fake-{self._next_id}"
+            self.deliveries.append(delivery)
+            self._delivered.notify_all()
+        return 200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+    def wait_for_deliveries(self, count: int, timeout: float) -> bool:
+        """
+        Blocks until at least count emails were delivered
+
+        Returns:
+            bool: True if the count was reached before the timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._delivered:
+            while len(self.deliveries) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._delivered.wait(remaining)
+        return True
+
+
+class FakeDiscordServer(FakeService):
+    """
+    Emulates POST /api/webhooks/{webhook_id}/{token} with a fixed-window rate limit bucket
+
+    Accepted posts are answered with 204 and X-RateLimit-* headers. Posts over the limit get a 429
+    with retry_after, like Discord. Every accepted embed is recorded.
+
+    Attributes:
+        posts (list[list[dict]]): Embeds of every accepted post
+    """
+    path_pattern = re.compile(r"^/api/webhooks/[^/]+/[^/?]+")
+
+    def __init__(self, config: FakeServiceConfig | None = None, limit: int = 5, window: float = 2.0):
+        super().__init__(config)
+        self.limit = limit
+        self.window = window
+        self.posts: list[list[dict]] = []
+        self._posted = threading.Condition()
+        self._window_start = 0.0
+        self._window_count = 0
+
+    @property
+    def webhook_url(self) -> str:
+        return f"{self.base_url}/api/webhooks/1234/fake-token"
+
+    @property
+    def embeds(self) -> list[dict]:
+        return [embed for post in self.posts for embed in post]
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict | None, dict]:
+        if method != "POST" or not self.path_pattern.match(path):
+            return 404, {"message": "Unknown Webhook", "code": 10015}, {}
+        try:
+            embeds = json.loads(body)["embeds"]
+        except (ValueError, KeyError):
+            return 400, {"message": "Cannot send an empty message", "code": 50006}, {}
+        if not 1 <= len(embeds) <= 10:
+            return 400, {"message": "Invalid Form Body", "code": 50035}, {}
+
+        with self._posted:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._window_count = 0
+            reset_after = self._window_start + self.window - now
+            headers = {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                "X-RateLimit-Bucket": "fake-webhook-bucket",
+            }
+            if self._window_count >= self.limit:
+                headers["X-RateLimit-Remaining"] = "0"
+                return 429, {"message": "You are being rate limited.", "retry_after": reset_after, "global": False}, headers
+            self._window_count += 1
+            headers["X-RateLimit-Remaining"] = str(self.limit - self._window_count)
+            self.posts.append(embeds)
+            self._posted.notify_all()
+        return 204, None, headers
+
+    def wait_for_embeds(self, count: int, timeout: float) -> bool:
+        """
+        Blocks until at least count embeds were posted
+
+        Returns:
+            bool: True if the count was reached before the timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._posted:
+            while len(self.embeds) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._posted.wait(remaining)
+        return True
@@ -0,0 +1,125 @@
+"""
+Import-time report aggregated per subsystem
+
+Runs ``python -X importtime`` on a module in a fresh interpreter and sums each module's own import
+time into its subsystem, so the cost of e.g. the Twilio SDK or the Google client libraries shows up
+as one line instead of hundreds.
+
+Usage:
+    python -m benchmarks.import_report
+    python -m benchmarks.import_report --module app.endpoints.twilio_webhooks --top 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+DEFAULT_MODULE = "app.core.main"
+DEFAULT_TOP = 15
+
+# Namespace packages whose children are separate libraries, reported one level deeper
+SPLIT_PACKAGES = {"app", "google", "google.cloud"}
+
+
+def run_importtime(module: str = DEFAULT_MODULE) -> str:
+    """
+    Imports a module in a fresh interpreter with -X importtime
+
+    Args:
+        module: Dotted path of the module to import
+
+    Returns:
+        str: Raw importtime output written to stderr
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return completed.stderr
+
+
+def parse_importtime(output: str) -> list[tuple[str, int]]:
+    """
+    Parses -X importtime output
+
+    Args:
+        output: Raw importtime output
+
+    Returns:
+        list[tuple[str, int]]: Module name and self time in microseconds for every imported module
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Header line
+            continue
+        modules.append((fields[2].strip(), int(fields[0])))
+    return modules
+
+
+def subsystem_of(module: str) -> str:
+    """
+    Maps a module to the subsystem it is reported under
+
+    Args:
+        module: Dotted module name
+
+    Returns:
+        str: "stdlib" for standard library modules, otherwise the package it belongs to
+    """
+    parts = module.split(".")
+    if parts[0] in sys.stdlib_module_names or parts[0].lstrip("_") in sys.stdlib_module_names:
+        return "stdlib"
+    name = parts[0]
+    for part in parts[1:]:
+        if name not in SPLIT_PACKAGES:
+            break
+        name = f"{name}.{part}"
+    return name
+
+
+def aggregate(modules: list[tuple[str, int]]) -> dict[str, dict]:
+    """
+    Sums self time and module counts per subsystem
+
+    Args:
+        modules: Output of parse_importtime
+
+    Returns:
+        dict: Subsystem name to {"self_us", "modules"}, slowest first
+    """
+    totals: dict[str, dict] = {}
+    for module, self_us in modules:
+        entry = totals.setdefault(subsystem_of(module), {"self_us": 0, "modules": 0})
+        entry["self_us"] += self_us
+        entry["modules"] += 1
+    return dict(sorted(totals.items(), key=lambda item: item[1]["self_us"], reverse=True))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time per subsystem")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Module to import")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Number of subsystems to list")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = aggregate(parse_importtime(run_importtime(args.module)))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    total_us = sum(entry["self_us"] for entry in report.values())
+    for name, entry in list(report.items())[:args.top]:
+        share = entry["self_us"] / total_us if total_us else 0
+        print(f"{name:40} {entry['self_us'] / 1000:>9.1f} ms  {share:>6.1%}  ({entry['modules']} modules)")
+    print(f"{'total':40} {total_us / 1000:>9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
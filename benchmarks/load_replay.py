@@ -0,0 +1,236 @@
+"""
+End-to-end load replay against app.core.main:app with local Twilio and Gmail stand-ins
+
+Replays a JSONL corpus of webhook payloads, signed like Twilio signs them, against the relay running
+in-process under uvicorn, and reports throughput, ack latency, delivery latency and errors.
+
+Usage:
+    python -m benchmarks.load_replay --generate 500 --concurrency 50
+    python -m benchmarks.load_replay --corpus payloads.jsonl --gmail-latency 0.1 --gmail-throttle-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from unittest.mock import patch
+
+import httpx
+import uvicorn
+from google.oauth2.credentials import Credentials
+
+from benchmarks.corpus import build_corpora, sign_payload
+from benchmarks.fake_services import FakeGmailServer, FakeServiceConfig, FakeTwilioServer
+
+LOAD_TEST_AUTH_TOKEN = "load_test_auth_token"
+LOAD_TEST_ACCOUNT_SID = "AC" + "1" * 32
+
+
+def load_corpus(path: str) -> list[dict]:
+    """
+    Reads webhook payloads from a JSONL file, one form payload per line
+    """
+    with open(path, "r", encoding="UTF-8") as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def generate_corpus(count: int) -> list[dict]:
+    """
+    Builds a mixed corpus of short, long and unicode payloads
+    """
+    corpora = build_corpora(size=count // 3 + 1)
+    mixed = [payload for group in zip(*corpora.values()) for payload in group]
+    return mixed[:count]
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure_environment(twilio: FakeTwilioServer, gmail: FakeGmailServer, args, work_dir: str) -> None:
+    os.environ.update({
+        "TWILIO_ACCOUNT_SID": LOAD_TEST_ACCOUNT_SID,
+        "TWILIO_AUTH_TOKEN": LOAD_TEST_AUTH_TOKEN,
+        "TWILIO_API_BASE_URL": twilio.base_url,
+        "TWILIO_MESSAGE_SOURCE": args.message_source,
+        "GMAIL_API_ENDPOINT": gmail.base_url + "/",
+        "DELEGATED_USER_EMAIL": "relay@example.com",
+        "PROJECT_ID": "load-test",
+        "SECRET_NAME": "load-test",
+        "MY_EMAIL": "inbox@example.com",
+        "FROM_ADDRESS": "relay@example.com",
+        "DELIVERY_MODE": args.delivery_mode,
+        "WORK_QUEUE_PATH": os.path.join(work_dir, "work_queue.db"),
+        "WORK_QUEUE_VISIBILITY_TIMEOUT": str(args.visibility_timeout),
+        "GMAIL_BATCH_SEND": "true" if args.gmail_batch else "false",
+    })
+
+
+async def _replay(base_url: str, corpus: list[dict], twilio: FakeTwilioServer, concurrency: int, rate: float):
+    url = f"{base_url}/webhooks/twilio"
+    semaphore = asyncio.Semaphore(concurrency)
+    ack_latencies = []
+    ack_statuses = Counter()
+    sent_at = defaultdict(deque)
+
+    async def send(client: httpx.AsyncClient, payload: dict):
+        async with semaphore:
+            twilio.add_message(payload)
+            headers = {"X-Twilio-Signature": sign_payload(payload, url, LOAD_TEST_AUTH_TOKEN)}
+            start = time.perf_counter()
+            sent_at[payload["Body"]].append(start)
+            try:
+                response = await client.post(url, data=payload, headers=headers)
+                ack_statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                ack_statuses[type(e).__name__] += 1
+                return
+            ack_latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        tasks = []
+        for payload in corpus:
+            tasks.append(asyncio.create_task(send(client, payload)))
+            if rate:
+                await asyncio.sleep(1 / rate)
+        await asyncio.gather(*tasks)
+    return ack_latencies, ack_statuses, sent_at
+
+
+def run_load_test(corpus: list[dict], args) -> dict:
+    """
+    Starts the fake services and the relay, replays the corpus and collects a report
+
+    Args:
+        corpus: Webhook payloads to replay
+        args: Parsed command line arguments
+
+    Returns:
+        dict: Load test report
+    """
+    twilio_config = FakeServiceConfig(args.twilio_latency, args.jitter, args.twilio_error_rate,
+                                      args.twilio_throttle_rate, args.seed)
+    gmail_config = FakeServiceConfig(args.gmail_latency, args.jitter, args.gmail_error_rate,
+                                     args.gmail_throttle_rate, args.seed)
+    if args.unique_sids:
+        corpus = [dict(payload) for payload in corpus]
+        for payload in corpus:
+            sid = "SM" + uuid.uuid4().hex
+            payload.update({"MessageSid": sid, "SmsSid": sid, "SmsMessageSid": sid})
+            payload["AccountSid"] = LOAD_TEST_ACCOUNT_SID
+
+    with FakeTwilioServer(twilio_config) as twilio, FakeGmailServer(gmail_config) as gmail, \
+            tempfile.TemporaryDirectory() as work_dir:
+        _configure_environment(twilio, gmail, args, work_dir)
+        credentials = Credentials(token="load-test-token")
+        with patch("app.email_sender.email_sender.get_delegated_credentials", return_value=credentials):
+            from app.core.main import app
+
+            port = _free_port()
+            server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+            server_thread = threading.Thread(target=server.run, daemon=True)
+            server_thread.start()
+            while not server.started:
+                time.sleep(0.01)
+
+            start = time.perf_counter()
+            ack_latencies, ack_statuses, sent_at = asyncio.run(
+                _replay(f"http://127.0.0.1:{port}", corpus, twilio, args.concurrency, args.rate)
+            )
+            ingest_duration = time.perf_counter() - start
+            expected = ack_statuses.get(200, 0)
+            gmail.wait_for_deliveries(expected, args.timeout)
+            total_duration = time.perf_counter() - start
+
+            server.should_exit = True
+            server_thread.join(10)
+
+        delivery_latencies = []
+        for delivery in list(gmail.deliveries):
+            pending = sent_at.get(delivery.body)
+            if pending:
+                delivery_latencies.append(delivery.received_at - pending.popleft())
+
+        return {
+            "requests": len(corpus),
+            "ingest_seconds": round(ingest_duration, 3),
+            "ingest_requests_per_second": round(len(corpus) / ingest_duration, 1),
+            "delivered": len(gmail.deliveries),
+            "undelivered": max(0, expected - len(gmail.deliveries)),
+            "delivery_messages_per_second": round(len(gmail.deliveries) / total_duration, 1),
+            "ack_latency_ms": {
+                "p50": _ms(percentile(ack_latencies, 0.5)),
+                "p99": _ms(percentile(ack_latencies, 0.99)),
+            },
+            "delivery_latency_ms": {
+                "p50": _ms(percentile(delivery_latencies, 0.5)),
+                "p99": _ms(percentile(delivery_latencies, 0.99)),
+            },
+            "ack_statuses": {str(status): count for status, count in ack_statuses.items()},
+            "twilio_statuses": {str(status): count for status, count in twilio.status_counts.items()},
+            "gmail_statuses": {str(status): count for status, count in gmail.status_counts.items()},
+            "gmail_batch_requests": len(gmail.batch_sizes),
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay signed webhooks against the relay with fake downstreams")
+    corpus_group = parser.add_mutually_exclusive_group(required=True)
+    corpus_group.add_argument("--corpus", help="JSONL file of webhook form payloads")
+    corpus_group.add_argument("--generate", type=int, help="Generate this many synthetic payloads")
+    parser.add_argument("--concurrency", type=int, default=50, help="Maximum in-flight webhook requests")
+    parser.add_argument("--rate", type=float, default=0, help="Requests started per second. 0 is unlimited")
+    parser.add_argument("--message-source", choices=["webhook", "rest"], default="webhook")
+    parser.add_argument("--delivery-mode", choices=["threads", "async"], default="threads")
+    parser.add_argument("--twilio-latency", type=float, default=0.0)
+    parser.add_argument("--twilio-error-rate", type=float, default=0.0)
+    parser.add_argument("--twilio-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--gmail-latency", type=float, default=0.0)
+    parser.add_argument("--gmail-error-rate", type=float, default=0.0)
+    parser.add_argument("--gmail-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--gmail-batch", action="store_true", help="Send emails through the Gmail batch endpoint")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--visibility-timeout", type=float, default=2.0, help="Seconds before failed jobs retry")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for deliveries")
+    parser.add_argument("--keep-sids", dest="unique_sids", action="store_false",
+                        help="Replay MessageSids as-is instead of generating unique ones")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(args.generate)
+    report = run_load_test(corpus, args)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
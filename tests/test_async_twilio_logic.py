@@ -0,0 +1,80 @@
+import os
+import unittest
+from datetime import datetime
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from twilio.base.exceptions import TwilioRestException
+from twilio.rest.api.v2010.account.message import MessageInstance
+
+from app.core.async_twilio_logic import get_full_twilio_data_async, get_message_info_async, \
+    twilio_background_task_async
+from app.exceptions import RequiresClientException, ResourceNotFoundException
+
+
+class AsyncTwilioLogicTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_get_full_twilio_data_async_raises_error_on_missing_client(self):
+        with self.assertRaises(RequiresClientException):
+            await get_full_twilio_data_async(client=None, msg_sid="Fake Sid")
+
+    async def test_get_full_twilio_data_async_raises_error_on_invalid_message_sid(self):
+        fake_client = MagicMock()
+        fake_client.messages.return_value.fetch_async = AsyncMock(side_effect=TwilioRestException(
+            status=404,
+            uri="/2010-04-01/Accounts/AC.../Messages/SM_not_found",
+            msg="The requested resource was not found"
+        ))
+        with self.assertRaises(ResourceNotFoundException):
+            await get_full_twilio_data_async(client=fake_client, msg_sid="invalid_sid")
+
+    async def test_get_full_twilio_data_async_returns_message(self):
+        mock_return_message = MagicMock(spec=MessageInstance)
+        fake_client = MagicMock()
+        fake_client.messages.return_value.fetch_async = AsyncMock(return_value=mock_return_message)
+
+        msg = await get_full_twilio_data_async(client=fake_client, msg_sid="valid_sid")
+
+        self.assertIs(msg, mock_return_message)
+
+    @patch.dict(os.environ, {'TWILIO_MESSAGE_SOURCE': 'rest'})
+    @patch('app.core.async_twilio_logic.get_async_client')
+    @patch('app.core.async_twilio_logic.get_full_twilio_data_async')
+    async def test_get_message_info_async_fetches_message_in_rest_mode(
+            self,
+            mock_get_full_twilio_data_async,
+            mock_get_async_client
+    ):
+        mock_message_instance = MagicMock(spec=MessageInstance)
+        mock_message_instance.body = "Fetched Body"
+        mock_message_instance.from_ = "+11234567890"
+        mock_message_instance.date_created = datetime.now()
+        mock_get_full_twilio_data_async.return_value = mock_message_instance
+
+        data = await get_message_info_async({'MessageSid': 'SM123', 'From': '+11234567890', 'Body': 'Test Body'})
+
+        self.assertEqual(data['body'], 'Fetched Body')
+        mock_get_full_twilio_data_async.assert_awaited_once_with(mock_get_async_client.return_value, 'SM123')
+
+    @patch.dict(os.environ, {'MY_EMAIL': 'email@example.com'})
+    @patch('app.sinks.email_sink.AsyncEmailSender')
+    @patch('app.core.async_twilio_logic.get_async_client')
+    async def test_background_task_async_sends_email_from_webhook_payload(
+            self,
+            mock_get_async_client,
+            mock_email_sender
+    ):
+        mock_sender_instance = mock_email_sender.return_value
+        mock_sender_instance.send_email = AsyncMock()
+        mock_data = {'MessageSid': 'SM123', 'From': '+11234567890', 'Body': 'Test Body'}
+
+        await twilio_background_task_async({}, mock_data)
+
+        mock_get_async_client.assert_not_called()
+        mock_sender_instance.build_email.assert_called_once()
+        mock_sender_instance.send_email.assert_awaited_once_with(mock_sender_instance.build_email.return_value)
+
+    @patch('app.core.async_twilio_logic.logging.error')
+    async def test_background_task_async_logs_error_when_exception_is_raised(self, mock_logger):
+        with patch.dict(os.environ, {}, clear=True):
+            await twilio_background_task_async({}, {'MessageSid': 'SM123'})
+        mock_logger.assert_called_once()
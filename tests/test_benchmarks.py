@@ -0,0 +1,63 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from benchmarks.bench_pipeline import compare_results, build_stages
+from benchmarks.bench_startup import measure_cold_start
+from benchmarks.corpus import build_corpora, BENCHMARK_AUTH_TOKEN
+from benchmarks.import_report import aggregate, parse_importtime
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare_results_reports_regressions_over_threshold(self):
+        baseline = {"results": {"a/short": {"min_ns": 100.0}, "b/short": {"min_ns": 100.0}}}
+        current = {"results": {"a/short": {"min_ns": 130.0}, "b/short": {"min_ns": 120.0}}}
+
+        regressions = compare_results(current, baseline, threshold=0.25)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("a/short"))
+
+    def test_compare_results_ignores_benchmarks_missing_from_baseline(self):
+        current = {"results": {"new/short": {"min_ns": 100.0}}}
+
+        self.assertEqual(compare_results(current, {"results": {}}), [])
+
+    def test_corpora_are_deterministic_and_cover_all_shapes(self):
+        corpora = build_corpora(size=5)
+
+        self.assertEqual(set(corpora), {"short", "long", "unicode"})
+        self.assertEqual(corpora, build_corpora(size=5))
+        self.assertGreater(len(corpora["long"][0]["Body"]), 160)
+        self.assertTrue(any(ord(character) > 127 for character in corpora["unicode"][0]["Body"]))
+
+    @patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": BENCHMARK_AUTH_TOKEN, "FROM_ADDRESS": "bridge@example.com"})
+    def test_every_stage_runs_on_every_corpus(self):
+        for corpus in build_corpora(size=3).values():
+            for stage in build_stages(corpus).values():
+                stage()
+
+
+class TestStartupBenchmarks(unittest.TestCase):
+
+    def test_app_import_defers_heavy_sdk_modules(self):
+        self.assertEqual(measure_cold_start()["loaded"], [])
+
+    def test_import_report_aggregates_self_time_per_subsystem(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     json.decoder",
+            "import time:       200 |        300 |   twilio.rest",
+            "import time:        50 |         50 |     google.cloud.secretmanager",
+            "import time:        25 |         25 |     google.cloud.secretmanager_v1",
+            "import time:        10 |         10 |   app.core.main",
+        ])
+
+        report = aggregate(parse_importtime(output))
+
+        self.assertEqual(list(report)[0], "twilio")
+        self.assertEqual(report["stdlib"], {"self_us": 100, "modules": 1})
+        self.assertEqual(report["google.cloud.secretmanager"]["self_us"], 50)
+        self.assertEqual(report["google.cloud.secretmanager_v1"]["self_us"], 25)
+        self.assertEqual(report["app.core"]["self_us"], 10)
@@ -0,0 +1,228 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from app.decision_logic import ContactIndex, ContactIndexLoader, SenderRule, get_priority, get_routes, \
+    load_contact_index, normalize_number
+from app.sinks.email_sink import email_subject
+
+
+class TestNormalizeNumber(unittest.TestCase):
+
+    def test_formats_are_normalized_to_e164(self):
+        self.assertEqual(normalize_number("+1 (415) 555-0123"), "+14155550123")
+        self.assertEqual(normalize_number("(415) 555-0123"), "+14155550123")
+        self.assertEqual(normalize_number("1-415-555-0123"), "+14155550123")
+        self.assertEqual(normalize_number("0044 20 7946 0018"), "+442079460018")
+        self.assertEqual(normalize_number("020 7946 0018", default_country_code="44"), "+442079460018")
+
+    def test_short_codes_keep_their_digits(self):
+        self.assertEqual(normalize_number("87654"), "87654")
+        self.assertEqual(normalize_number("0800"), "0800")
+        self.assertEqual(normalize_number("226-787"), "226787")
+
+
+class TestContactIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ContactIndex([
+            SenderRule("+14155550123", name="Alice"),
+            SenderRule("+1415", prefix=True, name="San Francisco"),
+            SenderRule("+1415555", prefix=True, name="Exchange"),
+            SenderRule("2", prefix=True, routes=("discord",)),
+        ])
+
+    def test_exact_number_wins_over_prefixes(self):
+        self.assertEqual(self.index.lookup("(415) 555-0123").name, "Alice")
+
+    def test_longest_prefix_wins(self):
+        self.assertEqual(self.index.lookup("+14155559999").name, "Exchange")
+        self.assertEqual(self.index.lookup("+14159999999").name, "San Francisco")
+
+    def test_short_code_range(self):
+        self.assertEqual(self.index.lookup("26262").routes, ("discord",))
+        self.assertIsNone(self.index.lookup("87654"))
+
+    def test_unknown_and_missing_senders(self):
+        self.assertIsNone(self.index.lookup("+12125550123"))
+        self.assertIsNone(self.index.lookup(None))
+        self.assertEqual(len(self.index), 4)
+
+
+class TestLoadContactIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write_csv(self, rows: list[dict], name: str = "contacts.csv") -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w", encoding="UTF-8", newline="") as contacts_file:
+            writer = csv.DictWriter(contacts_file, fieldnames=["number", "name", "routes", "action", "priority"])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_loads_csv(self):
+        path = self.write_csv([
+            {"number": "(415) 555-0123", "name": "On-call", "routes": "email;text", "priority": "high"},
+            {"number": "+1900*", "action": "block"},
+            {"number": "87654", "name": "Vendor"},
+        ])
+
+        index = load_contact_index(path)
+
+        self.assertEqual(index.lookup("+14155550123"),
+                         SenderRule("+14155550123", name="On-call", routes=("email", "text"), priority="high"))
+        self.assertTrue(index.lookup("+19005550123").blocked)
+        vendor = index.lookup("87654")
+        self.assertEqual((vendor.name, vendor.routes), ("Vendor", None))
+
+    def test_loads_json(self):
+        path = os.path.join(self.temp_dir.name, "contacts.json")
+        with open(path, "w", encoding="UTF-8") as contacts_file:
+            json.dump({"contacts": [
+                {"number": "+44 20*", "name": "London", "routes": ["discord"]},
+                {"number": "+14155550123", "blocked": True},
+            ]}, contacts_file)
+
+        index = load_contact_index(path)
+
+        self.assertEqual(index.lookup("+442079460018").routes, ("discord",))
+        self.assertTrue(index.lookup("+14155550123").blocked)
+
+    def test_invalid_entry_is_reported_with_its_line(self):
+        path = self.write_csv([{"number": "+14155550123"}, {"number": "n/a"}])
+
+        with self.assertRaisesRegex(ValueError, "contact 3"):
+            load_contact_index(path)
+
+    def test_indexes_a_large_contact_list(self):
+        rows = [{"number": f"+1415{i:07d}", "name": f"Contact {i}"} for i in range(100_000)]
+        rows.append({"number": "+1212*", "name": "New York"})
+        index = load_contact_index(self.write_csv(rows))
+
+        self.assertEqual(len(index), 100_001)
+        self.assertEqual(index.lookup("+14150099999").name, "Contact 99999")
+        self.assertEqual(index.lookup("+12125550123").name, "New York")
+
+
+class TestContactIndexLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, "contacts.json")
+
+    def write_contacts(self, contacts: list[dict], mtime: int):
+        with open(self.path, "w", encoding="UTF-8") as contacts_file:
+            json.dump(contacts, contacts_file)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    @patch("app.decision_logic.contacts.logging.info")
+    def test_reload_logs_added_removed_and_changed_contacts(self, mock_logger):
+        self.write_contacts([{"number": "+14155550123", "name": "Alice"}, {"number": "+14155550124", "name": "Bob"},
+                             {"number": "+14155550126", "name": "Dan"}], 1_000_000_000)
+        loader = ContactIndexLoader(self.path, reload_interval=60)
+
+        self.write_contacts([{"number": "+14155550123", "name": "Alice"}, {"number": "+14155550125", "name": "Carol"},
+                             {"number": "+14155550126", "name": "Daniel"}], 2_000_000_000)
+
+        self.assertTrue(loader.reload_if_changed())
+        self.assertIsNone(loader.get().lookup("+14155550124"))
+        self.assertEqual(loader.get().lookup("+14155550125").name, "Carol")
+        self.assertEqual(mock_logger.call_args[0][0].context, {"added": 1, "removed": 1, "changed": 1})
+
+    @patch("app.decision_logic.contacts.logging.error")
+    def test_failed_first_load_routes_without_contacts_until_reload(self, mock_logger):
+        loader = ContactIndexLoader(self.path, reload_interval=60)
+
+        self.assertIsNone(loader.get().lookup("+14155550123"))
+        mock_logger.assert_called_once()
+
+        self.write_contacts([{"number": "+14155550123", "name": "Alice"}], 1_000_000_000)
+
+        self.assertTrue(loader.reload_if_changed())
+        self.assertEqual(loader.get().lookup("+14155550123").name, "Alice")
+
+    def test_routing_keeps_the_active_index_while_reloading(self):
+        self.write_contacts([{"number": "+14155550123", "name": "Alice"}], 1_000_000_000)
+        loader = ContactIndexLoader(self.path, reload_interval=0)
+        parsing = threading.Event()
+        release = threading.Event()
+        original_load = load_contact_index
+
+        def slow_load(path, default_country_code):
+            parsing.set()
+            release.wait(5)
+            return original_load(path, default_country_code)
+
+        self.write_contacts([{"number": "+14155550123", "name": "Alicia"}], 2_000_000_000)
+        with patch("app.decision_logic.contacts.load_contact_index", side_effect=slow_load):
+            self.assertEqual(loader.get().lookup("+14155550123").name, "Alice")
+            self.assertTrue(parsing.wait(5))
+            self.assertEqual(loader.get().lookup("+14155550123").name, "Alice")
+            release.set()
+            with loader._lock:
+                pass
+
+        self.assertEqual(loader.get().lookup("+14155550123").name, "Alicia")
+
+    @patch("app.decision_logic.contacts.logging.error")
+    def test_keeps_previous_index_when_reload_fails(self, mock_logger):
+        self.write_contacts([{"number": "+14155550123", "name": "Alice"}], 1_000_000_000)
+        loader = ContactIndexLoader(self.path, reload_interval=60)
+        with open(self.path, "w") as contacts_file:
+            contacts_file.write("[not json")
+        os.utime(self.path, ns=(2_000_000_000, 2_000_000_000))
+
+        self.assertFalse(loader.reload_if_changed())
+        self.assertEqual(loader.get().lookup("+14155550123").name, "Alice")
+        mock_logger.assert_called_once()
+
+
+class TestSenderRouting(unittest.TestCase):
+
+    def setUp(self):
+        index = ContactIndex([
+            SenderRule("+14155550123", name="On-call", routes=("email", "text"), priority="high"),
+            SenderRule("+1900", prefix=True, blocked=True),
+            SenderRule("87654", name="Vendor"),
+        ])
+        patcher = patch("app.decision_logic.decision_logic.get_contact_index", return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def message(self, sender: str, body: str = "hello") -> dict:
+        return {"date_created": datetime.now(), "from": sender, "body": body}
+
+    def test_sender_routes_replace_content_routes(self):
+        message = get_routes(self.message("+14155550123", "[WARNING] disk filling"))
+
+        self.assertEqual(message["routes"], ["email", "text"])
+        self.assertEqual(message["contact_name"], "On-call")
+
+    def test_blocked_senders_get_no_routes(self):
+        self.assertEqual(get_routes(self.message("+19005550123", "[CRITICAL] win a prize"))["routes"], [])
+
+    def test_known_contact_keeps_content_routes(self):
+        message = get_routes(self.message("87654", "[WARNING] invoice due"))
+
+        self.assertEqual(message["routes"], ["email", "discord"])
+        self.assertEqual(email_subject(message), "New Text Message from Vendor (87654)")
+
+    def test_unknown_sender_is_unchanged(self):
+        message = get_routes(self.message("+12125550123"))
+
+        self.assertNotIn("contact_name", message)
+        self.assertEqual(email_subject(message), "New Text Message from +12125550123")
+
+    def test_sender_priority_wins_over_body(self):
+        self.assertEqual(get_priority("hello", "+14155550123"), "high")
+        self.assertEqual(get_priority("[CRITICAL] disk full", "87654"), "high")
+        self.assertEqual(get_priority(None, "87654"), "normal")
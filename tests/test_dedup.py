@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.dedup import MessageDedupCache, STATUS_PENDING, STATUS_DELIVERED, STATUS_NOT_FOUND
+
+
+class TestMessageDedupCache(unittest.TestCase):
+
+    def test_claim_returns_true_only_for_first_delivery(self):
+        cache = MessageDedupCache()
+
+        self.assertTrue(cache.claim("SM1"))
+        self.assertFalse(cache.claim("SM1"))
+        self.assertEqual(cache.get_status("SM1"), STATUS_PENDING)
+
+    def test_claim_accepts_message_after_ttl_expires(self):
+        cache = MessageDedupCache(ttl=10)
+        with patch("app.dedup.dedup.time.time", return_value=1000):
+            cache.claim("SM1")
+        with patch("app.dedup.dedup.time.time", return_value=1011):
+            self.assertTrue(cache.claim("SM1"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = MessageDedupCache(max_entries=2)
+        cache.claim("SM1")
+        cache.claim("SM2")
+        cache.claim("SM1")
+        cache.claim("SM3")
+
+        self.assertIsNone(cache.get_status("SM2"))
+        self.assertFalse(cache.claim("SM1"))
+
+    def test_record_caches_negative_results_with_negative_ttl(self):
+        cache = MessageDedupCache(ttl=100, negative_ttl=10)
+        with patch("app.dedup.dedup.time.time", return_value=1000):
+            cache.claim("SM1")
+            cache.record("SM1", STATUS_NOT_FOUND)
+            self.assertFalse(cache.claim("SM1"))
+        with patch("app.dedup.dedup.time.time", return_value=1011):
+            self.assertTrue(cache.claim("SM1"))
+
+    def test_release_allows_message_to_be_claimed_again(self):
+        cache = MessageDedupCache()
+        cache.claim("SM1")
+
+        cache.release("SM1")
+
+        self.assertTrue(cache.claim("SM1"))
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "dedup.db")
+            cache = MessageDedupCache(path=path)
+            cache.claim("SM1")
+            cache.record("SM1", STATUS_DELIVERED)
+
+            restarted = MessageDedupCache(path=path)
+
+            self.assertFalse(restarted.claim("SM1"))
+            self.assertEqual(restarted.get_status("SM1"), STATUS_DELIVERED)
+            self.assertTrue(restarted.claim("SM2"))
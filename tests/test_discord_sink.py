@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import requests
+
+from app.exceptions import DiscordDeliveryError
+from app.metrics import DISCORD_RATE_LIMITED
+from app.sinks import DiscordSink, DiscordWebhookSender, RateLimitBucket, build_embed
+from benchmarks.fake_services import FakeDiscordServer
+
+
+class TestRateLimitBucket(unittest.TestCase):
+
+    def test_waits_for_reset_once_exhausted(self):
+        bucket = RateLimitBucket()
+        bucket.update({"X-RateLimit-Limit": "5", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "1.5"}, now=100)
+
+        self.assertEqual(bucket.wait_time(100), 1.5)
+        self.assertEqual(bucket.remaining_at(100), 0)
+        self.assertEqual(bucket.wait_time(102), 0)
+        self.assertEqual(bucket.remaining_at(102), 5)
+
+    def test_unknown_limit_does_not_wait(self):
+        bucket = RateLimitBucket()
+
+        self.assertEqual(bucket.wait_time(0), 0)
+        self.assertIsNone(bucket.remaining_at(0))
+
+    def test_throttle_empties_bucket(self):
+        bucket = RateLimitBucket()
+        bucket.throttle(2.0, now=10)
+
+        self.assertEqual(bucket.wait_time(10), 2.0)
+
+
+class TestDiscordWebhookSender(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeDiscordServer(limit=5, window=0.5).start()
+        self.addCleanup(self.server.stop)
+
+    def make_sender(self) -> DiscordWebhookSender:
+        sender = DiscordWebhookSender(self.server.webhook_url)
+        self.addCleanup(sender.close)
+        return sender
+
+    def test_storm_is_coalesced_without_hitting_rate_limit(self):
+        sender = self.make_sender()
+
+        futures = [sender.send({"title": f"alert {i}", "description": "[WARNING] disk"}) for i in range(30)]
+        for future in futures:
+            future.result(timeout=10)
+
+        self.assertEqual(self.server.status_counts[429], 0)
+        self.assertEqual(sorted(embed["title"] for embed in self.server.embeds),
+                         sorted(f"alert {i}" for i in range(30)))
+        self.assertLess(len(self.server.posts), 30)
+        self.assertTrue(all(len(post) <= 10 for post in self.server.posts))
+
+    def test_embeds_are_posted_one_by_one_while_bucket_has_room(self):
+        sender = self.make_sender()
+
+        for i in range(3):
+            sender.send({"title": f"alert {i}", "description": "body"}).result(timeout=5)
+
+        self.assertEqual([len(post) for post in self.server.posts], [1, 1, 1])
+
+    def test_rate_limited_post_is_retried_after_reset(self):
+        server = FakeDiscordServer(limit=1, window=0.3).start()
+        self.addCleanup(server.stop)
+        # Another client used up the bucket, so the sender's first post is answered with a 429
+        requests.post(server.webhook_url, json={"embeds": [{"title": "other client"}]})
+        sender = DiscordWebhookSender(server.webhook_url)
+        self.addCleanup(sender.close)
+        rate_limited = DISCORD_RATE_LIMITED.get()
+
+        sender.send({"title": "alert", "description": "body"}).result(timeout=5)
+
+        self.assertEqual(server.status_counts[429], 1)
+        self.assertEqual(DISCORD_RATE_LIMITED.get(), rate_limited + 1)
+        self.assertEqual(server.embeds[-1]["title"], "alert")
+
+    def test_rejected_post_fails_its_embeds(self):
+        sender = DiscordWebhookSender(self.server.base_url + "/api/unknown")
+        self.addCleanup(sender.close)
+
+        with self.assertRaises(DiscordDeliveryError):
+            sender.send({"title": "alert"}).result(timeout=5)
+
+    @patch("app.sinks.discord_sink.logging.error")
+    def test_unexpected_error_fails_its_batch_and_keeps_dispatching(self, mock_logger):
+        sender = self.make_sender()
+
+        with patch.object(sender.bucket, "update", side_effect=[ValueError("bad header"), None]):
+            with self.assertRaises(ValueError):
+                sender.send({"title": "alert 1"}).result(timeout=5)
+            sender.send({"title": "alert 2"}).result(timeout=5)
+
+        mock_logger.assert_called_once()
+        self.assertEqual(self.server.embeds[-1]["title"], "alert 2")
+
+
+class TestDiscordSink(unittest.TestCase):
+
+    def test_deliver_posts_message_embed(self):
+        with FakeDiscordServer() as server:
+            sink = DiscordSink(server.webhook_url, timeout=5)
+            self.addCleanup(sink.close)
+            sink.deliver({"from": "+11234567890", "body": "[CRITICAL] disk full", "date_created": datetime(2026, 1, 1)})
+
+            self.assertEqual(server.embeds, [{
+                "title": "New Text Message from +11234567890",
+                "description": "[CRITICAL] disk full",
+                "timestamp": "2026-01-01T00:00:00",
+            }])
+
+    def test_server_errors_and_refused_connections_are_transient(self):
+        sink = DiscordSink("http://127.0.0.1:9/webhook")
+        self.addCleanup(sink.close)
+
+        self.assertTrue(sink.is_transient(DiscordDeliveryError("Discord returned 503", status=503)))
+        self.assertTrue(sink.is_transient(DiscordDeliveryError("Rate limited", status=429)))
+        self.assertTrue(sink.is_transient(requests.ConnectionError("refused")))
+        self.assertFalse(sink.is_transient(DiscordDeliveryError("Discord returned 400", status=400)))
+        self.assertFalse(sink.is_transient(requests.ReadTimeout("timed out")))
+
+    def test_build_embed_truncates_long_bodies(self):
+        embed = build_embed({"from": "+11234567890", "body": "x" * 5000, "date_created": None})
+
+        self.assertEqual(len(embed["description"]), 4096)
+        self.assertNotIn("timestamp", embed)
@@ -1,19 +1,30 @@
 import base64
 import json
 import os
+import threading
+import time
 import unittest
+from concurrent.futures import wait
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.parser import Parser
 from unittest.mock import patch, MagicMock
 
 from google.cloud.secretmanager_v1.types import AccessSecretVersionResponse, SecretPayload
 
-from app.email_sender import EmailSender
-from app.exceptions import MissingCredentialsException, GoogleAuthError
+import httpx
+
+from app.email_sender import EmailSender, AsyncEmailSender, AuthorizedHttpPool, BatchEmailSender, \
+    refresh_cached_credentials, reset_credentials_cache, get_gmail_discovery_document, load_gmail_discovery_document
+from app.exceptions import MissingCredentialsException, GoogleAuthError, StaleDiscoveryDocumentException, \
+    SinkTimeoutError
+from app.resilience import reset_resilience
 
 
 class TestEmailSender(unittest.TestCase):
     def setUp(self):
+        reset_credentials_cache()
+        self.addCleanup(reset_credentials_cache)
 
         # Setup mock environment variables
         self.mock_env = {
@@ -28,8 +39,11 @@ class TestEmailSender(unittest.TestCase):
 
         # Setup mock objects needed for EmailSender class initialization
         patcher_credentials = patch("app.email_sender.email_sender.service_account.Credentials")
-        patcher_build = patch("app.email_sender.email_sender.build")
+        patcher_build = patch("app.email_sender.email_sender.build_from_document")
         patcher_secret_manager = patch("app.email_sender.email_sender.secretmanager.SecretManagerServiceClient")
+        patcher_token_refresher = patch("app.email_sender.email_sender._start_token_refresher")
+        patcher_token_refresher.start()
+        self.addCleanup(patcher_token_refresher.stop)
 
         self.mock_credentials = patcher_credentials.start()
         self.mock_build = patcher_build.start()
@@ -76,7 +90,7 @@ class TestEmailSender(unittest.TestCase):
         self.mock_credentials.from_service_account_info.assert_not_called()
 
     @patch("app.email_sender.email_sender.service_account.Credentials")
-    @patch("app.email_sender.email_sender.build")
+    @patch("app.email_sender.email_sender.build_from_document")
     def test_init_raises_exception_on_auth_error(self, mock_build, mock_credentials):
         mock_credentials.from_service_account_info.side_effect = ValueError
         with self.assertRaises(GoogleAuthError):
@@ -92,9 +106,54 @@ class TestEmailSender(unittest.TestCase):
             scopes=["https://www.googleapis.com/auth/gmail.send"]
         )
         self.mock_credentials_instance.with_subject.assert_called_once_with("test@test.com")
-        self.mock_build.assert_called_once_with("gmail", "v1", credentials=self.mock_delegated_credentials_instance)
+        self.mock_build.assert_called_once_with(
+            get_gmail_discovery_document(),
+            credentials=self.mock_delegated_credentials_instance
+        )
         self.assertIs(sender.service, self.mock_service_account)
 
+    def test_init_reuses_cached_credentials_and_service(self):
+        first = EmailSender()
+        second = EmailSender()
+
+        self.assertIs(first.service, second.service)
+        self.mock_secret_manager.return_value.access_secret_version.assert_called_once()
+        self.mock_credentials.from_service_account_info.assert_called_once()
+        self.mock_build.assert_called_once()
+
+    def test_init_reloads_credentials_after_ttl_expires(self):
+        with patch.dict(os.environ, {"GMAIL_CREDENTIALS_TTL": "0"}):
+            EmailSender()
+            EmailSender()
+
+        self.assertEqual(self.mock_secret_manager.return_value.access_secret_version.call_count, 2)
+
+    def test_init_uses_pinned_secret_version(self):
+        with patch.dict(os.environ, {"SECRET_VERSION": "7"}):
+            EmailSender()
+
+        self.mock_secret_manager.return_value.access_secret_version.assert_called_once_with(
+            request={"name": "projects/id-1234/secrets/test_secret_name/versions/7"}
+        )
+
+    def test_refresh_cached_credentials_refreshes_expiring_tokens(self):
+        self.mock_delegated_credentials_instance.token = "token"
+        self.mock_delegated_credentials_instance.expiry = datetime.utcnow() + timedelta(minutes=1)
+        EmailSender()
+
+        refresh_cached_credentials()
+
+        self.mock_delegated_credentials_instance.refresh.assert_called_once()
+
+    def test_refresh_cached_credentials_skips_valid_tokens(self):
+        self.mock_delegated_credentials_instance.token = "token"
+        self.mock_delegated_credentials_instance.expiry = datetime.utcnow() + timedelta(hours=1)
+        EmailSender()
+
+        refresh_cached_credentials()
+
+        self.mock_delegated_credentials_instance.refresh.assert_not_called()
+
     def test_build_email_requires_destination(self):
         with self.assertRaises(ValueError) as e:
             email = EmailSender.build_email("", "Body", "Subject")
@@ -148,3 +207,311 @@ class TestEmailSender(unittest.TestCase):
         sender.send_email(encoded_msg)
         self.mock_service_account.users().messages().send.assert_called_once()
         self.mock_service_account.users().messages().send.return_value.execute.assert_called_once()
+
+    @patch.dict(os.environ, {"GMAIL_RETRY_BASE_DELAY": "0", "GMAIL_BREAKER_MIN_CALLS": "100"})
+    def test_send_email_is_not_retried_once_the_request_may_have_been_sent(self):
+        reset_resilience()
+        self.addCleanup(reset_resilience)
+        execute = self.mock_service_account.users().messages().send.return_value.execute
+        execute.side_effect = [ConnectionRefusedError(), TimeoutError("read timed out"), {"id": "sent"}]
+        sender = EmailSender()
+
+        with self.assertRaises(TimeoutError):
+            sender.send_email("encoded-message")
+        self.assertEqual(execute.call_count, 2)
+
+    @patch.dict(os.environ, {"GMAIL_RETRY_BASE_DELAY": "0", "GMAIL_BREAKER_MIN_CALLS": "100"})
+    @patch("app.email_sender.email_sender.BatchHttpRequest")
+    def test_send_batch_resends_only_transient_failures(self, mock_batch_class):
+        reset_resilience()
+        self.addCleanup(reset_resilience)
+        batches = []
+
+        def new_batch(callback, batch_uri):
+            requests = []
+            batch = MagicMock()
+            batch.add.side_effect = lambda request, request_id: requests.append(request_id)
+
+            def execute(http):
+                batches.append(list(requests))
+                for request_id in requests:
+                    if request_id == "1" and len(batches) == 1:
+                        callback(request_id, None, ValueError("throttled"))
+                    elif request_id == "2":
+                        callback(request_id, None, ValueError("rejected"))
+                    else:
+                        callback(request_id, {"id": request_id}, None)
+            batch.execute.side_effect = execute
+            return batch
+
+        mock_batch_class.side_effect = new_batch
+        throttled = lambda error: str(error) == "throttled"
+        with patch("app.email_sender.email_sender.is_transient_gmail_error", side_effect=throttled), \
+                patch("app.email_sender.email_sender.is_unsent_gmail_error", side_effect=throttled):
+            results = EmailSender().send_batch(["a", "b", "c"])
+
+        self.assertEqual(batches, [["0", "1", "2"], ["1"]])
+        self.assertEqual(results[:2], [{"id": "0"}, {"id": "1"}])
+        self.assertEqual(str(results[2]), "rejected")
+
+    def test_send_batch_throw_exception_on_invalid_data_type(self):
+        with self.assertRaises(TypeError):
+            EmailSender().send_batch(["message", b"Test Email String"])
+
+    def test_shared_sender_executes_requests_on_pooled_connections(self):
+        sender = EmailSender()
+        with patch.object(sender.http_pool, "connection") as mock_connection:
+            sender.send_email("encoded-message")
+
+        execute = self.mock_service_account.users().messages().send.return_value.execute
+        execute.assert_called_once_with(http=mock_connection.return_value.__enter__.return_value)
+
+    def test_reset_credentials_cache_closes_pooled_connections(self):
+        sender = EmailSender()
+        with patch.object(sender.http_pool, "close") as mock_close:
+            reset_credentials_cache()
+
+        mock_close.assert_called_once()
+        self.assertIsNot(EmailSender().http_pool, sender.http_pool)
+
+    def test_get_gmail_discovery_document_is_parsed_once(self):
+        first = get_gmail_discovery_document()
+        second = get_gmail_discovery_document()
+
+        self.assertIs(first, second)
+        self.assertEqual(first["name"], "gmail")
+        self.assertEqual(first["version"], "v1")
+
+    def test_load_gmail_discovery_document_raises_on_stale_document(self):
+        with patch.dict(os.environ, {"GMAIL_DISCOVERY_FAIL_ON_STALE": "true", "GMAIL_DISCOVERY_MAX_AGE_DAYS": "0"}):
+            with self.assertRaises(StaleDiscoveryDocumentException):
+                load_gmail_discovery_document()
+
+    def test_load_gmail_discovery_document_ignores_stale_document_by_default(self):
+        with patch.dict(os.environ, {"GMAIL_DISCOVERY_MAX_AGE_DAYS": "0"}):
+            document = load_gmail_discovery_document()
+        self.assertIs(document, get_gmail_discovery_document())
+
+
+class TestAsyncEmailSender(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher_credentials = patch("app.email_sender.async_email_sender.get_configured_credentials")
+        self.mock_credentials = patcher_credentials.start().return_value
+        self.mock_credentials.valid = True
+        self.mock_credentials.token = "access-token"
+        self.addCleanup(patcher_credentials.stop)
+        self.requests = []
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(200, json={"id": "message-id"})
+
+    async def test_send_email_posts_raw_message_with_bearer_token(self):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(self.handle_request)) as client:
+            sender = AsyncEmailSender(http_client=client)
+            result = await sender.send_email("encoded-message")
+
+        self.assertEqual(result, {"id": "message-id"})
+        request = self.requests[0]
+        self.assertEqual(str(request.url), "https://gmail.googleapis.com/gmail/v1/users/me/messages/send")
+        self.assertEqual(request.headers["Authorization"], "Bearer access-token")
+        self.assertEqual(json.loads(request.content), {"raw": "encoded-message"})
+
+    async def test_send_email_refreshes_invalid_token(self):
+        self.mock_credentials.valid = False
+        async with httpx.AsyncClient(transport=httpx.MockTransport(self.handle_request)) as client:
+            sender = AsyncEmailSender(http_client=client)
+            await sender.send_email("encoded-message")
+
+        self.mock_credentials.refresh.assert_called_once()
+
+    async def test_send_email_throw_exception_on_invalid_data_type(self):
+        sender = AsyncEmailSender(http_client=MagicMock())
+        with self.assertRaises(TypeError):
+            await sender.send_email(b"Test Email String")
+
+
+class TestBatchEmailSender(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def send_batch(self, encoded_msgs):
+        self.batches.append(list(encoded_msgs))
+        self.release.wait(5)
+        return [{"id": encoded_msg} for encoded_msg in encoded_msgs]
+
+    def test_message_is_sent_at_once_when_idle(self):
+        sender = BatchEmailSender(self.send_batch, window=5)
+        self.addCleanup(sender.close)
+
+        started = time.monotonic()
+        self.assertEqual(sender.send_email("first"), {"id": "first"})
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.batches, [["first"]])
+
+    def test_burst_is_sent_in_batches(self):
+        self.release.clear()
+        sender = BatchEmailSender(self.send_batch, max_batch_size=3, window=5, concurrency=1)
+        self.addCleanup(sender.close)
+
+        first = sender.submit("m0")
+        deadline = time.monotonic() + 5
+        while not self.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        futures = [sender.submit(f"m{i}") for i in range(1, 8)]
+        self.release.set()
+        wait([first] + futures, timeout=5)
+
+        self.assertEqual(self.batches, [["m0"], ["m1", "m2", "m3"], ["m4", "m5", "m6"], ["m7"]])
+        self.assertEqual([future.result() for future in futures], [{"id": f"m{i}"} for i in range(1, 8)])
+
+    def test_burst_waits_for_window_to_fill_batch(self):
+        sender = BatchEmailSender(self.send_batch, window=0.2, concurrency=1)
+        self.addCleanup(sender.close)
+
+        sender.send_email("first")
+        futures = [sender.submit(f"m{i}") for i in range(3)]
+        wait(futures, timeout=5)
+
+        self.assertEqual(self.batches, [["first"], ["m0", "m1", "m2"]])
+
+    def test_results_are_fanned_back_to_each_message(self):
+        error = ValueError("Invalid to header")
+        sender = BatchEmailSender(
+            lambda encoded_msgs: [error if encoded_msg == "bad" else {"id": encoded_msg} for encoded_msg in encoded_msgs],
+            window=1,
+        )
+        self.addCleanup(sender.close)
+
+        futures = [sender.submit("first"), sender.submit("bad"), sender.submit("last")]
+        wait(futures, timeout=5)
+
+        self.assertEqual(futures[0].result(), {"id": "first"})
+        self.assertIs(futures[1].exception(), error)
+        self.assertEqual(futures[2].result(), {"id": "last"})
+
+    def test_batch_request_failure_fails_every_message(self):
+        sender = BatchEmailSender(MagicMock(side_effect=ConnectionError("reset")), window=0)
+        self.addCleanup(sender.close)
+
+        with self.assertRaises(ConnectionError):
+            sender.send_email("message")
+
+    def test_send_email_times_out_and_drops_unsent_message(self):
+        self.release.clear()
+        self.addCleanup(self.release.set)
+        sender = BatchEmailSender(self.send_batch, window=5, concurrency=1)
+        self.addCleanup(sender.close)
+        sender.submit("first")
+        deadline = time.monotonic() + 5
+        while not self.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with self.assertRaises(SinkTimeoutError):
+            sender.send_email("second", timeout=0.05)
+        self.release.set()
+        sender.close()
+
+        self.assertEqual(self.batches, [["first"]])
+
+    def test_close_sends_pending_messages(self):
+        sender = BatchEmailSender(self.send_batch, window=60)
+        sender.send_email("first")
+        future = sender.submit("second")
+
+        sender.close()
+
+        self.assertEqual(future.result(timeout=0), {"id": "second"})
+        with self.assertRaises(RuntimeError):
+            sender.submit("third")
+
+    def test_batches_are_sent_concurrently(self):
+        self.release.clear()
+        sender = BatchEmailSender(self.send_batch, max_batch_size=1, window=5, concurrency=3)
+        self.addCleanup(sender.close)
+
+        futures = [sender.submit(f"m{i}") for i in range(3)]
+        deadline = time.monotonic() + 5
+        while len(self.batches) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.release.set()
+        wait(futures, timeout=5)
+
+        self.assertEqual(sorted(self.batches), [["m0"], ["m1"], ["m2"]])
+
+
+@patch("app.email_sender.transport.httplib2")
+@patch("app.email_sender.transport.AuthorizedHttp", side_effect=lambda credentials, http: MagicMock())
+class TestAuthorizedHttpPool(unittest.TestCase):
+
+    def test_connections_are_reused(self, mock_authorized_http, mock_httplib2):
+        pool = AuthorizedHttpPool(MagicMock(), size=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_authorized_http.call_count, 1)
+
+    def test_each_thread_gets_its_own_connection(self, mock_authorized_http, mock_httplib2):
+        pool = AuthorizedHttpPool(MagicMock(), size=4)
+        barrier = threading.Barrier(3)
+        used = []
+
+        def use():
+            with pool.connection() as http:
+                used.append(http)
+                barrier.wait(5)
+
+        threads = [threading.Thread(target=use) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len({id(http) for http in used}), 3)
+        self.assertEqual(pool.idle(), 3)
+
+    def test_callers_wait_once_pool_is_exhausted(self, mock_authorized_http, mock_httplib2):
+        pool = AuthorizedHttpPool(MagicMock(), size=1)
+        acquired = threading.Event()
+
+        def use():
+            with pool.connection():
+                acquired.set()
+
+        with pool.connection():
+            thread = threading.Thread(target=use)
+            thread.start()
+            self.assertFalse(acquired.wait(0.1))
+        thread.join(5)
+
+        self.assertTrue(acquired.is_set())
+
+    def test_failed_connections_are_closed_not_reused(self, mock_authorized_http, mock_httplib2):
+        pool = AuthorizedHttpPool(MagicMock(), size=1)
+
+        with self.assertRaises(ConnectionError):
+            with pool.connection() as http:
+                raise ConnectionError("reset")
+
+        http.close.assert_called_once()
+        self.assertEqual(pool.idle(), 0)
+
+    def test_close_closes_idle_and_returned_connections(self, mock_authorized_http, mock_httplib2):
+        pool = AuthorizedHttpPool(MagicMock(), size=2)
+
+        with pool.connection() as in_use:
+            with pool.connection() as idle:
+                pass
+            pool.close()
+            idle.close.assert_called_once()
+            in_use.close.assert_not_called()
+
+        in_use.close.assert_called_once()
+        self.assertEqual(pool.idle(), 0)
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from app.core.twilio_logic import twilio_background_task
+from app.flood_control import Digest, SenderFloodControl, is_digest_job, send_digest
+from app.metrics import FLOOD_DIGESTS_SENT, FLOOD_MESSAGES_COALESCED
+from app.sinks import SinkResult
+from app.work_queue import WorkQueue, WorkerPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_message(body: str, sender: str = "+15550001111", routes: list[str] | None = None) -> dict:
+    return {
+        "date_created": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "from": sender,
+        "body": body,
+        "routes": routes or ["email", "discord"],
+    }
+
+
+class FloodControlTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.queue = WorkQueue(os.path.join(self.temp_dir.name, "queue.db"))
+        self.clock = FakeClock()
+        self.flood_control = SenderFloodControl(
+            self.queue, rate=1 / 60, burst=2, window=10, max_senders=3, sender_ttl=100, clock=self.clock,
+        )
+
+    def digest_jobs(self) -> list[dict]:
+        # Ends every digest window
+        self.queue._connection().execute("UPDATE jobs SET visible_at = 0")
+        return [job.data for job in self.queue.dequeue_batch(10, 60)]
+
+
+class TestSenderFloodControl(FloodControlTestCase):
+
+    def test_sender_over_limit_is_coalesced_into_one_digest(self):
+        coalesced = FLOOD_MESSAGES_COALESCED.get()
+        results = [self.flood_control.apply(make_message(f"[WARNING] disk {i}")) for i in range(5)]
+
+        self.assertEqual([result["routes"] for result in results[:2]], [["email", "discord"]] * 2)
+        self.assertEqual([result["routes"] for result in results[2:]], [["discord"]] * 3)
+        self.assertEqual(FLOOD_MESSAGES_COALESCED.get(), coalesced + 3)
+
+        jobs = self.digest_jobs()
+
+        self.assertEqual(len(jobs), 1)
+        self.assertTrue(is_digest_job(jobs[0]))
+        digest = Digest.from_job(jobs[0]).to_message()
+        self.assertEqual(digest["subject"], "3 Text Messages from +15550001111")
+        self.assertEqual(digest["routes"], ["email"])
+        self.assertEqual(digest["body"].count("[WARNING] disk"), 3)
+        self.assertLess(digest["body"].index("disk 2"), digest["body"].index("disk 4"))
+
+    def test_digest_is_queued_until_its_window_elapses(self):
+        for i in range(3):
+            self.flood_control.apply(make_message(f"[WARNING] disk {i}"))
+
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertEqual(self.queue.dequeue_batch(10, 60), [])
+
+    def test_digest_survives_a_restart(self):
+        for i in range(3):
+            self.flood_control.apply(make_message(f"[WARNING] disk {i}"))
+
+        restarted = WorkQueue(self.queue.path)
+        restarted.recover()
+
+        jobs = restarted.dequeue_batch(10, 60)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(len(Digest.from_job(jobs[0].data).messages), 1)
+
+    def test_redelivered_message_is_not_added_twice(self):
+        for i in range(3):
+            self.flood_control.apply(make_message(f"[WARNING] disk {i}"), message_sid=f"SM{i}")
+
+        self.flood_control.apply(make_message("[WARNING] disk 2"), message_sid="SM2")
+
+        self.assertEqual(len(Digest.from_job(self.digest_jobs()[0]).messages), 1)
+
+    def test_digest_subject_names_known_contact(self):
+        for i in range(3):
+            self.flood_control.apply({**make_message(f"[WARNING] disk {i}"), "contact_name": "Storage vendor"})
+
+        digest = Digest.from_job(self.digest_jobs()[0]).to_message()
+
+        self.assertEqual(digest["subject"], "1 Text Messages from Storage vendor (+15550001111)")
+
+    def test_senders_are_limited_independently(self):
+        for _ in range(2):
+            self.flood_control.apply(make_message("[WARNING] disk"))
+
+        result = self.flood_control.apply(make_message("[WARNING] disk", sender="+15550002222"))
+
+        self.assertIn("email", result["routes"])
+
+    def test_mfa_codes_are_never_coalesced(self):
+        for _ in range(2):
+            self.flood_control.apply(make_message("[WARNING] disk"))
+
+        result = self.flood_control.apply(make_message("Your login code is 123456", routes=["email", "text"]))
+
+        self.assertEqual(result["routes"], ["email", "text"])
+
+    def test_messages_join_pending_digest_even_after_refill(self):
+        flood_control = SenderFloodControl(self.queue, rate=1, burst=1, window=10, clock=self.clock)
+        for i in range(2):
+            flood_control.apply(make_message(f"[WARNING] disk {i}"))
+        self.clock.now = 5
+
+        result = flood_control.apply(make_message("[WARNING] disk 2"))
+
+        self.assertEqual(result["routes"], ["discord"])
+        self.assertEqual(len(Digest.from_job(self.digest_jobs()[0]).messages), 2)
+
+    def test_async_apply_coalesces_like_apply(self):
+        async def apply_all():
+            return [await self.flood_control.apply_async(make_message(f"[WARNING] disk {i}")) for i in range(3)]
+
+        results = asyncio.run(apply_all())
+
+        self.assertEqual(results[2]["routes"], ["discord"])
+        self.assertEqual(self.queue.depth(), 1)
+
+    def test_idle_and_least_recently_seen_senders_are_evicted(self):
+        for i in range(4):
+            self.flood_control.apply(make_message("hello", sender=f"+1555000000{i}"))
+        self.assertEqual(len(self.flood_control._senders), 3)
+        self.assertNotIn("+15550000000", self.flood_control._senders)
+
+        self.clock.now = 200
+        self.flood_control.apply(make_message("hello", sender="+15559999999"))
+
+        self.assertEqual(list(self.flood_control._senders), ["+15559999999"])
+
+
+class TestDigestDelivery(FloodControlTestCase):
+
+    def test_digest_is_emailed_through_the_registry(self):
+        registry = MagicMock()
+        registry.deliver.return_value = {"email": SinkResult(route="email", delivered=True)}
+        sent = FLOOD_DIGESTS_SENT.get()
+
+        with patch("app.flood_control.flood_control.get_sink_registry", return_value=registry):
+            send_digest({"DigestFrom": "+15550001111", "DigestMessages": [{"date_created": None, "body": "disk"}]})
+
+        message, routes = registry.deliver.call_args[0]
+        self.assertEqual(routes, ["email"])
+        self.assertEqual(message["body"], "[unknown time] disk")
+        self.assertEqual(FLOOD_DIGESTS_SENT.get(), sent + 1)
+
+    def test_failed_digest_is_redelivered_by_the_work_queue(self):
+        for i in range(3):
+            self.flood_control.apply(make_message(f"[WARNING] disk {i}"))
+        self.queue._connection().execute("UPDATE jobs SET visible_at = 0")
+        registry = MagicMock()
+        registry.deliver.side_effect = [
+            {"email": SinkResult(route="email", delivered=False, error=ConnectionError("refused"))},
+            {"email": SinkResult(route="email", delivered=True)},
+        ]
+        pool = WorkerPool(self.queue, twilio_background_task, worker_count=1, visibility_timeout=0,
+                          poll_interval=0.01)
+
+        with patch("app.flood_control.flood_control.get_sink_registry", return_value=registry):
+            pool.start()
+            deadline = time.time() + 5
+            while self.queue.depth() and time.time() < deadline:
+                time.sleep(0.01)
+            pool.stop()
+
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(registry.deliver.call_count, 2)
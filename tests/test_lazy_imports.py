@@ -0,0 +1,37 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+from app.lazy_imports import lazy_import, LazyModule, LazyAttribute
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_module_is_imported_on_first_attribute_access(self):
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy_import("colorsys")
+
+        self.assertIsInstance(colorsys, LazyModule)
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertIn("colorsys", sys.modules)
+
+    def test_attribute_forwards_calls_and_attributes(self):
+        ordered_dict = lazy_import("collections", "OrderedDict")
+
+        self.assertIsInstance(ordered_dict, LazyAttribute)
+        self.assertEqual(ordered_dict(a=1), {"a": 1})
+        self.assertEqual(ordered_dict.__name__, "OrderedDict")
+
+    def test_module_attributes_can_be_patched(self):
+        json = lazy_import("json")
+
+        with patch.object(json, "dumps", return_value="patched"):
+            self.assertEqual(json.dumps({}), "patched")
+        self.assertEqual(json.dumps({}), "{}")
+
+    def test_missing_module_fails_on_first_use(self):
+        missing = lazy_import("app.does_not_exist")
+
+        with self.assertRaises(ModuleNotFoundError):
+            missing.anything
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import httpx
+from google.oauth2.credentials import Credentials
+
+from app.core.twilio_logic import get_client, get_full_twilio_data, reset_client_pool
+from app.email_sender import EmailSender, reset_credentials_cache
+from benchmarks.corpus import build_webhook_payload
+from benchmarks.fake_services import FakeGmailServer, FakeServiceConfig, FakeTwilioServer
+from benchmarks.load_replay import percentile
+
+
+class TestFakeServices(unittest.TestCase):
+
+    def test_fake_twilio_serves_registered_messages_to_pooled_client(self):
+        payload = build_webhook_payload("Hello World", 1)
+        with FakeTwilioServer() as twilio:
+            twilio.add_message(payload)
+            env = {
+                "TWILIO_ACCOUNT_SID": payload["AccountSid"],
+                "TWILIO_AUTH_TOKEN": "token",
+                "TWILIO_API_BASE_URL": twilio.base_url,
+            }
+            with patch.dict(os.environ, env):
+                reset_client_pool()
+                self.addCleanup(reset_client_pool)
+                message = get_full_twilio_data(get_client(), payload["MessageSid"])
+
+        self.assertEqual(message.body, "Hello World")
+        self.assertEqual(message.from_, payload["From"])
+        self.assertIsNotNone(message.date_created)
+
+    def test_fake_gmail_records_deliveries(self):
+        with FakeGmailServer() as gmail:
+            encoded = EmailSender.build_email("inbox@example.com", "Hello World", "Subject")
+            response = httpx.post(f"{gmail.base_url}/gmail/v1/users/me/messages/send", json={"raw": encoded})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(gmail.wait_for_deliveries(1, timeout=1))
+            self.assertEqual(gmail.deliveries[0].body, "Hello World")
+            self.assertEqual(gmail.deliveries[0].to, "inbox@example.com")
+
+    def test_fake_gmail_answers_batch_requests(self):
+        with FakeGmailServer() as gmail:
+            env = {
+                "GMAIL_API_ENDPOINT": gmail.base_url + "/",
+                "DELEGATED_USER_EMAIL": "relay@example.com",
+                "PROJECT_ID": "project",
+                "SECRET_NAME": "secret",
+            }
+            with patch.dict(os.environ, env), \
+                    patch("app.email_sender.email_sender.get_delegated_credentials",
+                          return_value=Credentials(token="token")):
+                reset_credentials_cache()
+                self.addCleanup(reset_credentials_cache)
+                encoded_msgs = [EmailSender.build_email("inbox@example.com", f"Hello {i}", "Subject") for i in range(3)]
+                results = EmailSender().send_batch(encoded_msgs)
+
+        self.assertEqual(len({result["id"] for result in results}), 3)
+        self.assertEqual(gmail.batch_sizes, [3])
+        self.assertEqual(sorted(delivery.body for delivery in gmail.deliveries), ["Hello 0", "Hello 1", "Hello 2"])
+
+    def test_shared_email_sender_survives_concurrent_sends(self):
+        with FakeGmailServer(FakeServiceConfig(latency=0.002, jitter=0.003, seed=7)) as gmail:
+            env = {
+                "GMAIL_API_ENDPOINT": gmail.base_url + "/",
+                "GMAIL_HTTP_POOL_SIZE": "8",
+                "DELEGATED_USER_EMAIL": "relay@example.com",
+                "PROJECT_ID": "project",
+                "SECRET_NAME": "secret",
+            }
+            with patch.dict(os.environ, env), \
+                    patch("app.email_sender.email_sender.get_delegated_credentials",
+                          return_value=Credentials(token="token")):
+                reset_credentials_cache()
+                self.addCleanup(reset_credentials_cache)
+                sender = EmailSender()
+                errors = []
+
+                def send(thread_index):
+                    for i in range(25):
+                        try:
+                            encoded = EmailSender.build_email("inbox@example.com", f"{thread_index}-{i}", "Subject")
+                            sender.send_email(encoded)
+                        except Exception as e:
+                            errors.append(e)
+
+                with ThreadPoolExecutor(max_workers=32) as executor:
+                    list(executor.map(send, range(32)))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(gmail.deliveries), 800)
+        self.assertEqual(len({delivery.body for delivery in gmail.deliveries}), 800)
+        self.assertEqual(dict(gmail.status_counts), {200: 800})
+        self.assertLessEqual(sender.http_pool.idle(), 8)
+
+    def test_fake_services_inject_throttling_and_errors(self):
+        with FakeGmailServer(FakeServiceConfig(throttle_rate=1.0)) as gmail:
+            response = httpx.post(f"{gmail.base_url}/gmail/v1/users/me/messages/send", json={"raw": ""})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+        with FakeTwilioServer(FakeServiceConfig(error_rate=1.0)) as twilio:
+            response = httpx.get(f"{twilio.base_url}/2010-04-01/Accounts/AC1/Messages/SM1.json")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(twilio.status_counts[500], 1)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.5), 3)
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.99), 5)
+        self.assertIsNone(percentile([], 0.5))
+
+
+class TestLoadReplay(unittest.TestCase):
+
+    def test_replay_delivers_every_message_offline(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, "report.json")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.load_replay", "--generate", "12", "--concurrency", "4",
+                 "--timeout", "20", "--output", output],
+                check=True,
+                capture_output=True,
+                timeout=120,
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(report["requests"], 12)
+        self.assertEqual(report["ack_statuses"], {"200": 12})
+        self.assertEqual(report["delivered"], 12)
+        self.assertEqual(report["undelivered"], 0)
+        self.assertIsNotNone(report["delivery_latency_ms"]["p99"])
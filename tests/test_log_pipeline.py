@@ -0,0 +1,91 @@
+import io
+import logging
+import queue
+import unittest
+
+from app.log_pipeline import NonBlockingQueueHandler, BatchingLogWriter
+from app.metrics import LOG_RECORDS_DROPPED
+from app.models import LogEntry
+
+
+def make_record(level: int, msg) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, msg, None, None)
+
+
+class TestNonBlockingQueueHandler(unittest.TestCase):
+
+    def test_debug_records_are_dropped_when_queue_is_full(self):
+        log_queue = queue.Queue(maxsize=1)
+        handler = NonBlockingQueueHandler(log_queue, put_timeout=1)
+        dropped = LOG_RECORDS_DROPPED.labels(level="DEBUG").get()
+
+        handler.handle(make_record(logging.INFO, "first"))
+        handler.handle(make_record(logging.DEBUG, "second"))
+
+        self.assertEqual(log_queue.qsize(), 1)
+        self.assertEqual(LOG_RECORDS_DROPPED.labels(level="DEBUG").get(), dropped + 1)
+
+    def test_higher_levels_are_dropped_after_put_timeout(self):
+        log_queue = queue.Queue(maxsize=1)
+        handler = NonBlockingQueueHandler(log_queue, put_timeout=0.01)
+        dropped = LOG_RECORDS_DROPPED.labels(level="ERROR").get()
+
+        handler.handle(make_record(logging.INFO, "first"))
+        handler.handle(make_record(logging.ERROR, "second"))
+
+        self.assertEqual(log_queue.get_nowait().msg, "first")
+        self.assertEqual(LOG_RECORDS_DROPPED.labels(level="ERROR").get(), dropped + 1)
+
+    def test_records_are_queued_without_formatting(self):
+        log_queue = queue.Queue()
+        handler = NonBlockingQueueHandler(log_queue)
+        entry = LogEntry(level="INFO", message="Queued")
+
+        handler.handle(make_record(logging.INFO, entry))
+
+        self.assertIs(log_queue.get_nowait().msg, entry)
+
+
+class TestBatchingLogWriter(unittest.TestCase):
+
+    def test_stop_writes_every_queued_record_in_order(self):
+        log_queue = queue.Queue()
+        stream = io.StringIO()
+        writer = BatchingLogWriter(log_queue, stream=stream, batch_size=2, flush_interval=0.01)
+        for i in range(5):
+            log_queue.put(make_record(logging.INFO, f"message {i}"))
+
+        writer.start()
+        writer.stop(timeout=5)
+
+        self.assertEqual(
+            stream.getvalue().splitlines(),
+            [f"INFO:test:message {i}" for i in range(5)],
+        )
+
+    def test_log_entries_are_serialized_by_the_writer(self):
+        log_queue = queue.Queue()
+        stream = io.StringIO()
+        writer = BatchingLogWriter(log_queue, formatter=logging.Formatter("%(message)s"), stream=stream)
+        entry = LogEntry(level="ERROR", message="Invalid twilio request", trace_id="abc")
+        log_queue.put(make_record(logging.ERROR, entry))
+
+        writer.start()
+        writer.stop(timeout=5)
+
+        self.assertEqual(stream.getvalue(), entry.to_json() + "\n")
+
+    def test_unformattable_record_does_not_drop_the_batch(self):
+        log_queue = queue.Queue()
+        stream = io.StringIO()
+        writer = BatchingLogWriter(log_queue, stream=stream)
+        bad_record = logging.LogRecord("test", logging.INFO, __file__, 1, "%d", ("not a number",), None)
+        log_queue.put(bad_record)
+        log_queue.put(make_record(logging.INFO, "after"))
+
+        writer.start()
+        writer.stop(timeout=5)
+
+        lines = stream.getvalue().splitlines()
+        self.assertIn("Unformattable log record", lines[0])
+        self.assertEqual(lines[1], "INFO:test:after")
@@ -1,11 +1,21 @@
+import asyncio
+import os
 import unittest
 from unittest.mock import patch, ANY
 from fastapi.testclient import TestClient
+from twilio.request_validator import RequestValidator
 from app.core.main import app
-from app.core.twilio_logic import twilio_background_task
+from app.dedup import MessageDedupCache
+from app.work_queue import AdmissionController
 import json
 
 test_client = TestClient(app)
+test_auth_token = "test_auth_token"
+
+
+def post_signed_webhook(data: dict, auth_token: str = test_auth_token):
+    signature = RequestValidator(auth_token).compute_signature("http://testserver/webhooks/twilio", data)
+    return test_client.post("/webhooks/twilio", data=data, headers={"X-Twilio-Signature": signature})
 
 dummy_message = {
     "SmsSid": "SMxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",
@@ -31,14 +41,70 @@ dummy_message = {
     "NumMedia": "0"
 }
 
-@patch('fastapi.BackgroundTasks.add_task')
-def test_twilio_webhook_handles_valid_request(mock_add_task):
-    response = test_client.post("/webhooks/twilio", data=dummy_message)
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
+@patch('app.endpoints.twilio_webhooks.get_dedup_cache', MessageDedupCache)
+@patch('app.endpoints.twilio_webhooks.get_work_queue')
+def test_twilio_webhook_handles_valid_request(mock_get_work_queue):
+    response = post_signed_webhook(dummy_message)
     print(response.request.content)
     assert response.status_code == 200
     assert response.json() == {}
-    mock_add_task.assert_called_once()
-    mock_add_task.assert_called_once_with(twilio_background_task, ANY, dummy_message)
+    mock_enqueue = mock_get_work_queue.return_value.enqueue
+    mock_enqueue.assert_called_once()
+    mock_enqueue.assert_called_once_with(ANY, dummy_message, priority="normal")
+
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
+@patch('app.endpoints.twilio_webhooks.get_dedup_cache', MessageDedupCache)
+@patch('app.endpoints.twilio_webhooks.get_work_queue')
+def test_twilio_webhook_queues_message_off_the_event_loop(mock_get_work_queue):
+    def enqueue(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return 1
+        raise AssertionError("enqueue ran on the event loop")
+
+    mock_get_work_queue.return_value.enqueue.side_effect = enqueue
+    response = post_signed_webhook(dummy_message)
+
+    assert response.status_code == 200
+    mock_get_work_queue.return_value.enqueue.assert_called_once()
+
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
+@patch('app.endpoints.twilio_webhooks.TwilioRequest')
+@patch('app.endpoints.twilio_webhooks.get_work_queue')
+def test_twilio_webhook_rejects_invalid_signature_before_parsing(mock_get_work_queue, mock_twilio_request):
+    response = post_signed_webhook(dummy_message, auth_token="wrong_token")
+
+    assert response.status_code == 403
+    mock_twilio_request.assert_not_called()
+    mock_get_work_queue.return_value.enqueue.assert_not_called()
+
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
+@patch('app.endpoints.twilio_webhooks.get_work_queue')
+def test_twilio_webhook_acknowledges_retried_message_without_queueing(mock_get_work_queue):
+    dedup_cache = MessageDedupCache()
+    with patch('app.endpoints.twilio_webhooks.get_dedup_cache', return_value=dedup_cache):
+        first_response = post_signed_webhook(dummy_message)
+        retry_response = post_signed_webhook(dummy_message)
+
+    assert first_response.status_code == 200
+    assert retry_response.status_code == 200
+    mock_get_work_queue.return_value.enqueue.assert_called_once()
+
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
+@patch('app.endpoints.twilio_webhooks.get_dedup_cache')
+@patch('app.endpoints.twilio_webhooks.get_work_queue')
+def test_twilio_webhook_sheds_load_past_admission_limit(mock_get_work_queue, mock_get_dedup_cache):
+    admission_controller = AdmissionController(lambda: 10, max_depth=10)
+    admission_controller.queue_latency = 4.2
+    with patch('app.endpoints.twilio_webhooks.get_admission_controller', return_value=admission_controller):
+        response = post_signed_webhook(dummy_message)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    mock_get_dedup_cache.return_value.claim.assert_not_called()
+    mock_get_work_queue.return_value.enqueue.assert_not_called()
 
 def test_twilio_webhook_reject_get():
     response = test_client.get("/webhooks/twilio")
@@ -49,6 +115,7 @@ def test_twilio_webhook_reject_get():
         "message": "Method Not Allowed",
     }
 
+@patch.dict(os.environ, {"TWILIO_AUTH_TOKEN": test_auth_token})
 def test_twilio_webhook_raises_error_missing_body_in_form():
     form_data = {
         'SmsSid': 'SMxxxxxxxxxxxxxxxxxxxxxxxxxxxxx',
@@ -73,7 +140,7 @@ def test_twilio_webhook_raises_error_missing_body_in_form():
         'ToCountry': 'US',
         'NumMedia': '0',
     }
-    response = test_client.post("/webhooks/twilio", data=form_data)
+    response = post_signed_webhook(form_data)
 
     assert response.status_code == 422
     assert "Validation Error" in response.json()["description"]
@@ -0,0 +1,81 @@
+import threading
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.core.main import app
+from app.metrics import Counter, Gauge, Histogram, Registry, CONTENT_TYPE
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_is_exposed_with_total_suffix_and_labels(self):
+        counter = Counter("relay_test", "Test counter", ("outcome",), registry=self.registry)
+        counter.labels(outcome="success").inc()
+        counter.labels(outcome="success").inc(2)
+
+        exposed = self.registry.expose()
+
+        self.assertIn("# TYPE relay_test counter", exposed)
+        self.assertIn('relay_test_total{outcome="success"} 3', exposed)
+
+    def test_counter_sums_increments_from_every_thread(self):
+        counter = Counter("relay_threads", "Test counter", registry=self.registry)
+
+        def record():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.get(), 8000)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("relay_latency", "Test histogram", buckets=(0.1, 1.0), registry=self.registry)
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        exposed = self.registry.expose()
+
+        self.assertIn('relay_latency_bucket{le="0.1"} 1', exposed)
+        self.assertIn('relay_latency_bucket{le="1"} 2', exposed)
+        self.assertIn('relay_latency_bucket{le="+Inf"} 3', exposed)
+        self.assertIn("relay_latency_count 3", exposed)
+        self.assertIn("relay_latency_sum 5.55", exposed)
+
+    def test_gauge_tracks_in_progress_work(self):
+        gauge = Gauge("relay_in_flight", "Test gauge", registry=self.registry)
+
+        with gauge.track_in_progress():
+            self.assertEqual(gauge.get(), 1)
+        self.assertEqual(gauge.get(), 0)
+
+    def test_gauge_reads_callback_at_scrape_time(self):
+        gauge = Gauge("relay_depth", "Test gauge", registry=self.registry)
+        gauge.set_function(lambda: 7)
+
+        self.assertIn("relay_depth 7", self.registry.expose())
+
+    def test_failing_gauge_callback_does_not_break_scrape(self):
+        gauge = Gauge("relay_broken", "Test gauge", function=lambda: 1 / 0, registry=self.registry)
+        Counter("relay_ok", "Test counter", registry=self.registry).inc()
+
+        exposed = self.registry.expose()
+
+        self.assertNotIn("\nrelay_broken ", exposed)
+        self.assertIn("relay_ok_total 1", exposed)
+
+    def test_metrics_endpoint_serves_exposition_format(self):
+        response = TestClient(app).get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], CONTENT_TYPE)
+        self.assertIn("# TYPE relay_stage_duration_seconds histogram", response.text)
@@ -0,0 +1,297 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+import httpx
+from fastapi.testclient import TestClient
+from googleapiclient.errors import HttpError
+from twilio.base.exceptions import TwilioRestException
+
+from app.core.async_twilio_logic import close_async_clients, get_async_client, get_full_twilio_data_async
+from app.core.main import app
+from app.core.twilio_logic import get_client, get_full_twilio_data, is_transient_twilio_error, reset_client_pool
+from app.email_sender.email_sender import is_transient_gmail_error, is_unsent_gmail_error
+from app.exceptions import CircuitOpenError, ResourceNotFoundException
+from app.metrics import CIRCUIT_BREAKER_STATE, DEPENDENCY_RETRIES
+from app.resilience import CircuitBreaker, RetryPolicy, get_circuit_breaker, get_circuit_breaker_states, \
+    reset_resilience, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from benchmarks.fake_services import FakeServiceConfig, FakeTwilioServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def is_transient(error: Exception) -> bool:
+    return isinstance(error, ConnectionError)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", error_rate=0.5, min_calls=4, window=10, reset_timeout=5, clock=self.clock)
+
+    def test_opens_once_error_rate_is_reached(self):
+        for failed in (False, True, False):
+            self.breaker.record(failed)
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+
+        self.breaker.record(True)
+
+        self.assertEqual(self.breaker.state, STATE_OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_call()
+        self.assertEqual(raised.exception.retry_after, 5)
+
+    def test_outcomes_outside_the_window_are_forgotten(self):
+        for _ in range(3):
+            self.breaker.record(True)
+        self.clock.now = 11
+        for _ in range(3):
+            self.breaker.record(False)
+        self.breaker.record(True)
+
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+        self.assertEqual(self.breaker.snapshot(), {"state": STATE_CLOSED, "calls": 4, "failures": 1})
+
+    def test_half_open_trial_closes_or_reopens_breaker(self):
+        for _ in range(4):
+            self.breaker.record(True)
+        self.clock.now = 5
+
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, STATE_HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, STATE_OPEN)
+
+        self.clock.now = 10
+        self.breaker.before_call()
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+
+    def test_calls_behind_a_trial_retry_after_the_reset_timeout(self):
+        for _ in range(4):
+            self.breaker.record(True)
+        self.clock.now = 60
+        self.breaker.before_call()
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_call()
+        self.assertEqual(raised.exception.retry_after, 5)
+
+    def test_released_trial_lets_the_next_call_through(self):
+        for _ in range(4):
+            self.breaker.record(True)
+        self.clock.now = 5
+        self.breaker.before_call()
+
+        self.breaker.release()
+
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, STATE_HALF_OPEN)
+
+    def test_state_is_exported_as_gauge(self):
+        breaker = CircuitBreaker("gauge-test", min_calls=1)
+        breaker.record(True)
+
+        self.assertEqual(CIRCUIT_BREAKER_STATE.labels(dependency="gauge-test", state=STATE_OPEN).get(), 1)
+        self.assertEqual(CIRCUIT_BREAKER_STATE.labels(dependency="gauge-test", state=STATE_CLOSED).get(), 0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_transient_failures_are_retried_with_jittered_backoff(self):
+        policy = RetryPolicy("retry-test", is_transient, max_attempts=3, base_delay=0.1, max_delay=0.15)
+        function = MagicMock(side_effect=[ConnectionError(), ConnectionError(), "sent"])
+
+        with patch("app.resilience.resilience.time.sleep") as sleep:
+            self.assertEqual(policy.call(function), "sent")
+
+        self.assertEqual(function.call_count, 3)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertTrue(0 <= delays[0] <= 0.1)
+        self.assertTrue(0 <= delays[1] <= 0.15)
+        self.assertEqual(DEPENDENCY_RETRIES.labels(dependency="retry-test").get(), 2)
+
+    def test_permanent_failures_are_not_retried(self):
+        policy = RetryPolicy("test", is_transient, max_attempts=3)
+        function = MagicMock(side_effect=ValueError("bad request"))
+
+        with self.assertRaises(ValueError):
+            policy.call(function)
+        self.assertEqual(function.call_count, 1)
+
+    def test_last_error_is_raised_when_attempts_run_out(self):
+        policy = RetryPolicy("test", is_transient, max_attempts=2, base_delay=0)
+        function = MagicMock(side_effect=ConnectionError("refused"))
+
+        with self.assertRaises(ConnectionError):
+            policy.call(function)
+        self.assertEqual(function.call_count, 2)
+
+    def test_open_breaker_sheds_calls_without_retrying(self):
+        breaker = CircuitBreaker("test", min_calls=2, error_rate=0.5)
+        policy = RetryPolicy("test", is_transient, max_attempts=5, base_delay=0, breaker=breaker)
+        function = MagicMock(side_effect=ConnectionError("refused"))
+
+        with self.assertRaises(CircuitOpenError):
+            policy.call(function)
+        self.assertEqual(function.call_count, 2)
+
+        with self.assertRaises(CircuitOpenError):
+            policy.call(function)
+        self.assertEqual(function.call_count, 2)
+
+    def test_retry_if_narrows_retries_but_failures_still_count(self):
+        breaker = CircuitBreaker("test", min_calls=1)
+        policy = RetryPolicy("test", is_transient, max_attempts=3, base_delay=0, breaker=breaker)
+        function = MagicMock(side_effect=ConnectionResetError("reset"))
+
+        with self.assertRaises(ConnectionResetError):
+            policy.call(function, retry_if=lambda error: isinstance(error, ConnectionRefusedError))
+        self.assertEqual(function.call_count, 1)
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+    def test_permanent_failures_do_not_trip_breaker(self):
+        breaker = CircuitBreaker("test", min_calls=1)
+        policy = RetryPolicy("test", is_transient, breaker=breaker)
+
+        with self.assertRaises(ValueError):
+            policy.call(MagicMock(side_effect=ValueError("bad request")))
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_async_call_retries_transient_failures(self):
+        policy = RetryPolicy("test", is_transient, max_attempts=2, base_delay=0)
+        attempts = []
+
+        async def function():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("refused")
+            return "sent"
+
+        self.assertEqual(asyncio.run(policy.call_async(function)), "sent")
+        self.assertEqual(len(attempts), 2)
+
+    def test_cancelled_async_trial_does_not_hold_breaker_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=5, clock=clock)
+        breaker.record(True)
+        clock.now = 5
+        policy = RetryPolicy("test", is_transient, breaker=breaker)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def deliver():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(policy.call_async(hang), 0.01)
+
+        asyncio.run(deliver())
+
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+        self.assertEqual(policy.call(lambda: "sent"), "sent")
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+
+class TestDependencyPolicies(unittest.TestCase):
+
+    def setUp(self):
+        reset_resilience()
+        self.addCleanup(reset_resilience)
+
+    def test_twilio_errors_are_classified(self):
+        self.assertTrue(is_transient_twilio_error(TwilioRestException(503, "uri")))
+        self.assertTrue(is_transient_twilio_error(TwilioRestException(429, "uri")))
+        self.assertTrue(is_transient_twilio_error(ConnectionError()))
+        self.assertFalse(is_transient_twilio_error(TwilioRestException(404, "uri")))
+
+    def test_gmail_errors_are_classified(self):
+        request = httpx.Request("POST", "https://gmail.googleapis.com")
+        throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+        rejected = HttpError(MagicMock(status=400), b"{}")
+
+        self.assertTrue(is_transient_gmail_error(throttled))
+        self.assertTrue(is_transient_gmail_error(HttpError(MagicMock(status=500), b"{}")))
+        self.assertTrue(is_transient_gmail_error(httpx.ConnectTimeout("timeout")))
+        self.assertFalse(is_transient_gmail_error(rejected))
+
+    def test_only_gmail_errors_that_sent_nothing_are_unsent(self):
+        request = httpx.Request("POST", "https://gmail.googleapis.com")
+        throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+
+        self.assertTrue(is_unsent_gmail_error(throttled))
+        self.assertTrue(is_unsent_gmail_error(HttpError(MagicMock(status=503), b"{}")))
+        self.assertTrue(is_unsent_gmail_error(httpx.ConnectError("refused")))
+        self.assertTrue(is_unsent_gmail_error(ConnectionRefusedError()))
+        self.assertFalse(is_unsent_gmail_error(HttpError(MagicMock(status=500), b"{}")))
+        self.assertFalse(is_unsent_gmail_error(httpx.ReadTimeout("timeout")))
+        self.assertFalse(is_unsent_gmail_error(TimeoutError()))
+
+    def test_twilio_fetch_is_retried_and_shares_breaker(self):
+        client = MagicMock()
+        message = MagicMock()
+        client.messages.return_value.fetch.side_effect = [TwilioRestException(503, "uri"), message]
+
+        with patch("app.resilience.resilience.time.sleep"):
+            self.assertIs(get_full_twilio_data(client, "SM1"), message)
+
+        self.assertEqual(get_circuit_breaker_states()["twilio"], {"state": STATE_CLOSED, "calls": 2, "failures": 1})
+
+    def test_missing_twilio_message_is_not_retried(self):
+        client = MagicMock()
+        client.messages.return_value.fetch.side_effect = TwilioRestException(404, "uri")
+
+        with self.assertRaises(ResourceNotFoundException):
+            get_full_twilio_data(client, "SM1")
+        self.assertEqual(client.messages.return_value.fetch.call_count, 1)
+
+    def test_hung_twilio_api_times_out_and_trips_breaker(self):
+        server = FakeTwilioServer(FakeServiceConfig(latency=2)).start()
+        self.addCleanup(server.stop)
+        env = {
+            "TWILIO_ACCOUNT_SID": "AC00000000000000000000000000000000",
+            "TWILIO_AUTH_TOKEN": "token",
+            "TWILIO_API_BASE_URL": server.base_url,
+            "TWILIO_HTTP_TIMEOUT": "0.1",
+            "TWILIO_RETRY_ATTEMPTS": "1",
+            "TWILIO_BREAKER_MIN_CALLS": "2",
+        }
+        reset_client_pool()
+        self.addCleanup(reset_client_pool)
+
+        async def fetch_async():
+            try:
+                await get_full_twilio_data_async(get_async_client(), "SM2")
+            finally:
+                await close_async_clients()
+
+        with patch.dict("os.environ", env):
+            with self.assertRaises(OSError):
+                get_full_twilio_data(get_client(), "SM1")
+            with self.assertRaises(TimeoutError):
+                asyncio.run(fetch_async())
+            with self.assertRaises(CircuitOpenError):
+                get_full_twilio_data(get_client(), "SM3")
+
+    def test_breakers_are_configured_from_environment(self):
+        with patch.dict("os.environ", {"GMAIL_BREAKER_MIN_CALLS": "3", "GMAIL_BREAKER_RESET_TIMEOUT": "7"}):
+            breaker = get_circuit_breaker("gmail")
+
+        self.assertEqual(breaker.min_calls, 3)
+        self.assertEqual(breaker.reset_timeout, 7)
+
+    def test_breaker_states_are_served(self):
+        get_circuit_breaker("gmail").record(True)
+
+        response = TestClient(app).get("/breakers")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"gmail": {"state": STATE_CLOSED, "calls": 1, "failures": 1}})
@@ -0,0 +1,144 @@
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.decision_logic import CompiledRuleSet, RoutingRule, RuleSetLoader, load_rule_set
+from app.decision_logic.routing_rules import DEFAULT_RULES_PATH
+
+
+def reference_routes(body: str) -> list[str]:
+    mfa_code_words = ["code", "verification", "authentication", "login", "passcode", "access", "sign-in"]
+    if "[CRITICAL]" in body:
+        return ["email", "text", "discord"]
+    if "[WARNING]" in body:
+        return ["email", "discord"]
+    if any(word in body for word in mfa_code_words) and re.search(r"\b\d{4,8}\b", body):
+        return ["email", "text"]
+    return ["email"]
+
+
+class TestCompiledRuleSet(unittest.TestCase):
+
+    def test_bundled_rules_match_keyword_routing(self):
+        rule_set = load_rule_set(DEFAULT_RULES_PATH)
+        tokens = ["[CRITICAL]", "[WARNING]", "code", "passcode", "sign-in", "Login", "1234", "123456789",
+                  "hello", "café", "\U0001F600", " ", "-", "42"]
+        generator = random.Random(1234)
+
+        for _ in range(2000):
+            body = "".join(generator.choice(tokens) + generator.choice(["", " "]) for _ in range(generator.randint(0, 8)))
+            self.assertEqual(rule_set.classify(body), reference_routes(body), body)
+
+    def test_overlapping_keywords_from_different_rules_both_match(self):
+        rule_set = CompiledRuleSet(
+            [
+                RoutingRule(name="pass", routes=["text"], keywords=["pass"], pattern=r"\d+"),
+                RoutingRule(name="code", routes=["email"], keywords=["code"]),
+            ],
+            default_routes=["none"],
+        )
+
+        self.assertEqual(rule_set.classify("passcode"), ["email"])
+        self.assertEqual(rule_set.classify("passcode 12"), ["text"])
+
+    def test_keywords_starting_at_the_same_position_both_match(self):
+        rules = [
+            RoutingRule(name="log", routes=["text"], keywords=["log"], pattern=r"\d{6}"),
+            RoutingRule(name="login", routes=["email"], keywords=["login"]),
+        ]
+
+        for max_substring_keywords in (32, 0):
+            with patch("app.decision_logic.routing_rules.MAX_SUBSTRING_KEYWORDS", max_substring_keywords):
+                rule_set = CompiledRuleSet(rules, default_routes=["none"])
+
+            self.assertEqual(rule_set.match("please login now").name, "login")
+            self.assertEqual(rule_set.match("login 123456").name, "log")
+            self.assertIsNone(rule_set.match("lo gin"))
+
+    def test_keyword_scan_matches_substring_checks_on_large_rule_sets(self):
+        generator = random.Random(99)
+        words = ["".join(generator.choice("abc") for _ in range(generator.randint(1, 4))) for _ in range(60)]
+        rules = [
+            RoutingRule(
+                name=str(index),
+                routes=[str(index)],
+                keywords=generator.sample(words, 3),
+                pattern=generator.choice([None, r"\d", r"c$"]),
+            )
+            for index in range(20)
+        ]
+        rules.append(RoutingRule(name="digits", routes=["digits"], pattern=r"\d\d"))
+        with patch("app.decision_logic.routing_rules.MAX_SUBSTRING_KEYWORDS", 0):
+            scanned = CompiledRuleSet(rules, ["none"])
+        checked = CompiledRuleSet(rules, ["none"])
+
+        for _ in range(2000):
+            body = "".join(generator.choice("abc 12") for _ in range(generator.randint(0, 12)))
+            self.assertEqual(scanned.classify(body), checked.classify(body), body)
+
+    def test_default_routes_when_no_rule_matches(self):
+        rule_set = CompiledRuleSet([RoutingRule(name="a", routes=["text"], keywords=["alert"])], ["email"])
+
+        self.assertEqual(rule_set.classify("hello"), ["email"])
+
+    def test_priority_of_first_satisfied_rule(self):
+        rule_set = load_rule_set(DEFAULT_RULES_PATH)
+
+        self.assertEqual(rule_set.priority("[CRITICAL] disk full"), "high")
+        self.assertEqual(rule_set.priority("Your code is 123456"), "high")
+        self.assertEqual(rule_set.priority("[WARNING] disk filling"), "normal")
+        self.assertEqual(rule_set.priority("hello"), "normal")
+
+    def test_unknown_priority_is_rejected(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "rules.json")
+            with open(path, "w", encoding="UTF-8") as rules_file:
+                json.dump({"rules": [{"name": "a", "routes": ["text"], "priority": "urgent"}]}, rules_file)
+
+            with self.assertRaises(ValueError):
+                load_rule_set(path)
+
+    def test_classify_returns_copy_of_routes(self):
+        rule_set = CompiledRuleSet([RoutingRule(name="a", routes=["text"], keywords=["alert"])], ["email"])
+
+        rule_set.classify("alert").append("discord")
+
+        self.assertEqual(rule_set.classify("alert"), ["text"])
+
+
+class TestRuleSetLoader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, "rules.json")
+
+    def write_rules(self, keyword: str, mtime: int):
+        with open(self.path, "w") as rules_file:
+            json.dump({"default_routes": ["email"], "rules": [{"name": "r", "keywords": [keyword], "routes": ["text"]}]},
+                      rules_file)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def test_reloads_rules_when_file_changes(self):
+        self.write_rules("alpha", 1_000_000_000)
+        loader = RuleSetLoader(self.path, reload_interval=0)
+        self.assertEqual(loader.get().classify("alpha"), ["text"])
+
+        self.write_rules("beta", 2_000_000_000)
+
+        self.assertEqual(loader.get().classify("alpha"), ["email"])
+        self.assertEqual(loader.get().classify("beta"), ["text"])
+
+    @patch("app.decision_logic.routing_rules.logging.error")
+    def test_keeps_previous_rules_when_reload_fails(self, mock_logger):
+        self.write_rules("alpha", 1_000_000_000)
+        loader = RuleSetLoader(self.path, reload_interval=0)
+        with open(self.path, "w") as rules_file:
+            rules_file.write("{not json")
+        os.utime(self.path, ns=(2_000_000_000, 2_000_000_000))
+
+        self.assertEqual(loader.get().classify("alpha"), ["text"])
+        mock_logger.assert_called_once()
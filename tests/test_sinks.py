@@ -0,0 +1,238 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from app.core.twilio_logic import twilio_background_task
+from app.exceptions import SinkTimeoutError, SmsThrottledError
+from app.email_sender import BatchEmailSender
+from app.sinks import Sink, SinkRegistry, SinkResult, is_route_job, raise_for_undelivered, requeue_deferred_routes
+from app.work_queue import WorkQueue
+from app.sinks.email_sink import EmailSink
+
+
+class RecordingSink(Sink):
+    def __init__(self, delay: float = 0.0, error: Exception | None = None, timeout: float = 5.0):
+        super().__init__(timeout=timeout)
+        self.delay = delay
+        self.error = error
+        self.delivered_at = None
+        self.messages = []
+
+    def deliver(self, message: dict) -> None:
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.messages.append(message)
+        self.delivered_at = time.monotonic()
+
+    async def deliver_async(self, message: dict) -> None:
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.messages.append(message)
+        self.delivered_at = time.monotonic()
+
+
+class TestSinkRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = SinkRegistry(max_workers=4)
+        self.addCleanup(self.registry.shutdown)
+        self.message = {"from": "+11234567890", "body": "[CRITICAL] disk full", "routes": ["email", "discord"]}
+
+    def test_slow_sink_does_not_delay_other_sinks(self):
+        email = RecordingSink()
+        discord = RecordingSink(delay=0.3)
+        self.registry.register("email", email)
+        self.registry.register("discord", discord)
+
+        started = time.monotonic()
+        results = self.registry.deliver(self.message, ["discord", "email"])
+
+        self.assertTrue(results["email"].delivered)
+        self.assertTrue(results["discord"].delivered)
+        self.assertLess(email.delivered_at - started, 0.2)
+
+    def test_sink_exceeding_its_timeout_is_reported_as_failed(self):
+        self.registry.register("email", RecordingSink())
+        self.registry.register("discord", RecordingSink(delay=0.5, timeout=0.05))
+
+        results = self.registry.deliver(self.message, ["email", "discord"])
+
+        self.assertTrue(results["email"].delivered)
+        self.assertFalse(results["discord"].delivered)
+        self.assertIsInstance(results["discord"].error, SinkTimeoutError)
+
+    def test_failing_sink_does_not_fail_other_sinks(self):
+        email = RecordingSink()
+        self.registry.register("email", email)
+        self.registry.register("discord", RecordingSink(error=ConnectionError("refused")))
+
+        results = self.registry.deliver(self.message, ["email", "discord"])
+
+        self.assertEqual(email.messages, [self.message])
+        self.assertIsInstance(results["discord"].error, ConnectionError)
+
+    def test_transient_failures_are_retryable_but_timeouts_are_not(self):
+        self.registry.register("email", RecordingSink(error=ConnectionError("refused")))
+        self.registry.register("discord", RecordingSink(delay=0.5, timeout=0.05))
+        self.registry.register("text", RecordingSink(error=ValueError("bad number")))
+
+        results = self.registry.deliver(self.message, ["email", "discord", "text"])
+        async_results = asyncio.run(self.registry.deliver_async(self.message, ["email", "discord", "text"]))
+
+        for delivered in (results, async_results):
+            self.assertEqual({route: result.retryable for route, result in delivered.items()},
+                             {"email": True, "discord": False, "text": False})
+
+    def test_routes_without_sink_are_skipped(self):
+        self.registry.register("email", RecordingSink())
+
+        results = self.registry.deliver(self.message, ["email", "text"])
+
+        self.assertEqual(list(results), ["email"])
+
+    def test_async_delivery_runs_sinks_concurrently_and_cancels_on_timeout(self):
+        email = RecordingSink(delay=0.1)
+        text = RecordingSink(delay=0.1)
+        self.registry.register("email", email)
+        self.registry.register("text", text)
+        self.registry.register("discord", RecordingSink(delay=5, timeout=0.2))
+
+        started = time.monotonic()
+        results = asyncio.run(self.registry.deliver_async(self.message, ["email", "text", "discord"]))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(results["email"].delivered)
+        self.assertTrue(results["text"].delivered)
+        self.assertIsInstance(results["discord"].error, SinkTimeoutError)
+
+    def test_deliveries_from_many_threads_share_the_executor(self):
+        email = RecordingSink(delay=0.01)
+        self.registry.register("email", email)
+
+        threads = [threading.Thread(target=self.registry.deliver, args=(self.message, ["email"])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(email.messages), 8)
+
+
+class TestEmailSink(unittest.TestCase):
+
+    @patch.dict("os.environ", {"MY_EMAIL": "inbox@example.com"})
+    def test_batched_deliveries_share_batch_requests(self):
+        batches = []
+
+        def send_batch(encoded_msgs):
+            batches.append(len(encoded_msgs))
+            return [{"id": str(index)} for index in range(len(encoded_msgs))]
+
+        sink = EmailSink(batch_sender=BatchEmailSender(send_batch, window=0.2))
+        self.addCleanup(sink.close)
+        message = {"from": "+11234567890", "body": "hello"}
+
+        sink.deliver(message)
+        threads = [threading.Thread(target=sink.deliver, args=(message,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        asyncio.run(sink.deliver_async(message))
+
+        self.assertEqual(sum(batches), 6)
+        self.assertLess(len(batches), 6)
+
+
+class TestRaiseForUndelivered(unittest.TestCase):
+
+    def test_raises_first_error_when_every_sink_failed(self):
+        error = ConnectionError("refused")
+        results = {
+            "email": SinkResult(route="email", delivered=False, error=error),
+            "discord": SinkResult(route="discord", delivered=False, error=TimeoutError()),
+        }
+
+        with self.assertRaises(ConnectionError):
+            raise_for_undelivered(results)
+
+    def test_partial_delivery_does_not_raise(self):
+        results = {
+            "email": SinkResult(route="email", delivered=True),
+            "discord": SinkResult(route="discord", delivered=False, error=ConnectionError()),
+        }
+
+        raise_for_undelivered(results)
+        raise_for_undelivered({})
+
+
+class TestRequeueDeferredRoutes(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.queue = WorkQueue(os.path.join(temp_dir.name, "queue.db"))
+        patcher = patch("app.sinks.registry.get_work_queue", return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.message = {
+            "date_created": datetime(2026, 1, 1, tzinfo=timezone.utc),
+            "from": "+11234567890",
+            "body": "[CRITICAL] disk full",
+            "routes": ["email", "text"],
+        }
+        self.results = {
+            "email": SinkResult(route="email", delivered=True),
+            "text": SinkResult(route="text", delivered=False, error=SmsThrottledError("limit", retry_after=0)),
+        }
+
+    def test_deferred_route_is_redelivered_by_a_route_job(self):
+        text = RecordingSink()
+        registry = SinkRegistry(max_workers=1)
+        self.addCleanup(registry.shutdown)
+        registry.register("email", RecordingSink())
+        registry.register("text", text)
+
+        requeue_deferred_routes(self.message, self.results, "trace")
+        job = self.queue.dequeue_batch(1, 60)[0]
+        with patch("app.sinks.registry.get_sink_registry", return_value=registry):
+            twilio_background_task(job.headers, job.data)
+
+        self.assertTrue(is_route_job(job.data))
+        self.assertEqual(job.headers, {"X-Twilio-Trace-ID": "trace"})
+        self.assertEqual(text.messages, [self.message])
+        self.assertEqual(self.queue.depth(), 1)
+
+    def test_route_job_waits_for_retry_after(self):
+        self.results["text"].error.retry_after = 30
+
+        requeue_deferred_routes(self.message, self.results)
+
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertEqual(self.queue.dequeue_batch(1, 60), [])
+
+    def test_transient_failures_are_requeued_after_the_retry_delay(self):
+        self.results["discord"] = SinkResult(route="discord", delivered=False, error=ConnectionError(),
+                                             retryable=True)
+
+        with patch("app.sinks.registry.DEFAULT_ROUTE_RETRY_DELAY", 0):
+            requeue_deferred_routes(self.message, self.results)
+        job = self.queue.dequeue_batch(1, 60)[0]
+
+        self.assertEqual(job.data["DeferredRoutes"], ["text", "discord"])
+
+    def test_undelivered_or_permanently_failed_routes_are_not_requeued(self):
+        requeue_deferred_routes(self.message, {"text": self.results["text"]})
+        requeue_deferred_routes(self.message, {
+            "email": self.results["email"],
+            "discord": SinkResult(route="discord", delivered=False, error=ValueError("bad embed")),
+        })
+
+        self.assertEqual(self.queue.depth(), 0)
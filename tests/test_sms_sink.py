@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from twilio.base.exceptions import TwilioRestException
+
+from app.core.twilio_logic import get_client, get_client_pool_stats, reset_client_pool
+from app.exceptions import SmsThrottledError
+from app.rate_limit import TokenBucket
+from app.sinks import SmsSink, build_sms_body
+from benchmarks.fake_services import FakeTwilioServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reservations_are_spaced_at_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=1, clock=clock)
+
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.5, 1.0])
+
+    def test_bucket_refills_up_to_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+        for _ in range(3):
+            bucket.reserve()
+
+        clock.now = 10.0
+
+        self.assertEqual(bucket.available(), 3)
+
+    def test_reserve_past_timeout_takes_nothing(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=1, clock=clock)
+        bucket.reserve()
+
+        self.assertIsNone(bucket.reserve(timeout=0.5))
+        self.assertEqual(bucket.reserve(timeout=1.0), 1.0)
+
+    def test_refunded_tokens_are_reserved_again(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=1, clock=clock)
+        bucket.reserve()
+        bucket.reserve()
+
+        bucket.refund()
+
+        self.assertEqual(bucket.wait_time(), 1.0)
+        self.assertEqual(bucket.reserve(), 1.0)
+
+
+class TestSmsSink(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeTwilioServer(send_limit=25).start()
+        self.addCleanup(self.server.stop)
+        env = {
+            "TWILIO_ACCOUNT_SID": "AC00000000000000000000000000000000",
+            "TWILIO_AUTH_TOKEN": "token",
+            "TWILIO_API_BASE_URL": self.server.base_url,
+        }
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        reset_client_pool()
+        self.addCleanup(reset_client_pool)
+        self.message = {"from": "+15550001111", "body": "[CRITICAL] disk full"}
+
+    def test_forwards_to_every_destination(self):
+        sink = SmsSink(["+15550002222", "+15550003333"], messaging_service_sid="MG123", rate=100)
+
+        sink.deliver(self.message)
+
+        self.assertEqual([sent["To"] for sent in self.server.sent], ["+15550002222", "+15550003333"])
+        self.assertEqual(self.server.sent[0]["Body"], "From +15550001111: [CRITICAL] disk full")
+        self.assertEqual(self.server.sent[0]["MessagingServiceSid"], "MG123")
+
+    def test_burst_drains_at_rate_limit_without_rejections(self):
+        sink = SmsSink(["+15550002222"], from_number="+15550009999", rate=20, max_concurrency=4)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for future in [executor.submit(sink.deliver, self.message) for _ in range(30)]:
+                future.result(timeout=10)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(self.server.sent), 30)
+        self.assertEqual(self.server.status_counts[429], 0)
+        self.assertGreaterEqual(elapsed, 29 / 20 - 0.05)
+        self.assertEqual(get_client_pool_stats()["size"], 1)
+
+    def test_concurrent_sends_are_capped(self):
+        sink = SmsSink(["+15550002222"], from_number="+15550009999", rate=1000, max_concurrency=2)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+        messages = get_client().messages
+        original_create = messages.create
+
+        def tracking_create(**kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return original_create(**kwargs)
+
+        with patch.object(messages, "create", side_effect=tracking_create):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for future in [executor.submit(sink.deliver, self.message) for _ in range(8)]:
+                    future.result(timeout=10)
+
+        self.assertEqual(len(self.server.sent), 8)
+        self.assertEqual(peak, 2)
+
+    def test_send_that_cannot_start_before_timeout_is_deferred(self):
+        sink = SmsSink(["+15550002222"], from_number="+15550009999", rate=1, timeout=0.1)
+        sink.deliver(self.message)
+
+        with self.assertRaises(SmsThrottledError) as raised:
+            sink.deliver(self.message)
+        self.assertEqual(len(self.server.sent), 1)
+        self.assertGreater(raised.exception.retry_after, 0.5)
+
+    def test_deferred_message_reaches_no_destination(self):
+        sink = SmsSink(["+15550002222", "+15550003333"], from_number="+15550009999", rate=1, burst=2,
+                       timeout=0.1)
+        sink.deliver(self.message)
+
+        with self.assertRaises(SmsThrottledError):
+            sink.deliver(self.message)
+        self.assertEqual(len(self.server.sent), 2)
+        self.assertLessEqual(sink.bucket.wait_time(), 1.0)
+
+    def test_twilio_server_errors_are_transient(self):
+        sink = SmsSink(["+15550002222"], from_number="+15550009999")
+
+        self.assertTrue(sink.is_transient(TwilioRestException(500, "uri")))
+        self.assertTrue(sink.is_transient(TwilioRestException(429, "uri")))
+        self.assertFalse(sink.is_transient(TwilioRestException(400, "uri")))
+
+    def test_requires_a_sender(self):
+        with self.assertRaises(ValueError):
+            SmsSink(["+15550002222"])
+
+    def test_build_sms_body_truncates_long_bodies(self):
+        body = build_sms_body({"from": "+15550001111", "body": "x" * 2000})
+
+        self.assertEqual(len(body), 1600)
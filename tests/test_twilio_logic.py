@@ -2,19 +2,25 @@ import os
 import unittest
 from datetime import datetime
 from logging import Logger
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 
 from twilio.base.exceptions import TwilioRestException
+from twilio.request_validator import RequestValidator
 from twilio.rest import Client
 from twilio.rest.api.v2010.account.message import MessageInstance
 
 from app.core.twilio_logic import get_full_twilio_data, extract_message_info, get_client, validate_twilio_request, \
-    twilio_background_task, sanitize_data
+    twilio_background_task, sanitize_data, get_client_pool_stats, reset_client_pool, extract_webhook_message_info, \
+    get_message_info, get_request_validator, TwilioSignatureValidator, record_delivery_outcome
+from app.dedup import STATUS_DELIVERED, STATUS_NOT_FOUND
 from app.exceptions import ClientAuthenticationException, RequiresClientException, ResourceNotFoundException, \
     MissingCredentialsException, InvalidTwilioRequestException
 
 
 class TwilioLogicTest(unittest.TestCase):
+    def setUp(self):
+        reset_client_pool()
+        self.addCleanup(reset_client_pool)
 
     def test_extract_message_info_raises_error_on_missing_field(self):
         twilio_data = MagicMock(spec=MessageInstance)
@@ -86,9 +92,35 @@ class TwilioLogicTest(unittest.TestCase):
         mock_twilio_client.assert_called_once()
         mock_twilio_client.assert_called_once_with(
             'AC123',
-            'AC456'
+            'AC456',
+            http_client=ANY
         )
 
+    @patch('app.core.twilio_logic.Client')
+    @patch.dict(os.environ, {'TWILIO_ACCOUNT_SID': 'AC123', 'TWILIO_AUTH_TOKEN': 'AC456'})
+    def test_get_client_reuses_pooled_client(self, mock_twilio_client):
+        first = get_client()
+        second = get_client()
+
+        self.assertIs(first, second)
+        mock_twilio_client.assert_called_once()
+        self.assertEqual(get_client_pool_stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    @patch('app.core.twilio_logic.Client')
+    @patch.dict(os.environ, {'TWILIO_ACCOUNT_SID': 'AC123', 'TWILIO_AUTH_TOKEN': 'AC456'})
+    def test_get_client_rebuilds_client_on_credential_rotation(self, mock_twilio_client):
+        old_client = MagicMock()
+        new_client = MagicMock()
+        mock_twilio_client.side_effect = [old_client, new_client]
+
+        self.assertIs(get_client(), old_client)
+        with patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'AC789'}):
+            self.assertIs(get_client(), new_client)
+
+        self.assertEqual(mock_twilio_client.call_count, 2)
+        old_client.http_client.session.close.assert_called_once()
+        self.assertEqual(get_client_pool_stats(), {"hits": 0, "misses": 2, "size": 1})
+
     @patch('app.core.twilio_logic.Client')
     @patch.dict(os.environ, {'TWILIO_ACCOUNT_SID': 'AC123', 'TWILIO_AUTH_TOKEN': 'AC456'})
     def test_get_client_raises_exception_on_incorrect_credentials(self, mock_twilio_client):
@@ -101,31 +133,64 @@ class TwilioLogicTest(unittest.TestCase):
         with self.assertRaises(ClientAuthenticationException):
             get_client()
 
-    @patch('app.core.twilio_logic.RequestValidator')
-    @patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'fake_token'})
-    def test_validate_twilio_request_returns_true(self, mock_validator):
-        mock_validator.return_value.validate.return_value = True
+    def build_signed_request(self, params, auth_token='fake_token'):
+        url = 'https://example.com/webhooks/twilio'
+        signature = RequestValidator(auth_token).compute_signature(url, params)
         mock_request = MagicMock()
-        mock_request.url.path = '/webhooks/twilio'
-        mock_request.headers = {'X-Twilio-Signature': 'fake_signature'}
-        data = {'key': 'value'}
-        is_valid = validate_twilio_request(mock_request, data)
+        mock_request.headers = {
+            'x-forwarded-proto': 'https',
+            'host': 'example.com',
+            'X-Twilio-Signature': signature,
+        }
+        mock_request.scope = {'path': '/webhooks/twilio'}
+        mock_request.url.query = ''
+        return mock_request
+
+    @patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'fake_token'})
+    def test_validate_twilio_request_returns_true(self):
+        data = {'key': 'value', 'Body': 'Hello World', 'Empty': ''}
+        mock_request = self.build_signed_request(data)
+        is_valid = validate_twilio_request(mock_request, {name: [value] for name, value in data.items()})
         self.assertTrue(is_valid)
 
-    @patch('app.core.twilio_logic.RequestValidator')
     @patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'fake_token'})
-    def test_validate_twilio_request_returns_false(self, mock_validator):
-        mock_validator.return_value.validate.return_value = False
-        mock_request = MagicMock()
-        mock_request.url.path = '/webhooks/twilio'
-        mock_request.headers = {'X-Twilio-Signature': 'fake_signature'}
+    def test_validate_twilio_request_returns_false(self):
+        data = {'key': 'value'}
+        mock_request = self.build_signed_request(data, auth_token='other_token')
+        is_valid = validate_twilio_request(mock_request, {name: [value] for name, value in data.items()})
+        self.assertFalse(is_valid)
+
+    @patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'fake_token'})
+    def test_validate_twilio_request_returns_false_on_tampered_body(self):
         data = {'key': 'value'}
-        is_valid = validate_twilio_request(mock_request, data)
+        mock_request = self.build_signed_request(data)
+        is_valid = validate_twilio_request(mock_request, {'key': ['tampered']})
         self.assertFalse(is_valid)
 
+    def test_get_request_validator_is_cached_per_auth_token(self):
+        with patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'fake_token'}):
+            first = get_request_validator()
+            second = get_request_validator()
+        with patch.dict(os.environ, {'TWILIO_AUTH_TOKEN': 'rotated_token'}):
+            rotated = get_request_validator()
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, rotated)
+
+    def test_signature_validator_matches_twilio_request_validator(self):
+        url = 'https://example.com/webhooks/twilio'
+        data = {'Body': 'caf\u00e9 \U0001F600', 'From': '+11234567890', 'ForwardedFrom': ''}
+        expected = RequestValidator('fake_token').compute_signature(url, data)
+        params = {name: [value] for name, value in data.items()}
+
+        validator = TwilioSignatureValidator('fake_token')
+
+        self.assertEqual(validator.compute_signature(url, params), expected)
+        self.assertTrue(validator.validate(url, params, expected))
+
     @patch.dict(os.environ, {'MY_EMAIL': 'email@example.com'})
     @patch('app.core.twilio_logic.get_routes')
-    @patch('app.core.twilio_logic.EmailSender')
+    @patch('app.sinks.email_sink.EmailSender')
     @patch('app.core.twilio_logic.get_client')
     @patch('app.core.twilio_logic.get_full_twilio_data')
     @patch('app.core.twilio_logic.extract_message_info')
@@ -210,6 +275,54 @@ class TwilioLogicTest(unittest.TestCase):
 
 
 
+    def test_extract_webhook_message_info_returns_dict(self):
+        data = extract_webhook_message_info({'MessageSid': 'SM123', 'From': '+11234567890', 'Body': 'Test Body'})
+
+        self.assertEqual(data['from'], '+11234567890')
+        self.assertEqual(data['body'], 'Test Body')
+        self.assertIsInstance(data['date_created'], datetime)
+
+    def test_extract_webhook_message_info_returns_none_on_missing_fields(self):
+        self.assertIsNone(extract_webhook_message_info({'MessageSid': 'SM123', 'From': '+11234567890'}))
+        self.assertIsNone(extract_webhook_message_info({'MessageSid': 'SM123', 'From': '', 'Body': 'Test Body'}))
+
+    @patch('app.core.twilio_logic.get_client')
+    @patch('app.core.twilio_logic.get_full_twilio_data')
+    def test_get_message_info_uses_webhook_payload(self, mock_get_full_twilio_data, mock_get_client):
+        data = get_message_info({'MessageSid': 'SM123', 'From': '+11234567890', 'Body': 'Test Body'})
+
+        self.assertEqual(data['body'], 'Test Body')
+        mock_get_client.assert_not_called()
+        mock_get_full_twilio_data.assert_not_called()
+
+    @patch.dict(os.environ, {'TWILIO_MESSAGE_SOURCE': 'rest'})
+    @patch('app.core.twilio_logic.get_client')
+    @patch('app.core.twilio_logic.get_full_twilio_data')
+    def test_get_message_info_fetches_message_in_rest_mode(self, mock_get_full_twilio_data, mock_get_client):
+        mock_message_instance = MagicMock(spec=MessageInstance)
+        mock_message_instance.body = "Fetched Body"
+        mock_message_instance.from_ = "+11234567890"
+        mock_message_instance.date_created = datetime.now()
+        mock_get_full_twilio_data.return_value = mock_message_instance
+
+        data = get_message_info({'MessageSid': 'SM123', 'From': '+11234567890', 'Body': 'Test Body'})
+
+        self.assertEqual(data['body'], 'Fetched Body')
+        mock_get_full_twilio_data.assert_called_once_with(mock_get_client.return_value, 'SM123')
+
+    @patch('app.core.twilio_logic.get_dedup_cache')
+    def test_record_delivery_outcome_updates_dedup_cache(self, mock_get_dedup_cache):
+        mock_cache = mock_get_dedup_cache.return_value
+        data = {'MessageSid': 'SM123'}
+
+        record_delivery_outcome(data)
+        record_delivery_outcome(data, ResourceNotFoundException("Resource not found"))
+        record_delivery_outcome(data, ClientAuthenticationException("Twilio Authentication Failed"))
+
+        mock_cache.record.assert_any_call('SM123', STATUS_DELIVERED)
+        mock_cache.record.assert_any_call('SM123', STATUS_NOT_FOUND)
+        mock_cache.release.assert_called_once_with('SM123')
+
     def test_sanitize_data_returns_valid_dict(self):
         dummy_message = {
             "SmsSid": "SMxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",
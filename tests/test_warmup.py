@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.core.main import app
+from app.core.warmup import WarmupState, warm_up, STEP_READY, STEP_FAILED, STEP_PENDING
+import app.work_queue.work_queue as work_queue_module
+
+
+class TestWarmup(unittest.TestCase):
+
+    def test_steps_run_concurrently(self):
+        async def run():
+            first_started = asyncio.Event()
+            second_started = asyncio.Event()
+
+            async def first():
+                first_started.set()
+                await asyncio.wait_for(second_started.wait(), 1)
+
+            async def second():
+                second_started.set()
+                await asyncio.wait_for(first_started.wait(), 1)
+
+            steps = {"first": first, "second": second}
+            state = WarmupState(steps)
+            self.assertEqual(state.steps, {"first": STEP_PENDING, "second": STEP_PENDING})
+            await warm_up(state, steps)
+            return state
+
+        state = asyncio.run(run())
+
+        self.assertTrue(state.ready)
+        self.assertEqual(state.steps, {"first": STEP_READY, "second": STEP_READY})
+
+    def test_failed_steps_are_retried_until_they_succeed(self):
+        calls = {"flaky": 0, "stable": 0}
+
+        async def flaky():
+            calls["flaky"] += 1
+            if calls["flaky"] < 3:
+                raise RuntimeError("secret manager unavailable")
+
+        async def stable():
+            calls["stable"] += 1
+
+        steps = {"flaky": flaky, "stable": stable}
+        state = WarmupState(steps)
+        asyncio.run(warm_up(state, steps, retry_interval=0))
+
+        self.assertTrue(state.ready)
+        self.assertEqual(calls, {"flaky": 3, "stable": 1})
+        self.assertEqual(state.errors, {})
+
+    def test_state_reports_failed_step_until_retry(self):
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def run():
+            state = WarmupState({"failing": failing})
+            task = asyncio.create_task(warm_up(state, {"failing": failing}, retry_interval=60))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            return state
+
+        state = asyncio.run(run())
+
+        self.assertFalse(state.ready)
+        self.assertEqual(state.steps["failing"], STEP_FAILED)
+        self.assertEqual(state.errors["failing"], "boom")
+
+
+class TestReadyEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"WORK_QUEUE_PATH": os.path.join(self.temp_dir.name, "queue.db")})
+        env.start()
+        self.addCleanup(env.stop)
+        work_queue_module._work_queue = None
+        self.addCleanup(setattr, work_queue_module, "_work_queue", None)
+
+    def test_not_ready_without_lifespan(self):
+        response = TestClient(app).get("/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["ready"])
+
+    def test_ready_once_warmup_finishes(self):
+        release = asyncio.Event()
+
+        async def slow_step():
+            await release.wait()
+
+        with patch("app.core.main.default_warmup_steps", return_value={"twilio_client": slow_step}):
+            with TestClient(app) as client:
+                response = client.get("/ready")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response.json()["steps"], {"twilio_client": STEP_PENDING})
+
+                client.portal.call(release.set)
+                deadline = time.monotonic() + 5
+                while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+
+                self.assertEqual(client.get("/ready").json(), {
+                    "ready": True,
+                    "steps": {"twilio_client": STEP_READY},
+                    "errors": {},
+                })
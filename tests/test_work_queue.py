@@ -0,0 +1,380 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.exceptions import CircuitOpenError
+from app.work_queue import WorkQueue, WorkerPool, AsyncWorkerPool, AdmissionController
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.queue = WorkQueue(os.path.join(self.temp_dir.name, "queue.db"))
+        self.headers = {"X-Twilio-Trace-ID": "trace"}
+
+    def test_enqueue_and_dequeue_in_fifo_order(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        self.queue.enqueue(self.headers, {"MessageSid": "SM2"})
+
+        jobs = self.queue.dequeue_batch(10, 60)
+
+        self.assertEqual([job.data["MessageSid"] for job in jobs], ["SM1", "SM2"])
+        self.assertEqual(jobs[0].headers, self.headers)
+        self.assertEqual(jobs[0].attempts, 1)
+
+    def test_dequeue_batch_respects_batch_size(self):
+        for i in range(5):
+            self.queue.enqueue(self.headers, {"MessageSid": f"SM{i}"})
+
+        self.assertEqual(len(self.queue.dequeue_batch(2, 60)), 2)
+        self.assertEqual(len(self.queue.dequeue_batch(10, 60)), 3)
+
+    def test_leased_jobs_are_hidden_until_visibility_timeout(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+
+        self.assertEqual(len(self.queue.dequeue_batch(10, 60)), 1)
+        self.assertEqual(self.queue.dequeue_batch(10, 60), [])
+
+    def test_expired_leases_are_redelivered(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        self.queue.dequeue_batch(10, 0)
+
+        jobs = self.queue.dequeue_batch(10, 60)
+
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0].attempts, 2)
+
+    def test_ack_removes_job(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        job = self.queue.dequeue_batch(10, 60)[0]
+
+        self.queue.ack(job.id)
+
+        self.assertEqual(self.queue.depth(), 0)
+
+    def test_recover_releases_leased_jobs(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        self.queue.dequeue_batch(10, 60)
+
+        reopened = WorkQueue(self.queue.path)
+
+        self.assertEqual(reopened.recover(), 1)
+        self.assertEqual(len(reopened.dequeue_batch(10, 60)), 1)
+
+    def test_deferred_job_waits_from_when_it_is_due_again(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        job = self.queue.dequeue_batch(1, 60)[0]
+        self.queue._connection().execute("UPDATE jobs SET enqueued_at = enqueued_at - 120")
+
+        deferred_at = time.time()
+        self.queue.defer(job.id, 0)
+        redelivered = self.queue.dequeue_batch(1, 60)[0]
+
+        self.assertEqual(redelivered.attempts, 1)
+        self.assertGreaterEqual(redelivered.enqueued_at, deferred_at)
+
+    def test_high_priority_jobs_are_leased_first(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        self.queue.enqueue(self.headers, {"MessageSid": "SM2"}, priority="high")
+        self.queue.enqueue(self.headers, {"MessageSid": "SM3"})
+        self.queue.enqueue(self.headers, {"MessageSid": "SM4"}, priority="high")
+
+        jobs = self.queue.dequeue_batch(10, 60)
+
+        self.assertEqual([job.data["MessageSid"] for job in jobs], ["SM2", "SM4", "SM1", "SM3"])
+        self.assertEqual([job.priority for job in jobs], ["high", "high", "normal", "normal"])
+
+    def test_min_priority_leaves_normal_jobs_queued(self):
+        self.queue.enqueue(self.headers, {"MessageSid": "SM1"})
+        self.queue.enqueue(self.headers, {"MessageSid": "SM2"}, priority="high")
+
+        jobs = self.queue.dequeue_batch(10, 60, min_priority="high")
+
+        self.assertEqual([job.data["MessageSid"] for job in jobs], ["SM2"])
+        self.assertEqual(self.queue.dequeue_batch(10, 60, min_priority="high"), [])
+        self.assertEqual(len(self.queue.dequeue_batch(10, 60)), 1)
+
+    def test_queue_files_without_priorities_are_migrated(self):
+        path = os.path.join(self.temp_dir.name, "old.db")
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+            "enqueued_at REAL NOT NULL, visible_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        connection.execute(
+            "INSERT INTO jobs (payload, enqueued_at, visible_at) VALUES (?, 0, 0)",
+            ('{"headers": {}, "data": {"MessageSid": "SM1"}}',),
+        )
+        connection.commit()
+        connection.close()
+
+        queue = WorkQueue(path)
+        queue.enqueue({}, {"MessageSid": "SM2"}, priority="high")
+
+        jobs = queue.dequeue_batch(10, 60)
+        self.assertEqual([(job.data["MessageSid"], job.priority) for job in jobs], [("SM2", "high"), ("SM1", "normal")])
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.queue = WorkQueue(os.path.join(self.temp_dir.name, "queue.db"))
+
+    def wait_for_empty_queue(self):
+        deadline = time.time() + 5
+        while self.queue.depth() and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_workers_process_and_ack_jobs(self):
+        processed = []
+        lock = threading.Lock()
+
+        def handler(headers, data):
+            with lock:
+                processed.append(data["MessageSid"])
+
+        pool = WorkerPool(self.queue, handler, worker_count=2, batch_size=3, poll_interval=0.05)
+        pool.start()
+        self.addCleanup(pool.stop)
+        for i in range(10):
+            self.queue.enqueue({}, {"MessageSid": f"SM{i}"})
+
+        self.wait_for_empty_queue()
+
+        self.assertEqual(sorted(processed), sorted(f"SM{i}" for i in range(10)))
+
+    def test_failing_jobs_are_dropped_after_max_attempts(self):
+        handler = MagicMock(side_effect=RuntimeError("boom"))
+        pool = WorkerPool(self.queue, handler, worker_count=1, visibility_timeout=0, max_attempts=3, poll_interval=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+        self.queue.enqueue({}, {"MessageSid": "SM1"})
+
+        self.wait_for_empty_queue()
+
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(handler.call_count, 3)
+
+    def test_reserved_worker_takes_high_priority_jobs_during_backlog(self):
+        release = threading.Event()
+        processed = []
+
+        def handler(headers, data):
+            if data["MessageSid"].startswith("slow"):
+                release.wait(5)
+            processed.append(data["MessageSid"])
+
+        self.addCleanup(release.set)
+        for i in range(3):
+            self.queue.enqueue({}, {"MessageSid": f"slow{i}"})
+        pool = WorkerPool(self.queue, handler, worker_count=2, batch_size=1, poll_interval=0.01, reserved_workers=1)
+        pool.start()
+        self.addCleanup(pool.stop)
+        time.sleep(0.05)
+        self.queue.enqueue({}, {"MessageSid": "mfa"}, priority="high")
+
+        deadline = time.time() + 5
+        while "mfa" not in processed and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(processed, ["mfa"])
+
+    def test_normal_jobs_wake_a_normal_worker(self):
+        processed = threading.Semaphore(0)
+        pool = WorkerPool(self.queue, lambda headers, data: processed.release(), worker_count=2, poll_interval=5,
+                          reserved_workers=1)
+        pool.start()
+        self.addCleanup(pool.stop)
+
+        for i in range(4):
+            time.sleep(0.05)
+            self.queue.enqueue({}, {"MessageSid": f"SM{i}"})
+
+            self.assertTrue(processed.acquire(timeout=1))
+
+    def test_reserved_workers_leave_one_worker_for_normal_jobs(self):
+        pool = WorkerPool(self.queue, MagicMock(), worker_count=1, reserved_workers=1)
+
+        self.assertEqual(pool.reserved_workers, 0)
+
+    @patch("app.work_queue.work_queue.MIN_DEFER_DELAY", 0.01)
+    def test_jobs_shed_by_open_breaker_are_deferred_without_using_attempts(self):
+        handler = MagicMock(side_effect=CircuitOpenError("open", retry_after=0.05))
+        pool = WorkerPool(self.queue, handler, worker_count=1, visibility_timeout=0, max_attempts=2, poll_interval=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+        self.queue.enqueue({}, {"MessageSid": "SM1"})
+
+        time.sleep(0.3)
+
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertGreater(handler.call_count, 2)
+
+    def test_jobs_shed_without_retry_after_are_deferred_for_the_minimum_delay(self):
+        handler = MagicMock(side_effect=CircuitOpenError("open", retry_after=0.0))
+        pool = WorkerPool(self.queue, handler, worker_count=1, visibility_timeout=0, max_attempts=2, poll_interval=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+        self.queue.enqueue({}, {"MessageSid": "SM1"})
+
+        time.sleep(0.3)
+
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertEqual(handler.call_count, 1)
+
+
+class TestAsyncWorkerPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.queue = WorkQueue(os.path.join(self.temp_dir.name, "queue.db"))
+
+    async def test_pool_processes_jobs_with_bounded_concurrency(self):
+        in_flight = 0
+        max_in_flight = 0
+        processed = []
+
+        async def handler(headers, data):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            processed.append(data["MessageSid"])
+
+        for i in range(20):
+            self.queue.enqueue({}, {"MessageSid": f"SM{i}"})
+        pool = AsyncWorkerPool(self.queue, handler, concurrency=4, batch_size=10, poll_interval=0.05)
+        pool.start()
+
+        for _ in range(500):
+            if self.queue.depth() == 0:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+        self.assertEqual(sorted(processed), sorted(f"SM{i}" for i in range(20)))
+        self.assertLessEqual(max_in_flight, 4)
+        self.assertGreater(max_in_flight, 1)
+
+    async def test_normal_jobs_leave_reserved_slots_free(self):
+        release = asyncio.Event()
+        started = []
+
+        async def handler(headers, data):
+            started.append(data["MessageSid"])
+            if data["MessageSid"].startswith("SM"):
+                await release.wait()
+
+        for i in range(5):
+            self.queue.enqueue({}, {"MessageSid": f"SM{i}"})
+        pool = AsyncWorkerPool(self.queue, handler, concurrency=3, batch_size=10, poll_interval=0.01,
+                               reserved_concurrency=1)
+        pool.start()
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(started), 2)
+
+        self.queue.enqueue({}, {"MessageSid": "mfa"}, priority="high")
+        for _ in range(100):
+            if "mfa" in started:
+                break
+            await asyncio.sleep(0.01)
+        release.set()
+        await pool.stop()
+
+        self.assertIn("mfa", started)
+
+    async def test_acks_and_deferrals_run_off_the_event_loop(self):
+        writers_on_loop = []
+
+        def record_writer(*args):
+            try:
+                asyncio.get_running_loop()
+                writers_on_loop.append(args)
+            except RuntimeError:
+                pass
+
+        async def handler(headers, data):
+            if data["MessageSid"] == "shed":
+                raise CircuitOpenError("open", retry_after=60)
+
+        self.queue.enqueue({}, {"MessageSid": "SM1"})
+        self.queue.enqueue({}, {"MessageSid": "shed"})
+        pool = AsyncWorkerPool(self.queue, handler, poll_interval=0.01)
+        with patch.object(self.queue, "ack", side_effect=record_writer) as ack, \
+                patch.object(self.queue, "defer", side_effect=record_writer) as defer:
+            pool.start()
+            for _ in range(100):
+                if ack.called and defer.called:
+                    break
+                await asyncio.sleep(0.01)
+            await pool.stop()
+
+        ack.assert_called_once()
+        defer.assert_called_once()
+        self.assertEqual(writers_on_loop, [])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.depth = 0
+        self.clock = FakeClock()
+        self.controller = AdmissionController(
+            lambda: self.depth, max_depth=100, min_depth=10, target_latency=5, smoothing=1, clock=self.clock,
+        )
+
+    def observe(self, latency: float) -> None:
+        self.clock.now += 1
+        self.controller.observe_queue_latency(latency)
+
+    def test_admits_until_hard_cap(self):
+        self.depth = 99
+        self.assertTrue(self.controller.admit())
+
+        self.depth = 100
+        self.assertFalse(self.controller.admit())
+
+    def test_limit_shrinks_while_queue_latency_is_over_target(self):
+        for _ in range(3):
+            self.observe(20)
+
+        self.assertEqual(self.controller.limit, 42)
+        self.depth = 42
+        self.assertFalse(self.controller.admit())
+        self.assertEqual(self.controller.retry_after(), 20)
+
+    def test_limit_never_shrinks_below_floor_and_recovers(self):
+        for _ in range(20):
+            self.observe(20)
+        self.assertEqual(self.controller.limit, 10)
+
+        for _ in range(3):
+            self.observe(1)
+        self.assertEqual(self.controller.limit, 40)
+
+    def test_limit_is_adjusted_once_per_interval(self):
+        self.controller.observe_queue_latency(20)
+        self.controller.observe_queue_latency(20)
+
+        self.assertEqual(self.controller.limit, 100)
+
+    def test_retry_after_is_bounded(self):
+        self.assertEqual(self.controller.retry_after(), 1)
+        self.controller.queue_latency = 600
+
+        self.assertEqual(self.controller.retry_after(), 60)